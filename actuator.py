@@ -0,0 +1,162 @@
+"""Pump actuator: the one owner of the relay, with timed runs
+
+Every relay write goes through an Actuator, so manual buttons, the
+controller and timed runs can't interleave. It looks like a Pin
+(value()), so control.Controller takes it in place of the relay.
+
+A timed run switches the pump on and off again at a deadline held here;
+repeated run_for() calls move that deadline rather than stacking timers,
+extend() adds to it and cancel() ends it. Runs can also be queued to
+start later (delay_ms); the queue is bounded and kept in start order.
+Nothing sleeps: poll() applies whatever is due, and run() is an asyncio
+task that waits for the next deadline or a new command, so there is no
+thread per command.
+"""
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+import eventlog
+import hal
+from control import ON, OFF, Stat
+
+MAX_RUN_MS = 10 * 60000  # a timed run never holds the pump on longer than this
+MAX_PENDING = 16  # queued (delayed) runs
+IDLE_MS = 1000  # run() re-checks this often with nothing scheduled
+
+
+class Actuator:
+    def __init__(self, relay, log=None, clock=None, max_run_ms=MAX_RUN_MS,
+                 max_pending=MAX_PENDING):
+        self.relay = relay
+        self.log = log or (lambda code, arg=0: None)
+        self.clock = clock or hal.ticks_ms
+        self.max_run_ms = max_run_ms
+        self.max_pending = max_pending
+        self.state = relay.value()
+        self.off_at = None  # deadline of the current timed run
+        self.pending = []  # [(start ticks, ms)] sorted by start
+        self.commands = 0
+        self.runs = 0
+        self.extends = 0
+        self.cancels = 0
+        self.rejected = 0  # queued runs refused while the queue was full
+        self.switches = 0
+        self.late_ms = Stat()  # how far past its deadline a timed run was switched off
+        self.wakeup = None  # asyncio.Event, created by run()
+
+    def _write(self, state):
+        if state != self.state:
+            self.relay.value(state)
+            self.state = state
+            self.switches += 1
+
+    def _wake(self):
+        if self.wakeup:
+            self.wakeup.set()
+
+    def value(self, state=None):
+        """Pin interface; a direct write takes over from any timed run"""
+        if state is None:
+            return self.state
+        self.commands += 1
+        self.off_at = None
+        self._write(state)
+
+    def _start(self, ms, now):
+        ms = min(ms, self.max_run_ms)
+        end = hal.ticks_add(now, ms)
+        if self.off_at is None or hal.ticks_diff(end, self.off_at) > 0:
+            if self.off_at is None:
+                self.runs += 1
+                self.log(eventlog.FORCE_ON, (ms + 999) // 1000)
+            self.off_at = end
+        self._write(ON)
+
+    def run_for(self, ms, delay_ms=0):
+        """Pump on for ms (from now, or after delay_ms); False if the queue is full"""
+        self.commands += 1
+        now = self.clock()
+        if delay_ms <= 0:
+            self._start(ms, now)
+            self._wake()
+            return True
+        if len(self.pending) >= self.max_pending:
+            self.rejected += 1
+            return False
+        start = hal.ticks_add(now, delay_ms)
+        i = len(self.pending)
+        while i and hal.ticks_diff(self.pending[i - 1][0], start) > 0:
+            i -= 1
+        self.pending.insert(i, (start, ms))
+        self._wake()
+        return True
+
+    def extend(self, ms):
+        """Add ms to the current timed run (capped), or start one"""
+        self.commands += 1
+        now = self.clock()
+        if self.off_at is None:
+            self._start(ms, now)
+        else:
+            self.extends += 1
+            self.off_at = hal.ticks_add(now, min(hal.ticks_diff(self.off_at, now) + ms, self.max_run_ms))
+        self._wake()
+
+    def cancel(self):
+        """End the timed run and drop queued ones; the pump goes off"""
+        self.commands += 1
+        self.cancels += 1
+        self.pending = []
+        self.off_at = None
+        self._write(OFF)
+        self._wake()
+
+    def remaining_ms(self):
+        if self.off_at is None:
+            return 0
+        return max(0, hal.ticks_diff(self.off_at, self.clock()))
+
+    def poll(self):
+        """Apply due starts and the run deadline; returns ms until the next event or None"""
+        now = self.clock()
+        while self.pending and hal.ticks_diff(now, self.pending[0][0]) >= 0:
+            start, ms = self.pending.pop(0)
+            self._start(ms, now)
+        if self.off_at is not None and hal.ticks_diff(now, self.off_at) >= 0:
+            self.late_ms.add(hal.ticks_diff(now, self.off_at))
+            self.off_at = None
+            self._write(OFF)
+            self.log(eventlog.FORCE_OFF)
+        wait = None
+        if self.off_at is not None:
+            wait = hal.ticks_diff(self.off_at, now)
+        if self.pending:
+            until = hal.ticks_diff(self.pending[0][0], now)
+            wait = until if wait is None else min(wait, until)
+        return wait
+
+    async def run(self):
+        self.wakeup = asyncio.Event()
+        while True:
+            wait_ms = self.poll()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), hal.real_s(IDLE_MS if wait_ms is None else wait_ms))
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+
+    def stats(self):
+        return {
+            'on': self.state == ON,
+            'remaining_ms': self.remaining_ms(),
+            'pending': len(self.pending),
+            'commands': self.commands,
+            'runs': self.runs,
+            'extends': self.extends,
+            'cancels': self.cancels,
+            'rejected': self.rejected,
+            'switches': self.switches,
+            'late_ms': self.late_ms.as_dict(),
+        }
@@ -0,0 +1,235 @@
+"""Force-water under load: a thread per click vs actuator.Actuator
+
+Usage:
+    python bench/actuator_stress.py [commands]
+
+  threads    mainlbrce's old action_force(): relay on, then a _thread that
+             sleeps 5 s and switches it off. Clicks arrive every 0-2 s on
+             a hal_sim clock at 100x, so the sleeps overlap like they do
+             on the board.
+  actuator   a burst of delayed runs twice the queue bound, then
+             `commands` random commands (force, delayed runs, extend,
+             cancel, stop, pump toggle) on a stepped clock that starts a
+             minute before the ticks wrap, with the auto controller
+             switching the same relay through the actuator.
+  asyncio    the actuator's run() task in real time with commands from
+             another task, measuring how late deadlines are met.
+
+Checked for each: peak threads, relay writes that bypassed the owner,
+runs cut short (off less than 5 s after the latest force click, with no
+cancel or override in between) and the pending queue bound.
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, from any cwd
+
+import hal
+import hal_sim
+import actuator
+import control
+import eventlog
+
+FORCE_MS = 5000
+STEP_MS = 10
+
+
+class CountingRelay:
+    """Relay output that counts writes and who made them"""
+
+    def __init__(self, out):
+        self.out = out
+        self.writes = 0
+        self.threads = set()
+
+    def value(self, v=None):
+        if v is None:
+            return self.out.value()
+        self.writes += 1
+        self.threads.add(threading.get_ident())
+        self.out.value(v)
+
+
+def legacy(commands, rng):
+    board = hal.use(hal_sim.SimBoard(speed=100, seed=1))
+    relay = CountingRelay(board.output('relay', 27, 1))
+    log = []
+    lock = threading.Lock()
+    state = {'last_click': 0, 'peak': 0, 'short': 0}
+
+    def action_force():
+        relay.value(0)
+        log.append(eventlog.FORCE_ON)
+        state['last_click'] = hal.ticks_ms()
+
+        def auto_off():
+            hal.sleep_ms(5000)
+            if relay.value() == 0:
+                if hal.ticks_diff(hal.ticks_ms(), state['last_click']) < FORCE_MS - 100:
+                    state['short'] += 1  # a later click's 5 s cut short by this thread
+                relay.value(1)
+                log.append(eventlog.FORCE_OFF)
+        threading.Thread(target=auto_off, daemon=True).start()
+        with lock:
+            state['peak'] = max(state['peak'], threading.active_count() - 1)
+
+    for _ in range(commands):
+        action_force()
+        hal.sleep_ms(rng.uniform(0, 2000))
+    hal.sleep_ms(6000)
+    return {
+        'peak_threads': state['peak'],
+        'writer_threads': len(relay.threads),
+        'relay_writes': relay.writes,
+        'cut_short': state['short'],
+        'pending_max': '-',
+    }
+
+
+def snapshot(rng):
+    return lambda: {'tank_percent': 60, 'rain': 1, 'soil_percent': rng.choice((20, 50, 90))}
+
+
+def stepped(commands, rng):
+    board = hal.use(hal_sim.SimBoard(speed=0, seed=1, ticks_start=hal_sim.TICKS_PERIOD - 60000))
+    relay = CountingRelay(board.output('relay', 27, 1))
+    offs = []  # ticks of deadline switch-offs
+
+    def log(code, arg=0):
+        if code == eventlog.FORCE_OFF:
+            offs.append(hal.ticks_ms())
+
+    pump = actuator.Actuator(relay, log)
+    auto = {'on': True}
+    controller = control.Controller(pump, snapshot(rng), lambda: auto['on'], log, 2000)
+    pending_max = 0
+    short = 0
+    last_force = None  # latest force click since the last cancel/override
+    for _ in range(2 * actuator.MAX_PENDING):  # a burst past the queue bound first
+        pump.run_for(FORCE_MS, rng.randrange(1, 60000))
+    next_cmd = hal.ticks_ms()
+    sent = 0
+    while sent < commands or pump.pending or pump.off_at is not None:
+        now = hal.ticks_ms()
+        if sent < commands and hal.ticks_diff(now, next_cmd) >= 0:
+            op = rng.random()
+            if op < 0.5:
+                pump.run_for(FORCE_MS)
+                last_force = now
+            elif op < 0.7:
+                pump.run_for(rng.randrange(1000, 20000), rng.randrange(1, 180000))
+            elif op < 0.8:
+                pump.extend(FORCE_MS)
+            elif op < 0.87:
+                pump.cancel()
+                last_force = None
+            elif op < 0.93:
+                pump.value(1 if pump.value() == 0 else 0)
+                last_force = None
+            else:
+                auto['on'] = not auto['on']
+                controller.wake()
+            sent += 1
+            next_cmd = hal.ticks_add(now, rng.randrange(0, 3000))
+        switches = controller.switches
+        controller.poll()
+        if controller.switches != switches:
+            last_force = None  # the controller took over
+        n_offs = len(offs)
+        pump.poll()
+        if len(offs) != n_offs and last_force is not None and hal.ticks_diff(now, last_force) < FORCE_MS:
+            short += 1
+        if len(offs) != n_offs:
+            last_force = None
+        pending_max = max(pending_max, len(pump.pending))
+        assert relay.out.value() == pump.state, "relay and owner disagree"
+        assert pump.remaining_ms() <= actuator.MAX_RUN_MS, "deadline beyond the run cap"
+        hal.sleep_ms(STEP_MS)
+    stats = pump.stats()
+    return {
+        'peak_threads': 0,
+        'writer_threads': len(relay.threads),
+        'relay_writes': relay.writes,
+        'cut_short': short,
+        'pending_max': pending_max,
+        'stats': stats,
+    }
+
+
+def realtime(commands, rng):
+    try:
+        import asyncio
+    except ImportError:
+        import uasyncio as asyncio
+    board = hal.use(hal_sim.SimBoard(speed=1, seed=1))
+    relay = CountingRelay(board.output('relay', 27, 1))
+    pump = actuator.Actuator(relay)
+    late = []
+
+    async def clicks():
+        for _ in range(commands):
+            op = rng.random()
+            if op < 0.6:
+                pump.run_for(rng.randrange(5, 60))
+            elif op < 0.8:
+                pump.run_for(rng.randrange(5, 40), rng.randrange(1, 200))
+            elif op < 0.9:
+                pump.extend(10)
+            else:
+                pump.cancel()
+            await asyncio.sleep(rng.uniform(0, 0.03))
+
+    async def watch():
+        # how late after its deadline the relay actually went off
+        while True:
+            deadline = pump.off_at
+            await asyncio.sleep(0.0005)
+            if deadline is not None and pump.off_at is None and pump.state == control.OFF:
+                late.append(hal.ticks_diff(hal.ticks_ms(), deadline))
+
+    async def main():
+        task = asyncio.create_task(pump.run())
+        watcher = asyncio.create_task(watch())
+        await clicks()
+        while pump.pending or pump.off_at is not None:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        watcher.cancel()
+
+    t0 = time.perf_counter()
+    asyncio.run(main())
+    late.sort()
+    return {
+        'peak_threads': 0,
+        'writer_threads': len(relay.threads),
+        'relay_writes': relay.writes,
+        'cut_short': '-',
+        'pending_max': '-',
+        'late': late,
+        'stats': pump.stats(),
+        'seconds': time.perf_counter() - t0,
+    }
+
+
+def main():
+    commands = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print("%d commands each" % commands)
+    print("%-10s %13s %15s %13s %10s %12s" % (
+        'service', 'peak threads', 'writer threads', 'relay writes', 'cut short', 'pending max'))
+    rows = (('threads', legacy), ('actuator', stepped), ('asyncio', realtime))
+    for name, fn in rows:
+        r = fn(commands, random.Random(7))
+        print("%-10s %13s %15s %13s %10s %12s" % (
+            name, r['peak_threads'], r['writer_threads'], r['relay_writes'], r['cut_short'], r['pending_max']))
+        if 'stats' in r:
+            print("  stats:", r['stats'])
+        if 'late' in r and r['late']:
+            late = r['late']
+            print("  deadline late ms: p50 %d  p99 %d  max %d over %d runs (%.1f s)" % (
+                late[len(late) // 2], late[int(len(late) * 0.99)], late[-1], len(late), r['seconds']))
+
+
+main()
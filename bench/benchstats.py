@@ -0,0 +1,13 @@
+"""Statistics shared by the benches
+
+Benches import it by name: the bench directory is on sys.path whenever
+one of them is run as a script, from any working directory.
+"""
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[k]
@@ -0,0 +1,213 @@
+"""App command -> relay latency: BLYNKAPPCODE's old sleep loop vs the runtime's BlynkSink
+
+Usage:
+    python bench/blynk_latency_bench.py [commands]
+
+Both run in real time on hal_sim against bench/fake_blynk.py. The old
+program's main loop (blynk.run(), then a 5 s sleep) is replayed as it
+was; the new side is mainlbrce itself, started in a thread with the
+Blynk sink on, so the commands go through blynksink.BlynkSink, app_pump
+and the pump actuator.
+
+The server switches the device to manual (V8=0), presses the pump
+button (V7) `commands` times at random moments, then leaves the pump on
+to time the manual auto-off. Latency is from the server sending a
+command to the relay changing. The runtime then gets three more checks:
+
+  rain     V7 while it rains must leave the pump off (the old program's
+           rain override)
+  hang     a timed run while the outbox uploads to a batch endpoint that
+           never answers (bench/fake_sink.py): how late the pump goes off
+  gap      the sink's longest pause between blynk.run() calls
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import blynksink
+import control
+import hal
+import hal_sim
+import outbox
+from fake_blynk import FakeBlynk, Device
+from fake_sink import FakeSink, HANG
+
+LEGACY_RUN_S = 10  # the old program's manual auto-off, whole seconds of time()
+
+
+class TimedRelay:
+    """Relay output that timestamps every change"""
+
+    def __init__(self, out):
+        self.out = out
+        self.changes = []  # (perf_counter, value)
+
+    def value(self, v=None):
+        if v is None:
+            return self.out.value()
+        if v != self.out.value():
+            self.changes.append((time.perf_counter(), v))
+        self.out.value(v)
+
+
+class Legacy:
+    """The old program's handlers and loop, on its own connection"""
+
+    def __init__(self, board, server):
+        self.relay = TimedRelay(board.output('relay', 13, 1))
+        self.soil = board.adc('soil', 34, span=(3000, 2000))
+        self.device = Device.dial(server.port)
+        self.mode_auto = True
+        self.relay_state = 1
+        self.manual_timer = 0
+        self.stop = False
+
+        @self.device.on("V8")
+        def mode_control(value):
+            self.mode_auto = int(value[0]) == 1
+
+        @self.device.on("V7")
+        def manual_pump(value):
+            if not self.mode_auto:
+                if int(value[0]) == 1:
+                    self.pump_control(True)
+                    self.manual_timer = hal.time()
+                else:
+                    self.pump_control(False)
+
+    def pump_control(self, state):
+        self.relay.value(0 if state else 1)
+        self.relay_state = 0 if state else 1
+
+    def loop(self):
+        while not self.stop:
+            self.device.run()
+            self.soil.read()  # stands in for read_sensors() + uploads
+            if not self.mode_auto and self.relay_state == 0 and (hal.time() - self.manual_timer > LEGACY_RUN_S):
+                self.pump_control(False)
+            hal.sleep_ms(5000)
+
+    def close(self):
+        self.stop = True
+        self.device.close()
+
+
+def start_runtime(server, tmp):
+    """mainlbrce with the Blynk sink pointed at the fake server, in a thread"""
+    import mainlbrce as app
+    blynksink.blynk_connect = Device
+    app.BLYNK_ENABLED = True
+    app.BLYNK_SERVER = '127.0.0.1'
+    app.BLYNK_PORT = server.port
+    app.HTTP_PORT = 0
+    app.pump.relay = relay = TimedRelay(app.pump.relay)
+    os.chdir(tmp)  # history and outbox files
+    threading.Thread(target=app.start_server, daemon=True).start()
+    return app, relay
+
+
+def wait_for(relay, value, since, timeout=12):
+    """Time of the first relay change to `value` after `since`"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        for t, v in relay.changes:
+            if t >= since and v == value:
+                return t
+        time.sleep(0.001)
+    return None
+
+
+def presses(server, relay, commands, rng):
+    """Toggle V7 at random moments, then time one full manual run"""
+    server.command(8, 0)
+    time.sleep(0.5)
+    latencies = []
+    state = 0
+    for _ in range(commands):
+        time.sleep(rng.uniform(0.3, 2.5))
+        state ^= 1
+        t0 = time.perf_counter()
+        server.command(7, state)
+        t = wait_for(relay, 0 if state else 1, t0)
+        latencies.append((t - t0) * 1000)
+    if state:
+        server.command(7, 0)
+        wait_for(relay, 1, time.perf_counter())
+    time.sleep(0.3)
+    t0 = time.perf_counter()
+    server.command(7, 1)
+    t_on = wait_for(relay, 0, t0)
+    t_off = wait_for(relay, 1, t_on, timeout=20)
+    latencies.sort()
+    return latencies, (t_off - t_on) * 1000
+
+
+def report(name, lat, auto_off):
+    print("%-10s %9.1f %9.1f %9.1f %14.0f" % (
+        name, lat[len(lat) // 2], lat[-1], sum(lat) / len(lat), auto_off))
+
+
+def main():
+    commands = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    board = hal.use(hal_sim.SimBoard(speed=1, seed=3))
+    board.field.rain_left = 0
+    board.field.RAIN_CHANCE = 0  # rain only when the bench asks for it
+    print("%-10s %9s %9s %9s %14s" % ('loop', 'p50 ms', 'max ms', 'mean ms', 'auto-off ms'))
+
+    server = FakeBlynk()
+    legacy = Legacy(board, server)
+    server.connected.wait(2)
+    thread = threading.Thread(target=legacy.loop, daemon=True)
+    thread.start()
+    lat, auto_off = presses(server, legacy.relay, commands, random.Random(5))
+    report('sleep 5 s', lat, auto_off)
+    legacy.close()
+    thread.join()
+    server.close()
+
+    server = FakeBlynk()
+    server.connected.clear()
+    app, relay = start_runtime(server, tempfile.mkdtemp())
+    server.connected.wait(10)
+    time.sleep(0.3)
+    lat, auto_off = presses(server, relay, commands, random.Random(5))
+    report('BlynkSink', lat, auto_off)
+    print("(manual auto-off target: old %d s, runtime %d ms)" % (LEGACY_RUN_S, app.MANUAL_RUN_MS))
+
+    board.field.rain_left = 3600
+    time.sleep(app.SAMPLE_PERIOD_MS / 1000 * 1.5)  # a sample sees the rain
+    t0 = time.perf_counter()
+    server.command(7, 1)
+    time.sleep(1)
+    started = any(t >= t0 and v == 0 for t, v in relay.changes)
+    print("rain: V7 %s" % ('STARTED THE PUMP' if started else 'refused, pump stays off'))
+    board.field.rain_left = 0
+    time.sleep(app.SAMPLE_PERIOD_MS / 1000 * 1.5)
+
+    sink = FakeSink()
+    sink.set_mode(HANG)
+    blynk = app.blynk_sink
+    blynk.sink = outbox.HttpSink('127.0.0.1', sink.port, 'bench', blynksink.BACKLOG_PINS)
+    for i in range(200):
+        blynk.backlog.put(hal.time() - 1000 + i, (2500, 1, 2000, 1, 0, 28, 60))
+    time.sleep(0.2)  # the upload is under way and hanging
+    app.pump.late_ms = control.Stat()
+    for _ in range(5):
+        app.pump.run_for(500)
+        time.sleep(1)
+    late = app.pump.late_ms.as_dict()
+    print("hang: 5 x run_for(500) during a hanging upload, switched off late by max %s ms (mean %s)" % (
+        late['max'], late['mean']))
+    print("gap: blynk.run() every %s ms (max), outbox %s" % (
+        blynk.run_gap_ms.max, blynk.backlog.stats()))
+    sink.close()
+    server.close()
+
+
+main()
@@ -0,0 +1,123 @@
+"""Controller on a simulated field: relay toggles, dwell and loop jitter
+
+Usage:
+    python bench/control_sim.py [hours]
+
+Part 1 replays `hours` of a dry-season hal_sim farm on a stepped clock
+(ticks starting an hour before they wrap) and compares the old
+per-request threshold logic with control.Controller.
+Part 2 runs the controller's asyncio loop for a few real seconds next to
+a busy task and reports scheduling jitter and decision latency.
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, from any cwd
+
+import control
+import hal
+import hal_sim
+
+STEP_MS = 1000  # replay resolution
+REQUEST_EVERY_MS = 3000  # old logic ran on every HTTP request (~one viewer polling)
+
+
+class DrySeason(hal_sim.Field):
+    """No rain: the tank runs down and dry-run protection does the work"""
+    RAIN_CHANCE = 0
+
+
+def sim_board(speed, seed, tank, ticks_start=0):
+    board = hal.use(hal_sim.SimBoard(DrySeason(seed, tank=tank), speed=speed, ticks_start=ticks_start))
+    return board, board.output('relay', 27, control.OFF)
+
+
+def read(board):
+    """Snapshot in the shape read_sensors() returns, straight from the field"""
+    return {
+        'soil_percent': int(board.reading('soil')),
+        'tank_percent': int(board.reading('tank')),
+        'rain': 0 if board.reading('rain') else 1,
+    }
+def legacy_decide(relay, data):
+    """analyze_conditions() relay logic before the controller"""
+    if data['rain'] == 0:
+        if relay.value() == 0:
+            relay.value(1)
+        return
+    if data['tank_percent'] < 20:
+        if relay.value() == 0:
+            relay.value(1)
+        return
+    if data['soil_percent'] < 30:
+        if data['tank_percent'] > 20 and relay.value() == 1:
+            relay.value(0)
+    elif data['soil_percent'] > 80 and relay.value() == 0:
+        relay.value(1)
+
+
+def replay(hours, use_controller):
+    board, relay = sim_board(0, 7, 40, hal_sim.TICKS_PERIOD - 3600000)
+    switches = []  # (time, reason) of each controller switch
+    ctl = control.Controller(relay, lambda: read(board), lambda: True,
+                             log=lambda code, arg=0: switches.append((hal.ticks_ms(), code)))
+    on_ms = 0
+    for t in range(0, int(hours * 3600 * 1000), STEP_MS):
+        if use_controller:
+            ctl.poll()
+        elif t % REQUEST_EVERY_MS == 0:
+            legacy_decide(relay, read(board))
+        on_ms += STEP_MS if relay.value() == control.ON else 0
+        hal.sleep_ms(STEP_MS)
+    check_dwell(switches)
+    return relay.toggles, on_ms / 1000, ctl
+
+
+def check_dwell(switches):
+    """Soil-driven switches must respect the minimum on/off time"""
+    for (t0, _), (t1, code) in zip(switches, switches[1:]):
+        if code == control.eventlog.SOIL_DRY:
+            assert hal.ticks_diff(t1, t0) >= control.MIN_OFF_MS, (t0, t1, code)
+        elif code == control.eventlog.SOIL_WET:
+            assert hal.ticks_diff(t1, t0) >= control.MIN_ON_MS, (t0, t1, code)
+
+
+async def busy(stop):
+    """Simulated request handling: short blocking bursts"""
+    while not stop[0]:
+        x = 0
+        for i in range(20000):
+            x += i
+        await asyncio.sleep(0)
+
+
+async def realtime(seconds, period_ms):
+    board, relay = sim_board(1, 3, 80)
+    ctl = control.Controller(relay, lambda: read(board), lambda: True, period_ms=period_ms)
+    stop = [False]
+    task = asyncio.create_task(ctl.run())
+    load = asyncio.create_task(busy(stop))
+    await asyncio.sleep(seconds)
+    stop[0] = True
+    task.cancel()
+    await load
+    return ctl.stats()
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 24
+    print("replay: %g h of simulated field" % hours)
+    print("logic        toggles  pump_on_s")
+    for name, use in (("legacy", False), ("controller", True)):
+        toggles, on_s, ctl = replay(hours, use)
+        print("%-12s %7d %10.0f" % (name, toggles, on_s))
+    print("controller: %d switches held back by dwell, none inside the dwell window" % ctl.held)
+
+    stats = asyncio.run(realtime(3, 50))
+    print("realtime loop, 50 ms period under load:")
+    for key in ('jitter_ms', 'decision_us'):
+        print("  %-12s %s" % (key, stats[key]))
+
+
+main()
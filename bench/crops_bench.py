@@ -0,0 +1,128 @@
+"""Crop scoring: legacy per-call ladder vs table-driven engine and batch API
+
+Usage:
+    python bench/crops_bench.py [samples]
+
+Checks that the table-driven scores match the old if/elif ladder over a
+grid of sensor states, then times scoring `samples` synthetic readings
+(default ~1 month at one sample per 2 minutes) of two kinds: uniform
+random, the worst case for the batch path's per-reading memo, and a
+slow random walk like real sensor data, where most readings repeat.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, from any cwd
+
+import crops
+
+
+def legacy_scores(temp, moisture, season_type):
+    """predict_best_crop()'s scoring loop before the crop table moved to crops.py"""
+    table = [
+        ("paddy", "Rice", 20, 35, 70, 95, "kharif"),
+        ("wheat", "Wheat", 10, 25, 40, 70, "rabi"),
+        ("maize", "Maize", 15, 30, 50, 80, "both"),
+        ("vegetables", "Vegetables", 15, 30, 60, 85, "all"),
+        ("cotton", "Cotton", 20, 35, 45, 75, "kharif"),
+        ("millets", "Millets", 20, 40, 30, 65, "kharif"),
+        ("groundnut", "Groundnut", 22, 35, 40, 70, "kharif"),
+        ("sugarcane", "Sugarcane", 20, 35, 65, 90, "all")
+    ]
+    out = []
+    for crop_id, crop_name, min_temp, max_temp, min_moisture, max_moisture, crop_season in table:
+        score = 0
+        if crop_season == "all":
+            score += 40
+        elif crop_season == "both" and season_type in ["rabi", "kharif"]:
+            score += 40
+        elif crop_season == season_type:
+            score += 40
+        elif crop_season == "kharif" and season_type == "zaid":
+            score += 20
+        elif crop_season == "rabi" and season_type == "zaid":
+            score += 15
+        else:
+            score += 5
+        if min_temp <= temp <= max_temp:
+            score += 30
+        else:
+            diff = min_temp - temp if temp < min_temp else temp - max_temp
+            score += 20 if diff <= 5 else 10 if diff <= 10 else 5
+        if min_moisture <= moisture <= max_moisture:
+            score += 30
+        else:
+            diff = min_moisture - moisture if moisture < min_moisture else moisture - max_moisture
+            score += 20 if diff <= 10 else 10 if diff <= 20 else 5
+        out.append(score)
+    return out
+
+
+def check_equivalence():
+    checked = 0
+    for season_type in crops.SEASON_TYPES:
+        for t10 in range(-100, 550, 5):
+            temp = t10 / 10
+            for moisture in range(0, 101):
+                assert crops.score_sample(temp, moisture, season_type) == legacy_scores(temp, moisture, season_type), \
+                    (temp, moisture, season_type)
+                checked += 1
+    return checked
+
+
+def clock():
+    if hasattr(time, "ticks_us"):
+        return time.ticks_us() / 1000000
+    return time.perf_counter()
+
+
+def sensor_walk(rng, n):
+    """Readings that drift like a real sensor's, within one season"""
+    t, m = 25.0, 50.0
+    temps, moistures = [], []
+    for _ in range(n):
+        t = min(45.0, max(5.0, t + rng.uniform(-0.3, 0.3)))
+        m = min(100.0, max(0.0, m + rng.uniform(-0.5, 0.5)))
+        temps.append(int(t))
+        moistures.append(int(m))
+    return temps, moistures, [1] * n
+
+
+def run(name, temps, moistures, seasons):
+    n = len(temps)
+    t0 = clock()
+    for j in range(n):
+        legacy_scores(temps[j], moistures[j], crops.SEASON_TYPES[seasons[j]])
+    legacy = clock() - t0
+
+    t0 = clock()
+    crops._score_batch_arrays(temps, moistures, seasons)
+    arrays = clock() - t0
+
+    distinct = len(set(zip(temps, moistures, seasons)))
+    print("%s: %d samples, %d distinct" % (name, n, distinct))
+    print("  legacy loop    %8.1f ms" % (legacy * 1000))
+    print("  batch (arrays) %8.1f ms" % (arrays * 1000))
+    if crops.np is not None:
+        t0 = clock()
+        scores, best = crops.score_batch(temps, moistures, seasons)
+        numpy_time = clock() - t0
+        ref, ref_best = crops._score_batch_arrays(temps, moistures, seasons)
+        assert list(scores.ravel()) == list(ref) and list(best) == list(ref_best)
+        print("  batch (numpy)  %8.1f ms" % (numpy_time * 1000))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 21600
+    print("equivalent on %d grid points" % check_equivalence())
+
+    rng = random.Random(1)
+    temps = [rng.randint(5, 45) for _ in range(n)]
+    moistures = [rng.randint(0, 100) for _ in range(n)]
+    seasons = [rng.randint(0, 2) for _ in range(n)]
+    run("uniform random", temps, moistures, seasons)
+    run("sensor-like", *sensor_walk(rng, n))
+
+main()
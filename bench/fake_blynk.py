@@ -0,0 +1,203 @@
+"""Local stand-in for the Blynk server, for benchmarks and bench runs of BLYNKAPPCODE
+
+Usage:
+    python bench/fake_blynk.py [port]    # then set BLYNK_SERVER/BLYNK_PORT to it
+
+Speaks the device side of the Blynk protocol (5-byte !BHH header): it
+accepts any login, answers pings, records every virtual_write with its
+arrival time, and can push app-side writes (button presses) back to the
+device with command().
+"""
+import socket
+import struct
+import sys
+import threading
+import time
+
+MSG_RSP = 0
+MSG_PING = 6
+MSG_HW = 20
+MSG_HW_LOGIN = 29
+STATUS_OK = 200
+HEADER = struct.Struct('!BHH')
+
+
+class FakeBlynk:
+    def __init__(self, port=0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', port))
+        self.sock.listen(1)
+        self.port = self.sock.getsockname()[1]
+        self.conn = None
+        self.lock = threading.Lock()
+        self.connected = threading.Event()
+        self.writes = []  # (perf_counter, pin, values)
+        self.pins = {}  # pin -> latest values
+        self.messages = 0
+        self.bytes = 0
+        self.logins = 0
+        self.pings = 0
+        self.msg_id = 0
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.conn = conn
+            self._read(conn)
+
+    def _read(self, conn):
+        buf = b''
+        while True:
+            try:
+                data = conn.recv(4096)
+            except OSError:
+                return
+            if not data:
+                return
+            buf += data
+            while len(buf) >= HEADER.size:
+                cmd, msg_id, length = HEADER.unpack_from(buf)
+                if cmd == MSG_RSP:
+                    buf = buf[HEADER.size:]
+                    continue
+                if len(buf) < HEADER.size + length:
+                    break
+                body = buf[HEADER.size:HEADER.size + length]
+                buf = buf[HEADER.size + length:]
+                self._message(conn, cmd, msg_id, body, HEADER.size + length)
+
+    def _message(self, conn, cmd, msg_id, body, size):
+        with self.lock:
+            self.messages += 1
+            self.bytes += size
+        if cmd == MSG_HW_LOGIN:
+            self.logins += 1
+            conn.sendall(HEADER.pack(MSG_RSP, msg_id, STATUS_OK))
+            self.connected.set()
+        elif cmd == MSG_PING:
+            self.pings += 1
+            conn.sendall(HEADER.pack(MSG_RSP, msg_id, STATUS_OK))
+        elif cmd == MSG_HW:
+            args = body.decode().split('\0')
+            if args[0] == 'vw':
+                pin = int(args[1])
+                with self.lock:
+                    self.writes.append((time.perf_counter(), pin, args[2:]))
+                    self.pins[pin] = args[2:]
+
+    def command(self, pin, *values):
+        """An app-side write to virtual pin `pin`, as the device receives it"""
+        self.msg_id = self.msg_id % 0xffff + 1
+        body = '\0'.join(['vw', str(pin)] + [str(v) for v in values]).encode()
+        self.conn.sendall(HEADER.pack(MSG_HW, self.msg_id, len(body)) + body)
+
+    def reset(self):
+        with self.lock:
+            self.writes = []
+            self.pins = {}
+            self.messages = 0
+            self.bytes = 0
+
+    def close(self):
+        self.sock.close()
+        if self.conn:
+            self.conn.close()
+
+
+class Device:
+    """Minimal device-side connection behaving like BlynkLib's Blynk object
+
+    Built like blynksink.BlynkSink's connect= (auth, connected socket), or
+    by dial(). Login, raw _write(), per-pin virtual_write(), on("V7")
+    handlers and a run() that waits up to the socket's timeout for app
+    commands; the server's login answer is read by run().
+    """
+
+    SOCK_TIMEOUT = 0.05  # BlynkLib's read timeout in run()
+
+    def __init__(self, auth, sock):
+        self.sock = sock
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.settimeout(self.SOCK_TIMEOUT)
+        self.msg_id = 0
+        self.writes = 0  # socket writes, i.e. segments sent
+        self.bytes = 0
+        self.handlers = {}
+        self.buf = b''
+        self._send(MSG_HW_LOGIN, auth)
+
+    @classmethod
+    def dial(cls, port, auth='bench'):
+        return cls(auth, socket.create_connection(('127.0.0.1', port)))
+
+    def on(self, pin):
+        def register(fn):
+            self.handlers[pin] = fn
+            return fn
+        return register
+
+    def run(self):
+        """Dispatch app commands that have arrived, waiting up to SOCK_TIMEOUT"""
+        try:
+            data = self.sock.recv(4096)
+        except socket.timeout:
+            return
+        if not data:
+            raise OSError('server closed the connection')
+        self.buf += data
+        while len(self.buf) >= HEADER.size:
+            cmd, msg_id, length = HEADER.unpack_from(self.buf)
+            if cmd == MSG_RSP:
+                self.buf = self.buf[HEADER.size:]
+                continue
+            if len(self.buf) < HEADER.size + length:
+                break
+            args = self.buf[HEADER.size:HEADER.size + length].decode().split('\0')
+            self.buf = self.buf[HEADER.size + length:]
+            if cmd == MSG_HW and args[0] == 'vw':
+                handler = self.handlers.get('V' + args[1])
+                if handler:
+                    handler(args[2:])
+
+    def _write(self, data):
+        self.sock.sendall(data)
+        self.writes += 1
+        self.bytes += len(data)
+
+    def _send(self, cmd, *args):
+        self.msg_id = self.msg_id % 0xffff + 1
+        body = '\0'.join(map(str, args)).encode()
+        self._write(HEADER.pack(cmd, self.msg_id, len(body)) + body)
+
+    def virtual_write(self, pin, *values):
+        self._send(MSG_HW, 'vw', pin, *values)
+
+    def close(self):
+        self.sock.close()
+
+
+def main():
+    server = FakeBlynk(int(sys.argv[1]) if len(sys.argv) > 1 else 8080)
+    print("fake Blynk server on 127.0.0.1:%d" % server.port)
+    seen = 0
+    try:
+        while True:
+            time.sleep(1)
+            with server.lock:
+                new = server.writes[seen:]
+                seen = len(server.writes)
+            for t, pin, values in new:
+                print("V%d = %s" % (pin, ', '.join(values)))
+    except KeyboardInterrupt:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
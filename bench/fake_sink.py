@@ -0,0 +1,122 @@
+"""Local stand-in for Blynk's HTTP batch endpoint, with an off switch
+
+Usage:
+    python bench/fake_sink.py [port]
+
+Accepts POST /external/api/batch/update?token=..&pin=Vn with a JSON body
+of [[unix ms, value], ...] and keeps every point per pin. mode switches
+how it treats new connections:
+
+  up      answers 200 and records the points
+  down    closes the connection unanswered (server unreachable)
+  hang    accepts and never answers (the client's timeout has to fire)
+"""
+import json
+import socket
+import sys
+import threading
+import time
+
+UP = 'up'
+DOWN = 'down'
+HANG = 'hang'
+
+
+class FakeSink:
+    def __init__(self, port=0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', port))
+        self.sock.listen(8)
+        self.port = self.sock.getsockname()[1]
+        self.mode = UP
+        self.lock = threading.Lock()
+        self.points = {}  # pin -> [(unix ms, value)]
+        self.requests = 0
+        self.refused = 0
+        self.hung = []
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            if self.mode == DOWN:
+                self.refused += 1
+                conn.close()
+            elif self.mode == HANG:
+                self.refused += 1
+                self.hung.append(conn)
+            else:
+                self._handle(conn)
+
+    def _handle(self, conn):
+        buf = b''
+        try:
+            while b'\r\n\r\n' not in buf:
+                data = conn.recv(4096)
+                if not data:
+                    return
+                buf += data
+            head, body = buf.split(b'\r\n\r\n', 1)
+            lines = head.decode().split('\r\n')
+            length = 0
+            for line in lines[1:]:
+                name, _, value = line.partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            while len(body) < length:
+                body += conn.recv(4096)
+            target = lines[0].split(' ')[1]
+            query = dict(kv.split('=', 1) for kv in target.partition('?')[2].split('&') if '=' in kv)
+            pin = int(query['pin'].lstrip('Vv'))
+            points = json.loads(body)
+            with self.lock:
+                self.requests += 1
+                self.points.setdefault(pin, []).extend((ts, value) for ts, value in points)
+            conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+        except (OSError, ValueError, KeyError):
+            conn.sendall(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+        finally:
+            conn.close()
+
+    def set_mode(self, mode):
+        self.mode = mode
+        if mode != HANG:
+            for conn in self.hung:
+                conn.close()
+            self.hung = []
+
+    def reset(self):
+        with self.lock:
+            self.points = {}
+            self.requests = 0
+            self.refused = 0
+
+    def close(self):
+        self.set_mode(DOWN)
+        self.sock.close()
+
+
+def main():
+    sink = FakeSink(int(sys.argv[1]) if len(sys.argv) > 1 else 8081)
+    print("fake batch sink on 127.0.0.1:%d" % sink.port)
+    seen = {}
+    try:
+        while True:
+            time.sleep(1)
+            with sink.lock:
+                for pin, points in sink.points.items():
+                    new = points[seen.get(pin, 0):]
+                    seen[pin] = len(points)
+                    if new:
+                        print("V%d +%d points, last %s" % (pin, len(new), new[-1]))
+    except KeyboardInterrupt:
+        sink.close()
+
+
+if __name__ == '__main__':
+    main()
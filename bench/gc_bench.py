@@ -0,0 +1,93 @@
+"""GC policy benchmark: collect after every request vs adaptive
+
+Usage:
+    python bench/gc_bench.py [seconds]
+
+Serves mainlbrce's async handler on loopback (simulated board) with the
+sampler task running, and drives it with closed-loop clients in two
+traffic shapes: a burst with no think time and paced polling with gaps
+in which idle collections can run. For each GC_POLICY it reports
+requests/sec, p50/p99/max latency and the collections and GC pauses
+taken.
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, from any cwd
+
+import hal
+import hal_sim
+
+hal.use(hal_sim.SimBoard(speed=1, seed=42))
+
+import mainlbrce as app
+import gcpolicy
+import profiler
+from benchstats import percentile
+
+PATHS = ('/', '/data', '/data', '/app.css')
+SCENARIOS = (
+    ('burst', 10, 0),  # name, clients, think time (s)
+    ('paced', 4, 0.02),
+)
+
+
+async def client(port, think, deadline, latencies, i):
+    while time.perf_counter() < deadline:
+        path = PATHS[i % len(PATHS)]
+        i += 1
+        t0 = time.perf_counter()
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        await reader.read()
+        writer.close()
+        latencies.append(time.perf_counter() - t0)
+        if think:
+            await asyncio.sleep(think)
+
+
+async def run(mode, clients, think, seconds):
+    app.gc_policy = gcpolicy.GCPolicy(mode)
+    app.MAX_CLIENTS = clients + 1  # every client served: this measures GC, not the connection cap
+    profiler.reset()
+    server = await asyncio.start_server(app.handle_client, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    sampler = asyncio.create_task(app.sampler_loop())
+    latencies = []
+    t0 = time.perf_counter()
+    deadline = t0 + seconds
+    await asyncio.gather(*(client(port, think, deadline, latencies, i) for i in range(clients)))
+    elapsed = time.perf_counter() - t0
+    sampler.cancel()
+    server.close()
+    await server.wait_closed()
+    latencies.sort()
+    pauses = profiler.stages.get('gc')
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 50) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'max': latencies[-1] * 1000 if latencies else 0,
+        'gcs': pauses.count if pauses else 0,
+        'pause_max': pauses.max / 1000 if pauses else 0,
+        'gc_ms': pauses.sum / 1000 if pauses else 0,
+    }
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    profiler.enable(True)
+    app.sample_sensors()
+    print("%-7s %-9s %8s %8s %8s %8s %6s %9s %8s" % (
+        'traffic', 'policy', 'req/s', 'p50 ms', 'p99 ms', 'max ms', 'gcs', 'pause ms', 'gc ms'))
+    for name, clients, think in SCENARIOS:
+        for mode in ('always', 'adaptive'):
+            r = asyncio.run(run(mode, clients, think, seconds))
+            print("%-7s %-9s %8.0f %8.2f %8.2f %8.2f %6d %9.2f %8.0f" % (
+                name, mode, r['rps'], r['p50'], r['p99'], r['max'], r['gcs'], r['pause_max'], r['gc_ms']))
+
+
+main()
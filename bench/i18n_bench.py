@@ -0,0 +1,83 @@
+"""Translation lookup cost per dashboard page: dotted-path walk vs flat tables
+
+Usage (host or board):
+    python bench/i18n_bench.py
+"""
+import os
+import sys
+import time
+
+try:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, from any cwd
+except (AttributeError, NameError):  # MicroPython (no os.path or __file__): the modules are on the board already
+    pass
+
+import i18n
+
+ROUNDS = 2000
+CROPS = ("maize", "vegetables", "sugarcane", "paddy")
+
+# Keys the pre-template generate_html() looked up for one render, in order
+PAGE_KEYS = [
+    "crops.maize", "status_good", "seasons.rabi_sowing",
+    "manual_water", "auto_mode",
+    "title", "title", "current_season", "auto_mode", "current_season",
+    "predicted_crop", "auto_mode", "temperature", "humidity", "soil_moisture",
+    "tank_level", "rain_status", "irrigation", "change_mode", "suggestion",
+    "best_crop", "crop_score", "refresh", "toggle_pump", "change_mode",
+    "force_water", "stop_water", "logs", "clear_logs",
+    "title", "current_season", "auto_mode", "language",
+]
+for _crop in CROPS:
+    PAGE_KEYS += ["crops." + _crop + ".emoji", "crops." + _crop,
+                  "crops." + _crop + ".name", "crops." + _crop]
+
+
+def legacy_translation(key, lang):
+    """get_translation() before the flat tables"""
+    keys = key.split('.')
+    value = i18n.TRANSLATIONS.get(lang, i18n.TRANSLATIONS["en"])
+    for k in keys:
+        if isinstance(value, dict):
+            value = value.get(k)
+        else:
+            return key
+    return value if value is not None else key
+
+
+def bench_legacy(lang):
+    lookup = legacy_translation
+    for key in PAGE_KEYS:
+        lookup(key, lang)
+
+
+def bench_flat(lang):
+    T = i18n.table(lang)  # language chosen once per request
+    for key in PAGE_KEYS:
+        T.get(key, key)
+
+
+def ticks_us():
+    if hasattr(time, "ticks_us"):
+        return time.ticks_us()
+    return int(time.perf_counter() * 1000000)
+
+
+def run(fn, lang):
+    """Mean microseconds per page"""
+    t0 = ticks_us()
+    for _ in range(ROUNDS):
+        fn(lang)
+    return (ticks_us() - t0) / ROUNDS
+
+
+def main():
+    print("%d lookups per page" % len(PAGE_KEYS))
+    print("lang   legacy_us   flat_us  speedup")
+    for lang, _ in i18n.LANGUAGES:
+        legacy = run(bench_legacy, lang)
+        flat = run(bench_flat, lang)
+        print("%-4s %10.1f %9.1f %7.1fx" % (lang, legacy, flat, legacy / flat if flat else 0))
+
+
+main()
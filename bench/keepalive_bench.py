@@ -0,0 +1,174 @@
+"""Click -> action -> reload latency with and without persistent connections
+
+Usage:
+    python bench/keepalive_bench.py [rounds]
+
+Serves mainlbrce's async handler on loopback (simulated board) behind a
+proxy that adds a round-trip delay, standing in for a farm Wi-Fi link:
+connecting costs one RTT, each request/response one more. Two browser
+flows are replayed, each with a fresh TCP connection per request
+(Connection: close) and over one keep-alive connection:
+
+    action: /control?a=pump, then /data?since=N
+    reload: /lang?l=hi, then /, /app.css and /app.js (304s), /data
+
+Then the connection cap: MAX_CLIENTS + 3 connections are opened at
+once. The first MAX_CLIENTS must be served, the rest answered 503
+before they send anything, and a connection opened once the first ones
+have closed must be served again.
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, from any cwd
+
+import hal
+import hal_sim
+
+hal.use(hal_sim.SimBoard(speed=1, seed=42))
+
+import mainlbrce as app
+
+RTTS_MS = (0, 20, 80)
+
+
+def flows():
+    css_etag = app.STATIC_ASSETS['/app.css'][2]
+    js_etag = app.STATIC_ASSETS['/app.js'][2]
+    return {
+        'action': [('/control?a=pump', {}), ('/data?since=1', {})],
+        'reload': [('/lang?l=hi', {}), ('/', {}),
+                   ('/app.css', {'If-None-Match': css_etag}),
+                   ('/app.js', {'If-None-Match': js_etag}),
+                   ('/data', {}), ('/lang?l=en', {})],
+    }
+
+
+# ==== DELAY PROXY ====
+async def pipe(reader, writer, delay):
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            data = await reader.read(4096)
+            if not data:
+                break
+            loop.call_later(delay, writer.write, data)  # same delay keeps the order
+    except OSError:
+        pass
+    await asyncio.sleep(delay)
+    writer.close()
+
+
+async def start_proxy(target_port, rtt_s):
+    async def handle(reader, writer):
+        await asyncio.sleep(rtt_s)  # SYN / SYN-ACK
+        up_reader, up_writer = await asyncio.open_connection('127.0.0.1', target_port)
+        await asyncio.gather(pipe(reader, up_writer, rtt_s / 2), pipe(up_reader, writer, rtt_s / 2))
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+# ==== CLIENT ====
+async def read_response(reader):
+    """Read one response (Content-Length or chunked); returns the status code"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode().split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers
+
+
+def request(path, headers, keep):
+    extra = ''.join('%s: %s\r\n' % kv for kv in headers.items())
+    connection = 'keep-alive' if keep else 'close'
+    return f"GET {path} HTTP/1.1\r\nHost: bench\r\n{extra}Connection: {connection}\r\n\r\n".encode()
+
+
+async def run_flow(port, steps, keep):
+    t0 = time.perf_counter()
+    conn = None
+    for path, headers in steps:
+        if conn is None:
+            conn = await asyncio.open_connection('127.0.0.1', port)
+        reader, writer = conn
+        writer.write(request(path, headers, keep))
+        await writer.drain()
+        status, resp_headers = await read_response(reader)
+        assert status in (200, 304), (path, status)
+        if not keep or resp_headers.get('connection') != 'keep-alive':
+            writer.close()
+            conn = None
+    if conn:
+        conn[1].close()
+    return (time.perf_counter() - t0) * 1000
+
+
+async def cap_check(port):
+    """Open more connections than MAX_CLIENTS; returns (served, refused, served after)"""
+    conns = []
+    for _ in range(app.MAX_CLIENTS + 3):
+        conns.append(await asyncio.open_connection('127.0.0.1', port))
+        await asyncio.sleep(0.01)  # accepted in order
+    served = refused = 0
+    for i, (reader, writer) in enumerate(conns):
+        if i >= app.MAX_CLIENTS:  # refused without being asked anything
+            status, _ = await asyncio.wait_for(read_response(reader), 2)
+            assert status == 503, status
+            refused += 1
+            writer.close()
+            continue
+        writer.write(request('/data', {}, True))
+        await writer.drain()
+        status, _ = await read_response(reader)
+        assert status == 200, status
+        served += 1
+    for _, writer in conns[:app.MAX_CLIENTS]:
+        writer.close()
+    await asyncio.sleep(0.1)
+    after = await run_flow(port, [('/data', {})], True)
+    return served, refused, after
+
+
+async def bench(rounds):
+    server = await asyncio.start_server(app.handle_client, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    print("%-7s %7s %12s %12s %8s" % ('flow', 'rtt ms', 'close ms', 'keep ms', 'saved'))
+    for rtt in RTTS_MS:
+        proxy, proxy_port = await start_proxy(port, rtt / 1000)
+        for name, steps in flows().items():
+            times = {}
+            for keep in (False, True):
+                runs = sorted([await run_flow(proxy_port, steps, keep) for _ in range(rounds)])
+                times[keep] = runs[len(runs) // 2]
+            print("%-7s %7d %12.1f %12.1f %7.0f%%" % (
+                name, rtt, times[False], times[True], (1 - times[True] / times[False]) * 100))
+        proxy.close()
+        await asyncio.sleep(rtt / 1000 + 0.1)  # let proxied connections drain
+    served, refused, after = await cap_check(port)
+    print("cap: %d connections at once, %d served, %d answered 503 (MAX_CLIENTS %d); next one served in %.1f ms" % (
+        served + refused, served, refused, app.MAX_CLIENTS, after))
+    await asyncio.sleep(0.1)  # the server sees the last connection close
+    server.close()
+    await server.wait_closed()
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    app.sample_sensors()
+    asyncio.run(bench(rounds))
+
+
+main()
@@ -0,0 +1,82 @@
+"""HTTP load benchmark for the dashboard server (run on a laptop, not the ESP32)
+
+Usage:
+    python bench/load_test.py 192.168.1.50
+    python bench/load_test.py 192.168.1.50 --path /data --duration 20
+
+Runs closed-loop clients at 1, 10 and 50 concurrency and reports
+requests/sec plus p50/p99 latency. Compare SERVER_MODE = "serial"
+against "async" in mainlbrce.py by flashing each and re-running.
+"""
+import argparse
+import asyncio
+import time
+
+from benchstats import percentile
+
+LEVELS = (1, 10, 50)
+
+
+async def fetch(host, port, path, timeout):
+    """One GET with a fresh connection, returns (ok, seconds)"""
+    t0 = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        head = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        writer.close()
+        ok = head.startswith(b"HTTP/1.1 200") or head.startswith(b"HTTP/1.0 200")
+    except (OSError, asyncio.TimeoutError):
+        ok = False
+    return ok, time.perf_counter() - t0
+
+
+async def run_level(host, port, path, concurrency, duration, timeout):
+    """Keep `concurrency` clients busy for `duration` seconds"""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            ok, dt = await fetch(host, port, path, timeout)
+            if ok:
+                latencies.append(dt)
+            else:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("host")
+    parser.add_argument("--port", type=int, default=80)
+    parser.add_argument("--path", default="/")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--timeout", type=float, default=15.0)
+    parser.add_argument("--levels", default=",".join(str(n) for n in LEVELS))
+    args = parser.parse_args()
+
+    print(f"{'clients':>8} {'reqs':>6} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for level in (int(n) for n in args.levels.split(",")):
+        r = asyncio.run(run_level(args.host, args.port, args.path, level, args.duration, args.timeout))
+        print(f"{r['concurrency']:>8} {r['requests']:>6} {r['errors']:>6} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
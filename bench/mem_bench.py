@@ -0,0 +1,80 @@
+"""Peak heap per dashboard request: full-string send vs chunked streaming
+
+On the ESP32 (mainlbrce.py and httpwriter.py already on the board):
+    mpremote run bench/mem_bench.py
+
+CPython reports the tracemalloc peak. MicroPython has no peak counter,
+so GC is disabled around each request and the bytes allocated are
+reported instead (an upper bound on the peak).
+"""
+import gc
+import os
+import sys
+
+try:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, from any cwd
+except (AttributeError, NameError):  # MicroPython (no os.path or __file__): the modules are on the board already
+    pass
+
+import mainlbrce
+import httpwriter
+
+ROUNDS = 5
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+class NullSocket:
+    """Counts bytes instead of sending them"""
+
+    def __init__(self):
+        self.sent = 0
+
+    def sendall(self, data):
+        self.sent += len(data)
+
+
+def send_full_page(sock):
+    """Previous behaviour: render the whole page, then one sendall"""
+    html = mainlbrce.generate_html()
+    sock.sendall(html.encode())
+
+
+def send_streamed_page(sock):
+    """Chunks from render_page() through the pooled chunked encoder"""
+    httpwriter.send_chunked(sock, mainlbrce.render_page())
+
+
+def measure(fn):
+    """Peak (or allocated) heap bytes for one call of fn"""
+    sock = NullSocket()
+    gc.collect()
+    if tracemalloc:
+        tracemalloc.start()
+        fn(sock)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    else:
+        gc.disable()
+        before = gc.mem_alloc()
+        fn(sock)
+        peak = gc.mem_alloc() - before
+        gc.enable()
+    return peak, sock.sent
+
+
+def main():
+    mainlbrce.generate_html()  # compile the template and take a first sample
+    print("mode        peak_bytes  body_bytes")
+    for name, fn in (("full", send_full_page), ("streamed", send_streamed_page)):
+        peaks = []
+        for _ in range(ROUNDS):
+            peak, sent = measure(fn)
+            peaks.append(peak)
+        print("%-10s %11d %11d" % (name, max(peaks), sent))
+
+
+main()
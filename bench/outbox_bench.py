@@ -0,0 +1,184 @@
+"""Telemetry through outages: dropped on the floor vs blynksink.BlynkSink's outbox
+
+Usage:
+    python bench/outbox_bench.py
+
+Steps a hal_sim clock through eight hours of one reading per 5 s, fed
+to a BlynkSink polled every step, with Wi-Fi and bench/fake_sink.py (the
+batch endpoint) switched off on a schedule: outages of 20 min, 5 min and
+5 h (longer than the flash ring holds), the 5 min one followed by a
+spell where Wi-Fi and the Blynk link (bench/fake_blynk.py) are back but
+the batch endpoint hangs. Readings the sink takes while it has no Blynk
+link are queued and uploaded once it is back.
+
+  none          BLYNKAPPCODE before the queue: offline readings are lost
+  RAM only      the sink with an Outbox that has no spill file
+  RAM + flash   the sink as configured
+
+It checks that every offline reading reached the batch endpoint or was
+counted as dropped, that within each outage only the oldest were
+dropped, that the endpoint saw them in time order, and reports how fast
+each backlog cleared and the longest single poll() (nothing in it waits
+on a socket, so this stays small even while the endpoint hangs).
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import blynksink
+import hal
+import hal_sim
+import outbox
+from fake_blynk import FakeBlynk, Device
+from fake_sink import FakeSink, UP, DOWN, HANG
+
+STEP_MS = 100
+SAMPLE_MS = 5000
+HOURS = 8
+SCHEDULE_MIN = ((30, 50, DOWN), (60, 65, DOWN), (65, 70, HANG), (120, 420, DOWN))
+TIMEOUT_S = 0.2  # sink timeout for the bench; the device uses outbox.HTTP_TIMEOUT_S
+
+
+def mode_at(ms):
+    minute = ms / 60000
+    for a, b, mode in SCHEDULE_MIN:
+        if a <= minute < b:
+            return mode
+    return UP
+
+
+def outages(seqs):
+    """Split the offline readings into runs of consecutive samples"""
+    runs = []
+    for s in seqs:
+        if runs and runs[-1][-1] == s - 1:
+            runs[-1].append(s)
+        else:
+            runs.append([s])
+    return runs
+
+
+def oldest_dropped(run, delivered):
+    """What reached the sink from one outage is its newest readings"""
+    kept = [s for s in run if s % 30000 in delivered]
+    return kept == run[len(run) - len(kept):]
+
+
+class WiFi:
+    """wifimgr stand-in that follows the schedule"""
+
+    up = True
+
+    def is_up(self):
+        return self.up
+
+
+def snapshot(seq):
+    """A sampler snapshot carrying the reading's sequence number on V0"""
+    return {'soil_value': seq % 30000, 'soil_percent': 50, 'tank_value': 2000, 'tank_percent': 60,
+            'rain': 1, 'temp': 25, 'humidity': 60, 'relay': 1}
+
+
+def run(name, sink, blynk_server, path):
+    board = hal.use(hal_sim.SimBoard(speed=0, seed=1, start=1.7e9))
+    sink.reset()
+    wifi = WiFi()
+    blynk = None
+    if name != 'none':
+        outbox.remove_file(path)
+        blynk = blynksink.BlynkSink('bench', '127.0.0.1', blynk_server.port, wifi, outbox_file=path,
+                                    batch_port=sink.port, connect=Device)
+        if name == 'RAM only':
+            blynk.backlog = outbox.Outbox(7, path, flash_capacity=0)
+        blynk.sink.timeout_ms = int(TIMEOUT_S * 1000)
+    total = HOURS * 3600000
+    seq = 0
+    offline = []  # seq of readings taken offline
+    next_sample = 0
+    worst = 0.0
+    clear_s = []  # per outage: virtual s from reconnect to an empty queue
+    back_at = None
+    while board.ticks_ms() < total:
+        now = board.ticks_ms()
+        mode = mode_at(now)
+        sink.set_mode(mode)
+        wifi.up = mode != DOWN  # a hanging sink still has a live Blynk socket
+        if hal.ticks_diff(now, next_sample) >= 0:
+            next_sample = hal.ticks_add(next_sample, SAMPLE_MS)
+            if blynk is None:
+                if not wifi.up:
+                    offline.append(seq)
+            else:
+                if blynk.blynk is None:
+                    offline.append(seq)  # queued, not sent live
+                blynk(snapshot(seq))
+            seq += 1
+        if blynk is not None:
+            t = time.perf_counter()
+            blynk.poll()
+            worst = max(worst, time.perf_counter() - t)
+            box = blynk.backlog
+            if box.in_flight is not None or blynk.opening is not None:
+                time.sleep(0.001)  # the clock is stepped; give the servers' threads real time to answer
+            if wifi.up and len(box) and back_at is None:
+                back_at = now
+            if back_at is not None and not len(box) and mode == UP:
+                clear_s.append(hal.ticks_diff(now, back_at) / 1000)
+                back_at = None
+        hal.sleep_ms(STEP_MS)
+    if blynk is not None:
+        blynk.wifi.up = False
+        blynk.poll()  # closes the Blynk socket
+    got = [value for ts, value in sink.points.get(0, [])]
+    ts = [t for t, value in sink.points.get(0, [])]
+    unique = set(got)
+    stats = blynk.backlog.stats() if blynk is not None else None
+    dropped = stats['dropped'] if stats else len(offline)
+    return {
+        'offline': len(offline),
+        'delivered': len(unique),
+        'dropped': dropped,
+        'lost': len(offline) - len(unique) - dropped,
+        'oldest_dropped': all(oldest_dropped(run, unique) for run in outages(offline)),
+        'in_order': ts == sorted(ts),
+        'repeats': len(got) - len(unique),
+        'clear_s': clear_s,
+        'worst_ms': worst * 1000,
+        'stats': stats,
+        'requests': sink.requests,
+        'refused': sink.refused,
+    }
+
+
+def main():
+    blynksink.READ_TIMEOUT_S = 1e-6
+    blynk_server = FakeBlynk()
+    sink = FakeSink()
+    path = os.path.join(tempfile.mkdtemp(), 'outbox.bin')
+    print("%d h, one reading per %d s, sink schedule (min): %s" % (
+        HOURS, SAMPLE_MS // 1000, ', '.join('%d-%d %s' % s for s in SCHEDULE_MIN)))
+    print("queue: RAM %d, flash %d records, batches of %d every %d ms, retry %d ms" % (
+        outbox.RAM_CAPACITY, outbox.FLASH_CAPACITY, outbox.DRAIN_BATCH,
+        outbox.DRAIN_INTERVAL_MS, outbox.DRAIN_RETRY_MS))
+    print("%-12s %8s %10s %8s %5s %7s %8s %9s %18s %10s" % (
+        'queue', 'offline', 'delivered', 'dropped', 'lost', 'order', 'repeats', 'requests',
+        'backlog clear s', 'worst ms'))
+    for name in ('none', 'RAM only', 'RAM + flash'):
+        r = run(name, sink, blynk_server, path)
+        order = 'ok' if r['in_order'] and r['oldest_dropped'] else 'BAD'
+        clear = ' '.join('%.0f' % x for x in r['clear_s']) or '-'
+        print("%-12s %8d %10d %8d %5d %7s %8d %9d %18s %10.1f" % (
+            name, r['offline'], r['delivered'], r['dropped'], r['lost'], order,
+            r['repeats'], r['requests'], clear, r['worst_ms']))
+        if name != 'none':
+            print("  stats:", r['stats'])
+    sink.close()
+    blynk_server.close()
+    print("(sink timeout %.1f s; repeats are batches re-offered after a partial send)" % TIMEOUT_S)
+
+
+main()
@@ -0,0 +1,184 @@
+"""Request parser: fragmentation check, fuzzing and parse/route timing
+
+Usage:
+    python bench/parser_fuzz.py [fuzz_cases]
+
+1. Every request in the corpus (and all of them pipelined) is fed split
+   at every byte boundary and in random pieces; the result must match
+   feeding it whole.
+2. Random mutations (byte flips, inserted CR/LF/NUL, truncation, huge
+   lines and bodies) must either parse or raise HTTPError, never
+   anything else, and the buffer must stay within the size caps.
+3. Timing: us per request for whole, 64-byte and 1-byte feeds next to
+   the old single-recv split parser, and the route table lookup next
+   to the old if/elif substring chain.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, from any cwd
+
+import httpparser
+
+CORPUS = [
+    b'GET / HTTP/1.1\r\nHost: 192.168.4.1\r\nUser-Agent: Mozilla/5.0\r\nAccept: text/html\r\n\r\n',
+    b'GET /data?since=42 HTTP/1.1\r\nHost: farm\r\nConnection: keep-alive\r\n\r\n',
+    b'GET /control?a=pump HTTP/1.1\r\nHost: farm\r\n\r\n',
+    b'GET /history?from=1700000000&to=1700003600&step=300 HTTP/1.0\r\n\r\n',
+    b'GET /logs?n=5&lang=te HTTP/1.1\nHost: farm\n\n',  # bare LF
+    b'GET /app.css HTTP/1.1\r\nIf-None-Match: "1a2b3c4d"\r\n\r\n',
+    b'POST /data HTTP/1.1\r\nContent-Length: 11\r\n\r\nhello world',
+    b'\r\nGET /lang?l=hi HTTP/1.1\r\nHost: farm\r\n\r\n',  # stray CRLF first
+]
+
+
+def parse_all(pieces):
+    parser = httpparser.RequestParser()
+    out = []
+    for piece in pieces:
+        for r in parser.feed(piece):
+            out.append((r.method, r.path, sorted(r.query.items()), r.version, sorted(r.headers.items()), r.body))
+    return out, parser
+
+
+def split_every(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+# ==== 1. FRAGMENTATION ====
+def check_fragmentation(rng):
+    checked = 0
+    for message in CORPUS + [b''.join(CORPUS)]:
+        whole, _ = parse_all([message])
+        assert whole, message
+        for cut in range(1, len(message)):
+            assert parse_all([message[:cut], message[cut:]])[0] == whole, (message, cut)
+            checked += 1
+        for _ in range(50):
+            pieces, pos = [], 0
+            while pos < len(message):
+                n = rng.randint(1, 40)
+                pieces.append(message[pos:pos + n])
+                pos += n
+            assert parse_all(pieces)[0] == whole, message
+            checked += 1
+    assert len(parse_all([b''.join(CORPUS)])[0]) == len(CORPUS)
+    return checked
+
+
+# ==== 2. FUZZ ====
+def mutate(rng, data):
+    data = bytearray(data)
+    for _ in range(rng.randint(1, 4)):
+        kind = rng.randrange(6)
+        pos = rng.randrange(len(data) + 1)
+        if kind == 0 and data:
+            data[min(pos, len(data) - 1)] = rng.randrange(256)
+        elif kind == 1:
+            data[pos:pos] = rng.choice([b'\r', b'\n', b'\0', b':', b' ', b'%', b'\r\n\r\n'])
+        elif kind == 2:
+            del data[pos:]
+        elif kind == 3:
+            data[pos:pos] = b'A' * rng.choice([500, 1100, 5000])
+        elif kind == 4:
+            data[pos:pos] = b'\r\nContent-Length: %d' % rng.choice([-1, 5, 2000, 10 ** 12])
+        else:
+            data[pos:pos] = bytes(rng.randrange(256) for _ in range(rng.randint(1, 20)))
+    return bytes(data)
+
+
+def fuzz(rng, cases):
+    outcomes = {'parsed': 0, 'rejected': 0, 'incomplete': 0}
+    limit = httpparser.MAX_LINE + httpparser.MAX_BODY + 64
+    for _ in range(cases):
+        data = mutate(rng, rng.choice(CORPUS))
+        parser = httpparser.RequestParser()
+        try:
+            done = []
+            for piece in split_every(data, rng.choice([1, 7, 64, 1024])):
+                done += parser.feed(piece)
+                assert len(parser.buf) <= limit, len(parser.buf)
+        except httpparser.HTTPError as e:
+            assert e.status[:3].isdigit()
+            outcomes['rejected'] += 1
+            continue
+        outcomes['parsed' if done and not parser.partial() else 'incomplete'] += 1
+    return outcomes
+
+
+# ==== 3. TIMING ====
+def legacy_parse(request):
+    """parse_request() before the incremental parser"""
+    lines = request.split('\r\n')
+    parts = lines[0].split()
+    if len(parts) < 2:
+        return None
+    headers = {}
+    for line in lines[1:]:
+        if not line:
+            break
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return parts[0], parts[1], headers
+
+
+def legacy_route(path):
+    """The old if/elif chain's order of substring tests"""
+    if path == '/' or '/dashboard' in path:
+        return 'page'
+    elif '/control' in path:
+        return 'control'
+    elif '/lang' in path:
+        return 'lang'
+    elif '/data' in path:
+        return 'data'
+    elif path.startswith('/history'):
+        return 'history'
+    elif path.startswith('/logs'):
+        return 'logs'
+    elif path == '/stats':
+        return 'stats'
+    elif path == '/metrics':
+        return 'metrics'
+    return None
+
+
+ROUTES = dict.fromkeys(('/', '/dashboard', '/control', '/lang', '/data', '/history', '/logs', '/stats', '/metrics'), 1)
+
+
+def per_call_us(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def timing():
+    message = CORPUS[1]
+    text = message.decode()
+    print("parse, us/request:")
+    print("  %-24s %8.2f" % ('legacy split', per_call_us(lambda: legacy_parse(text), 20000)))
+    for size in (len(message), 64, 1):
+        pieces = split_every(message, size)
+        label = 'incremental, whole' if size == len(message) else 'incremental, %d B feeds' % size
+        print("  %-24s %8.2f" % (label,
+                                per_call_us(lambda: parse_all(pieces), 5000 if size > 1 else 500)))
+    print("route lookup, us:")
+    for path in ('/', '/metrics', '/nope'):
+        legacy = per_call_us(lambda: legacy_route(path), 100000)
+        table = per_call_us(lambda: ROUTES.get(path), 100000)
+        print("  %-10s legacy %6.3f   table %6.3f" % (path, legacy, table))
+
+
+def main():
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = random.Random(1)
+    print("fragmentation: %d splits identical to whole-message parse" % check_fragmentation(rng))
+    print("fuzz (%d cases): %s" % (cases, fuzz(rng, cases)))
+    timing()
+
+
+main()
@@ -0,0 +1,181 @@
+"""Dashboard viewers: polling /data vs the /events push stream
+
+Usage:
+    python bench/push_bench.py [seconds]
+
+Serves mainlbrce's async handler and sampler on loopback (simulated
+board) with the sample and poll periods scaled down 10x (200 ms and
+500 ms instead of 2 s and 5 s). For 1, 4 and 8 viewers it counts how
+often the /data fields are rebuilt and how many bytes go out, while a
+separate client toggles the mode now and then and every viewer records
+how long the change took to reach it. Push viewers beyond
+MAX_SUBSCRIBERS get a 503 and poll instead, as the page does; a poll
+answered 503 because MAX_CLIENTS connections are open is counted and
+retried at the next poll.
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, from any cwd
+
+import hal
+import hal_sim
+
+hal.use(hal_sim.SimBoard(speed=1, seed=42))
+
+import mainlbrce as app
+import push
+
+SAMPLE_MS = 200
+POLL_S = 0.5
+VIEWERS = (1, 4, 8)
+
+builds = [0]
+build_data_fields = app.build_data_fields
+
+
+def counted_build():
+    builds[0] += 1
+    return build_data_fields()
+
+
+app.build_data_fields = counted_build
+
+
+class Viewer:
+    def __init__(self):
+        self.mode = None
+        self.seen = {}  # mode -> perf_counter when it arrived
+        self.received = 0
+        self.pushed = False
+        self.busy = 0  # polls answered 503 at MAX_CLIENTS
+
+    def apply(self, d):
+        if 'mode' in d and d['mode'] != self.mode:
+            self.mode = d['mode']
+            self.seen.setdefault(self.mode, []).append(time.perf_counter())
+
+
+async def get(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return int(data.split(b' ', 2)[1]), data
+
+
+async def poller(port, viewer, deadline):
+    seq = 0
+    while time.perf_counter() < deadline:
+        status, data = await get(port, '/data?since=%d' % seq)
+        viewer.received += len(data)
+        if status == 503:  # too many connections; the page tries again at the next poll
+            viewer.busy += 1
+            await asyncio.sleep(POLL_S)
+            continue
+        d = json.loads(data.partition(b'\r\n\r\n')[2])
+        seq = d['seq']
+        viewer.apply(d)
+        await asyncio.sleep(POLL_S)
+
+
+async def listener(port, viewer, deadline):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b"GET /events HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n")
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    if not head.startswith(b'HTTP/1.1 200'):
+        writer.close()
+        await poller(port, viewer, deadline)
+        return
+    viewer.pushed = True
+    viewer.received += len(head)
+    try:
+        while True:
+            left = deadline - time.perf_counter()
+            if left <= 0:
+                break
+            try:
+                block = await asyncio.wait_for(reader.readuntil(b'\n\n'), left)
+            except asyncio.TimeoutError:
+                break
+            viewer.received += len(block)
+            for line in block.split(b'\n'):
+                if line.startswith(b'data: '):
+                    viewer.apply(json.loads(line[6:]))
+    finally:
+        writer.close()
+
+
+async def toggler(port, deadline, changes):
+    rng = random.Random(7)
+    await asyncio.sleep(1)
+    while time.perf_counter() < deadline - 1.5:
+        await asyncio.sleep(rng.uniform(0.6, 1.2))
+        while (await get(port, '/control?a=mode'))[0] == 503:
+            await asyncio.sleep(0.05)
+        changes.append((app.system_mode, time.perf_counter()))
+
+
+def latencies(viewers, changes):
+    """ms from each toggle to each viewer first seeing that mode"""
+    out = []
+    for mode, t in changes:
+        for v in viewers:
+            later = [s for s in v.seen.get(mode, ()) if s >= t]
+            if later:
+                out.append((later[0] - t) * 1000)
+    return sorted(out)
+
+
+async def run(pushed, n, seconds):
+    app.system_mode = 'auto'
+    server = await asyncio.start_server(app.handle_client, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    sampler = asyncio.create_task(app.sampler_loop())
+    await asyncio.sleep(0.05)
+    builds[0] = 0
+    deadline = time.perf_counter() + seconds
+    viewers = [Viewer() for _ in range(n)]
+    changes = []
+    client = listener if pushed else poller
+    await asyncio.gather(toggler(port, deadline, changes),
+                         *(client(port, v, deadline) for v in viewers))
+    await asyncio.sleep(0.5)  # closed streams are noticed at the next heartbeats
+    sampler.cancel()
+    server.close()
+    await server.wait_closed()
+    lat = latencies(viewers, changes)
+    return {
+        'builds': builds[0] / seconds,
+        'kb': sum(v.received for v in viewers) / seconds / 1024,
+        'live': sum(v.pushed for v in viewers),
+        'busy': sum(v.busy for v in viewers),
+        'p50': lat[len(lat) // 2] if lat else 0,
+        'max': lat[-1] if lat else 0,
+    }
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 6
+    app.SAMPLE_PERIOD_MS = SAMPLE_MS
+    app.sampler.period_ms = SAMPLE_MS
+    push.HEARTBEAT_S = 0.1
+    app.sample_sensors()
+    print("sample %d ms, poll %d ms, MAX_SUBSCRIBERS %d" % (SAMPLE_MS, POLL_S * 1000, app.MAX_SUBSCRIBERS))
+    print("%-6s %7s %5s %9s %8s %11s %10s %5s" % (
+        'mode', 'viewers', 'live', 'builds/s', 'KB/s', 'p50 lat ms', 'max lat ms', '503s'))
+    for n in VIEWERS:
+        for pushed in (False, True):
+            r = asyncio.run(run(pushed, n, seconds))
+            print("%-6s %7d %5d %9.1f %8.1f %11.1f %10.1f %5d" % (
+                'push' if pushed else 'poll', n, r['live'], r['builds'], r['kb'], r['p50'], r['max'], r['busy']))
+    print("stats:", app.push_hub.stats())
+
+
+main()
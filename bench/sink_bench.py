@@ -0,0 +1,150 @@
+"""Cost per sink: one sensor read fanned out to 0..4 sinks
+
+Usage:
+    python bench/sink_bench.py [samples]
+
+Imports mainlbrce on a stepped hal_sim board, wraps its sensors to
+count hardware reads, then takes `samples` samples with the sinks added
+one at a time:
+
+  history    history.HistoryStore in a temp directory
+  dashboard  publish_data() with one live /events viewer
+  blynk      blynksink.BlynkSink connected to bench/fake_blynk.py
+  log        the serial line (printed to /dev/null)
+
+For each step it reports hardware reads per sample, the wall time per
+sample (read + fan-out), the time inside the sinks and in the newest one
+(the sampler's own per-sink timings) and the Blynk poll() that flushes
+the socket outside the sample. Wall time also moves with cache and
+scheduler effects of the socket work between samples; the per-sink
+timings are the cost of the sink itself. The last line is the two
+old programs side by side on one board: each read the sensors itself.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, from any cwd
+
+import hal
+import hal_sim
+
+board = hal.use(hal_sim.SimBoard(speed=0, seed=4))
+
+import blynksink
+import history
+import mainlbrce as app
+from control import Stat
+from fake_blynk import FakeBlynk, Device
+
+STEP_MS = 2000
+
+
+class Counted:
+    """Sensor wrapper counting hardware accesses"""
+
+    reads = 0
+
+    def __init__(self, dev):
+        self.dev = dev
+
+    def read(self):
+        Counted.reads += 1
+        return self.dev.read()
+
+    def measure(self):
+        Counted.reads += 1
+        return self.dev.measure()
+
+    def temperature(self):
+        return self.dev.temperature()
+
+    def humidity(self):
+        return self.dev.humidity()
+
+
+class WiFiUp:
+    state = 'up'
+
+    def is_up(self):
+        return True
+
+
+def sinks(tmp, server):
+    app.history_store = history.HistoryStore(tmp, clock=hal.time)
+    app.push_hub.subscribe(0)
+    blynksink.READ_TIMEOUT_S = 1e-6
+    sink = blynksink.BlynkSink('bench', '127.0.0.1', server.port, WiFiUp(),
+                               outbox_file=os.path.join(tmp, 'outbox.bin'), connect=Device)
+    while sink.blynk is None:  # the connect finishes over a few polls
+        sink.poll()
+        time.sleep(0.001)
+    app.blynk_sink = sink
+    return (
+        ('history', app.record_history),
+        ('dashboard', lambda data: app.publish_data()),
+        ('blynk', sink),
+        ('log', app.log_sample),
+    )
+
+
+def run(samples):
+    Counted.reads = 0
+    total = 0
+    poll = 0
+    for _ in range(samples):
+        t0 = time.perf_counter()
+        app.sampler.sample()
+        t1 = time.perf_counter()
+        if app.blynk_sink:
+            app.blynk_sink.poll()
+        total += t1 - t0
+        poll += time.perf_counter() - t1
+        hal.sleep_ms(STEP_MS)
+    return Counted.reads / samples, total / samples * 1e6, poll / samples * 1e6
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    app.soil = Counted(app.soil)
+    app.tank = Counted(app.tank)
+    app.rain_sensor = Counted(app.rain_sensor)
+    app.dht_sensor = Counted(app.dht_sensor)
+    tmp = tempfile.mkdtemp()
+    server = FakeBlynk()
+    steps = sinks(tmp, server)
+    app.sampler.sinks = []
+    app.blynk_sink = None
+    blynk = None
+    print("%d samples per row" % samples)
+    print("%-34s %12s %10s %9s %10s %13s" % (
+        'sinks', 'reads/sample', 'us/sample', 'sinks us', 'newest us', 'blynk poll us'))
+    out = io.StringIO()
+    for i in range(len(steps) + 1):
+        if i:
+            name, fn = steps[i - 1]
+            app.sampler.add_sink(name, fn)
+            if name == 'blynk':
+                blynk = fn
+                app.blynk_sink = blynk
+        for sink in app.sampler.sinks:
+            sink.cost_us = Stat()
+        with contextlib.redirect_stdout(out):
+            reads, us, poll = run(samples)
+        out.seek(0)
+        out.truncate()
+        sinks_us = sum(s.cost_us.total for s in app.sampler.sinks) / samples
+        newest = '%.1f' % (app.sampler.sinks[-1].cost_us.total / samples) if i else '-'
+        names = ' + '.join(s.name for s in app.sampler.sinks) or '(none)'
+        print("%-34s %12.1f %10.1f %9.1f %10s %13s" % (
+            names, reads, us, sinks_us, newest, '%.1f' % poll if blynk else '-'))
+    print("errors:", dict((s.name, s.errors) for s in app.sampler.sinks))
+    print("two programs on one board: %.1f reads/sample (each read the sensors itself)" % (2 * reads))
+    print("blynk:", blynk.stats()['uplink'], "fake server messages", server.messages)
+    server.close()
+
+
+main()
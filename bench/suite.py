@@ -0,0 +1,245 @@
+"""Benchmark suite: time and allocations of the hot paths, on the simulated board
+
+Usage:
+    python bench/suite.py                         # run, print table
+    python bench/suite.py --save base.json        # keep as a baseline
+    python bench/suite.py --baseline base.json    # compare, exit 1 on regressions
+    python bench/suite.py --only render           # cases whose name contains 'render'
+
+Runs mainlbrce on hal_sim with a fixed seed, a stepped clock and a fixed
+date, so every run sees the same sensor values and season. Each case is
+timed over several repeats (median and fastest us/op) and then run once
+more under tracemalloc for the peak bytes one call allocates. Baselines
+are compared on the fastest repeat, the one least disturbed by the rest
+of the machine. The HTTP cases go through a loopback socket to the real
+async handler.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, from any cwd
+
+import hal
+import hal_sim
+
+SEED = 42
+START = 1736000000  # 2025-01-04: rabi season
+TARGET_S = 0.1  # time per repeat
+REPEATS = 11
+TOLERANCE = 25  # % slower than baseline (fastest repeat) counts as a regression
+
+hal.use(hal_sim.SimBoard(speed=0, seed=SEED, start=START))
+
+import mainlbrce as app
+import i18n
+
+
+def git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+# ==== CASES ====
+def render(lang):
+    def case():
+        app.current_language = lang
+        app.generate_html()
+    return case
+
+
+def predict_cached():
+    app.predict_best_crop(SNAPSHOT)
+
+
+def predict_uncached():
+    app.prediction_cache.clear()
+    app.predict_best_crop(SNAPSHOT)
+
+
+TRANSLATION_KEYS = [k for k in i18n.TABLES['en'] if '.' not in k]
+
+
+def translate_all():
+    get = app.get_translation
+    for key in TRANSLATION_KEYS:
+        get(key, 'hi')
+
+
+def read_sensors():
+    app.read_sensors()
+
+
+def analyze_conditions():
+    app.analyze_conditions(SNAPSHOT)
+
+
+class Loopback:
+    """The real async handler on 127.0.0.1 and a client that reads whole responses"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(app.handle_client, '127.0.0.1', 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def _get(self, path):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        data = await reader.read()
+        writer.close()
+        if not data.startswith(b"HTTP/1.1 200"):
+            raise RuntimeError(f"{path}: {data[:40]!r}")
+        return data
+
+    def case(self, path):
+        def case():
+            self.loop.run_until_complete(self._get(path))
+        return case
+
+    def close(self):
+        self.server.close()
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.close()
+
+
+def build_cases(loopback):
+    cases = [('render_html[%s]' % code, render(code)) for code, _ in i18n.LANGUAGES]
+    cases += [
+        ('predict_best_crop[cached]', predict_cached),
+        ('predict_best_crop[uncached]', predict_uncached),
+        ('get_translation[all keys]', translate_all),
+        ('read_sensors', read_sensors),
+        ('analyze_conditions', analyze_conditions),
+    ]
+    for path in ('/', '/data', '/stats'):
+        cases.append(('http[%s]' % path, loopback.case(path)))
+    return cases
+
+
+# ==== MEASUREMENT ====
+def calibrate(fn):
+    """Iterations per repeat so one repeat takes about TARGET_S"""
+    n = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= TARGET_S / 10 or n >= 1 << 20:
+            return max(1, int(n * TARGET_S / max(elapsed, 1e-9)))
+        n *= 2
+
+
+def time_case(fn):
+    n = calibrate(fn)
+    per_op = []
+    for _ in range(REPEATS):
+        gc.collect()
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        per_op.append((time.perf_counter() - t0) / n * 1e6)
+    per_op.sort()
+    return {'us_per_op': round(per_op[len(per_op) // 2], 2),
+            'us_min': round(per_op[0], 2), 'ops': n * REPEATS}
+
+
+def alloc_case(fn):
+    """Peak bytes above the starting heap during one call"""
+    fn()  # warm caches so steady state is measured
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'peak_bytes': peak - base}
+
+
+def run(only=None):
+    global SNAPSHOT
+    SNAPSHOT = app.sample_sensors()
+    loopback = Loopback()
+    results = {}
+    try:
+        for name, fn in build_cases(loopback):
+            if only and only not in name:
+                continue
+            result = time_case(fn)
+            result.update(alloc_case(fn))
+            results[name] = result
+            print("  %-30s %10.2f us %10d B" % (name, result['us_per_op'], result['peak_bytes']))
+    finally:
+        loopback.close()
+        app.current_language = 'en'
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'revision': git_revision(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'seed': SEED,
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Print deltas against a baseline; returns the names that got slower"""
+    slower = []
+    base = baseline['results']
+    print("\n%-30s %10s %10s %8s %10s" % ('case', 'base us', 'now us', 'delta', 'bytes'))
+    for name, now in current['results'].items():
+        old = base.get(name)
+        if not old:
+            print("%-30s %10s %10.2f %8s %10d" % (name, '-', now['us_min'], 'new', now['peak_bytes']))
+            continue
+        delta = (now['us_min'] - old['us_min']) / old['us_min'] * 100
+        bytes_delta = now['peak_bytes'] - old['peak_bytes']
+        flag = ''
+        if delta > tolerance:
+            flag = '  SLOWER'
+            slower.append(name)
+        print("%-30s %10.2f %10.2f %+7.1f%% %+10d%s" % (
+            name, old['us_min'], now['us_min'], delta, bytes_delta, flag))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare against this JSON file')
+    parser.add_argument('--only', help='run only cases containing this string')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='%% slowdown reported as a regression (default %(default)s)')
+    args = parser.parse_args()
+
+    print("benchmark suite (seed %d)" % SEED)
+    current = run(args.only)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(current, f, indent=2)
+        print("saved", args.save)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        slower = compare(current, baseline, args.tolerance)
+        if slower:
+            print("\n%d case(s) slower than baseline by more than %g%%" % (len(slower), args.tolerance))
+            sys.exit(1)
+
+
+main()
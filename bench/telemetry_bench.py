@@ -0,0 +1,103 @@
+"""Telemetry size and encode cost: JSON /data vs /data?fmt=bin, Blynk per-pin vs batch
+
+Usage:
+    python bench/telemetry_bench.py
+
+HTTP side runs mainlbrce on hal_sim (fixed seed, stepped clock). Blynk
+messages are framed the way BlynkLib does it (5-byte header, values
+joined by NUL, one send per virtual_write); wire bytes add 40 bytes of
+TCP/IP header per message since each write goes out as its own segment.
+"""
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, from any cwd
+
+import hal
+import hal_sim
+
+hal.use(hal_sim.SimBoard(speed=0, seed=42, start=1736000000))
+
+import mainlbrce as app
+import telemetry
+
+ROUNDS = 2000
+IP_OVERHEAD = 40
+MSG_HW = 20
+
+
+def per_call_us(fn, n=ROUNDS):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+# ==== BLYNK FRAMING (as BlynkLib) ====
+msg_id = [0]
+
+
+def blynk_pack(*args):
+    msg_id[0] = msg_id[0] % 0xffff + 1
+    body = '\0'.join(map(str, args)).encode()
+    return struct.pack('!BHH', MSG_HW, msg_id[0], len(body)) + body
+
+
+SOIL_MSG = ("Soil Dry", "Soil Moist", "Soil Wet")
+TANK_MSG = ("Tank Low", "Tank OK")
+RAIN_MSG = ("No Rain", "Rain")
+
+
+def per_pin(values):
+    soil_val, soil_state, tank_val, tank_state, raining, temp, hum = values
+    return [blynk_pack('vw', 0, soil_val), blynk_pack('vw', 1, SOIL_MSG[soil_state]),
+            blynk_pack('vw', 2, tank_val), blynk_pack('vw', 3, TANK_MSG[tank_state]),
+            blynk_pack('vw', 4, RAIN_MSG[raining]), blynk_pack('vw', 5, temp),
+            blynk_pack('vw', 6, hum)]
+
+
+def batch(values):
+    return [blynk_pack('vw', telemetry.BLYNK_PIN, *values)]
+
+
+def wire(messages):
+    return sum(len(m) + IP_OVERHEAD for m in messages)
+
+
+def http_size(status, ctype, body, extra):
+    head, body = app.frame_response(status, ctype, body, extra)
+    return len(head) + len(body)
+
+
+def main():
+    app.sample_sensors()
+    full = app.data_payload(0)
+    seq = app.data_seq
+    hal.sleep_ms(app.SAMPLE_PERIOD_MS)
+    app.sample_sensors()
+    delta = app.data_payload(seq)
+    record = app.telemetry_record()
+    assert telemetry.decode(record)['soil'] == app.sampler.data['soil_percent']
+
+    print("/data representation        body B   response B   us/call")
+    rows = (
+        ('json, full', full, 'application/json', lambda: app.data_payload(0)),
+        ('json, delta after a sample', delta, 'application/json', None),
+        ('bin (%d fields)' % len(telemetry.FIELDS), record, 'application/octet-stream', app.telemetry_record),
+    )
+    for name, body, ctype, fn in rows:
+        cost = '%9.1f' % per_call_us(fn) if fn else '%9s' % '-'
+        print("  %-26s %7d %12d %s" % (name, len(body), http_size('200 OK', ctype, body, ''), cost))
+
+    values = (2710, 0, 1480, 0, 0, 31, 62)
+    print("\nBlynk uplink per reading    messages   payload B   wire B   us/reading")
+    for name, fn in (('per-pin V0-V6', per_pin), ('batch V%d' % telemetry.BLYNK_PIN, batch)):
+        messages = fn(values)
+        print("  %-26s %8d %11d %8d %12.1f" % (
+            name, len(messages), sum(len(m) for m in messages), wire(messages), per_call_us(lambda: fn(values))))
+
+
+main()
@@ -0,0 +1,167 @@
+"""Blynk uplink traffic: BLYNKAPPCODE's old write-everything loop vs blynksink.BlynkSink
+
+Usage:
+    python bench/uplink_bench.py [hours]
+
+Replays `hours` of a reading every 5 s on a stepped hal_sim farm (same
+seed for both), against bench/fake_blynk.py over loopback: once with
+the old program's writes (V0-V6 every cycle plus V7 on every
+pump_control() call) and once through the runtime, mainlbrce's sampler,
+controller and pump with a BlynkSink polled every POLL_MS as poll_tasks()
+does. Reports messages, socket writes, bytes (payload and with 40 B
+TCP/IP per write) and the uplink counters, and checks that the server
+ends up holding the last reading within the sink's deadbands.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import hal
+import hal_sim
+from fake_blynk import FakeBlynk, Device
+
+CYCLE_MS = 5000
+POLL_MS = 1000  # sink polls per simulated second; the uplink sends at most once a second anyway
+SEED = 11
+IP_OVERHEAD = 40
+DEADBANDS = {0: 40, 2: 40, 5: 1, 6: 2}  # blynksink.DEADBANDS, for the check
+
+dry_threshold = 2700
+wet_threshold = 2300
+tank_low_threshold = 1500
+SOIL_MSG = ("Soil Dry", "Soil Moist", "Soil Wet")
+TANK_MSG = ("Tank Low", "Tank OK")
+RAIN_MSG = ("No Rain", "Rain")
+
+
+class Farm:
+    """BLYNKAPPCODE's devices on a fresh simulated board"""
+
+    def __init__(self):
+        board = hal.use(hal_sim.SimBoard(speed=0, seed=SEED))
+        self.soil = board.adc('soil', 34, span=(3000, 2000))
+        self.tank = board.adc('tank', 35, span=(1000, 3500))
+        self.rain = board.input('rain', 22)
+        self.relay = board.output('relay', 13, 1)
+        self.dht = board.dht11('dht', 4)
+
+    def read(self):
+        self.dht.measure()
+        soil_val = self.soil.read()
+        tank_val = self.tank.read()
+        soil_state = 0 if soil_val > dry_threshold else 2 if soil_val < wet_threshold else 1
+        tank_state = 0 if tank_val < tank_low_threshold else 1
+        raining = 1 if self.rain.value() == 0 else 0
+        return soil_val, soil_state, tank_val, tank_state, raining, self.dht.temperature(), self.dht.humidity()
+
+
+class WiFiUp:
+    def is_up(self):
+        return True
+
+
+def legacy(cycles, server):
+    """The old program: every pin written every cycle"""
+    farm = Farm()
+    device = Device.dial(server.port)
+    server.connected.wait(2)
+    settle(server, device)
+    server.reset()
+    device.writes = device.bytes = 0
+
+    def pump_control(state):
+        farm.relay.value(0 if state else 1)
+        device.virtual_write(7, 1 if state else 0)
+
+    for _ in range(cycles):
+        values = farm.read()
+        soil_val, soil_state, tank_val, tank_state, raining, temp, hum = values
+        if raining:
+            pump_control(False)
+        elif soil_state == 0:
+            pump_control(True)
+        else:
+            pump_control(False)
+        if raining:
+            pump_control(False)
+        device.virtual_write(0, soil_val)
+        device.virtual_write(1, SOIL_MSG[soil_state])
+        device.virtual_write(2, tank_val)
+        device.virtual_write(3, TANK_MSG[tank_state])
+        device.virtual_write(4, RAIN_MSG[raining])
+        device.virtual_write(5, temp)
+        device.virtual_write(6, hum)
+        hal.sleep_ms(CYCLE_MS)
+    return values, device, None
+
+
+def batched(cycles, server):
+    """mainlbrce's sampler, controller and pump with blynksink.BlynkSink as the only sink"""
+    hal.use(hal_sim.SimBoard(speed=0, seed=SEED))
+    import blynksink
+    import mainlbrce as app
+    blynksink.READ_TIMEOUT_S = 1e-6
+    sink = blynksink.BlynkSink('bench', '127.0.0.1', server.port, WiFiUp(),
+                               outbox_file=os.path.join(tempfile.mkdtemp(), 'outbox.bin'), connect=Device)
+    while sink.blynk is None:  # the connect finishes over a few polls
+        sink.poll()
+        time.sleep(0.001)
+    server.connected.wait(2)
+    settle(server, sink.blynk)
+    server.reset()
+    device = sink.blynk
+    device.writes = device.bytes = 0
+    app.sampler.sinks = []
+    app.sampler.add_sink('blynk', sink)
+    app.sampler.period_ms = CYCLE_MS
+    app.blynk_sink = sink
+    for _ in range(cycles * CYCLE_MS // POLL_MS):
+        app.poll_tasks()
+        hal.sleep_ms(POLL_MS)
+    return blynksink.values(app.sampler.data), device, sink.link
+
+
+def settle(server, device):
+    """Wait until the server has parsed everything the device sent"""
+    deadline = time.time() + 5
+    while server.bytes < device.bytes and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def check(server, values):
+    """Server's pins match the last reading, up to the deadbands"""
+    soil_val, soil_state, tank_val, tank_state, raining, temp, hum = values
+    expect = {0: soil_val, 1: SOIL_MSG[soil_state], 2: tank_val, 3: TANK_MSG[tank_state],
+              4: RAIN_MSG[raining], 5: temp, 6: hum}
+    for pin, value in expect.items():
+        got = server.pins[pin][0]
+        band = DEADBANDS.get(pin)
+        if band:
+            assert abs(float(got) - value) < band, (pin, got, value)
+        else:
+            assert got == str(value), (pin, got, value)
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 6
+    cycles = int(hours * 3600000 / CYCLE_MS)
+    server = FakeBlynk()
+    print("%d cycles (%.1f h at %d s)" % (cycles, hours, CYCLE_MS // 1000))
+    print("%-9s %9s %9s %10s %10s %s" % ('uplink', 'messages', 'writes', 'payload B', 'wire B', 'counters'))
+    for name, run in (('legacy', legacy), ('BlynkSink', batched)):
+        server.connected.clear()
+        values, device, link = run(cycles, server)
+        settle(server, device)
+        check(server, values)
+        print("%-9s %9d %9d %10d %10d %s" % (
+            name, server.messages, device.writes, server.bytes,
+            server.bytes + device.writes * IP_OVERHEAD, link.stats() if link else ''))
+        device.close()
+    server.close()
+
+
+main()
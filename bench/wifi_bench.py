@@ -0,0 +1,112 @@
+"""Wi-Fi through outages: old blocking connect vs wifimgr.WiFiManager
+
+Usage:
+    python bench/wifi_bench.py
+
+Steps a hal_sim board through three hours with the network switched
+off on a fixed schedule (including at boot) and compares:
+
+  boot-once   mainlbrce's old connect_wifi(): 20 s of tries at boot, then
+              AP mode for good, the station never retried
+  manager     WiFiManager polled every 100 ms
+
+For each it reports how much of the time the network was reachable the
+station was actually up, drops/reconnects, total downtime, how long
+after each outage the link was back, and when local control could
+start (the old Blynk loop spun on isconnected() before its first cycle).
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, from any cwd
+
+import hal
+import hal_sim
+import wifimgr
+
+STEP_MS = 100
+HOURS = 3
+OUTAGES_MIN = ((0, 3), (40, 45), (80, 81), (120, 150))  # network unreachable, minutes
+
+
+def reachable(ms):
+    minute = ms / 60000
+    return not any(a <= minute < b for a, b in OUTAGES_MIN)
+
+
+def outage_ends():
+    return [b * 60000 for a, b in OUTAGES_MIN]
+
+
+def boot_once(board, sta, ap):
+    """connect_wifi() before the manager; returns the station, which is never polled again"""
+    sta.active(True)
+    sta.connect('farm', 'secret')
+    for _ in range(20):
+        if sta.isconnected():
+            return
+        hal.sleep_ms(1000)
+    ap.active(True)
+
+
+def run(strategy):
+    board = hal.use(hal_sim.SimBoard(speed=0, seed=1))
+    sta = board.wlan('sta')
+    ap = board.wlan('ap')
+    total = HOURS * 3600000
+    manager = None
+    control_start = None
+    if strategy == 'manager':
+        manager = wifimgr.WiFiManager(sta, 'farm', 'secret', ap, 'SmartFarm-AP', 'pw')
+        control_start = 0  # the loop runs from the first pass
+    else:
+        board.wifi_reachable = reachable(0)
+        boot_once(board, sta, ap)
+    reach_ms = up_ms = 0
+    ups = []  # ticks when the link came up
+    was_up = False
+    while board.ticks_ms() < total:
+        now = board.ticks_ms()
+        board.wifi_reachable = reachable(now)
+        if manager:
+            manager.poll()
+        up = sta.isconnected()
+        if up and not was_up:
+            ups.append(now)
+            if control_start is None:
+                control_start = now  # the old Blynk loop starts once connected
+        was_up = up
+        if board.wifi_reachable:
+            reach_ms += STEP_MS
+            up_ms += STEP_MS if up else 0
+        hal.sleep_ms(STEP_MS)
+    restore = []
+    for end in outage_ends():
+        later = [t for t in ups if t >= end]
+        if later and later[0] - end < 30 * 60000:
+            restore.append((later[0] - end) / 1000)
+    return {
+        'up_pct': up_ms / reach_ms * 100,
+        'connects': len(ups),
+        'restore': restore,
+        'downtime_s': (total - up_ms) / 1000 if not manager else manager.stats()['downtime_s'],
+        'control_start_s': control_start / 1000 if control_start is not None else None,
+        'stats': manager.stats() if manager else None,
+    }
+
+
+def main():
+    print("%d h, outages (min): %s" % (HOURS, ', '.join('%d-%d' % o for o in OUTAGES_MIN)))
+    print("%-10s %9s %9s %11s %17s %14s" % ('strategy', 'up % *', 'connects', 'downtime s', 'restore s (each)', 'control at s'))
+    for strategy in ('boot-once', 'manager'):
+        r = run(strategy)
+        restore = ' '.join('%.1f' % x for x in r['restore']) or 'never'
+        start = '%.1f' % r['control_start_s'] if r['control_start_s'] is not None else 'never'
+        print("%-10s %9.1f %9d %11.0f %17s %14s" % (
+            strategy, r['up_pct'], r['connects'], r['downtime_s'], restore, start))
+        if r['stats']:
+            print("  stats:", r['stats'])
+    print("* share of the time the network was reachable")
+
+
+main()
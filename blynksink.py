@@ -0,0 +1,259 @@
+"""Blynk as a sampler sink: app pins fed from the shared snapshot
+
+A BlynkSink is called with each snapshot (sampler.Sampler.add_sink) and
+never reads hardware. Online, the reading is staged on the change-
+detecting uplink; offline, it is queued in the outbox and uploaded with
+its timestamp once the link is back (readings taken before the
+runtime's timesync.TimeSync has set the clock are refused: their time
+is unusable). poll() keeps the connection: it (re)connects, dispatches
+app commands, flushes the uplink and pumps the outbox. App commands are
+handed to callbacks, so the pump itself stays with the runtime's
+actuator:
+
+  V8  mode      on_mode(auto)
+  V7  pump      on_pump(on)
+
+The states shown on V1/V3 use the controller's thresholds
+(control.SOIL_ON_BELOW/SOIL_OFF_ABOVE, TANK_STOP_BELOW), so the app and
+the dashboard agree.
+
+poll() shares the event loop (or the serial server's loop) with the
+pump, so it never waits long: the TCP connect is started non-blocking
+and finished on a later poll, BlynkLib gets the connected socket (plain
+TCP) with a READ_TIMEOUT_S read timeout, and the outbox upload is a
+non-blocking outbox.HttpSink. The server lookup (DNS) is the one call
+that can block: resolver.Resolver keeps the address once found and
+backs off after each failed lookup, and `ip` skips it altogether.
+"""
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+try:
+    import select
+except ImportError:
+    import uselect as select
+
+import socket
+
+try:
+    from BlynkLib import Blynk, BlynkProtocol
+except ImportError:
+    Blynk = None  # host runs pass connect= (bench/fake_blynk.py)
+
+import control
+import hal
+import outbox
+import resolver
+import telemetry
+import uplink
+
+DEADBANDS = {0: 40, 2: 40, 5: 1, 6: 2}  # pin -> change worth sending (ADC counts, °C, %)
+HEARTBEAT_MS = 60000  # unchanged pins are re-sent this often
+RETRY_MS = 5000  # between connection attempts while WiFi is up
+CONNECT_TIMEOUT_MS = 5000  # for the TCP connect to the server
+READ_TIMEOUT_S = 0.002  # longest blynk.run() waits for app commands
+POLL_MS = 20  # run() period
+BATCH_PORT = 80  # HTTP API on the server, for the outbox; bench/fake_sink.py serves it locally
+BACKLOG_PINS = {0: 0, 2: 2, 5: 5, 6: 6}  # pin -> index in telemetry.BLYNK_FIELDS (numeric pins only)
+
+SOIL_DRY, SOIL_MOIST, SOIL_WET = 0, 1, 2
+TANK_LOW, TANK_OK = 0, 1
+SOIL_MSG = ("Soil Dry", "Soil Moist", "Soil Wet")
+TANK_MSG = ("Tank Low", "Tank OK")
+RAIN_MSG = ("No Rain", "Rain")
+
+
+def values(data):
+    """telemetry.BLYNK_FIELDS from a snapshot"""
+    soil = data['soil_percent']
+    if soil < control.SOIL_ON_BELOW:
+        soil_state = SOIL_DRY
+    elif soil > control.SOIL_OFF_ABOVE:
+        soil_state = SOIL_WET
+    else:
+        soil_state = SOIL_MOIST
+    tank_state = TANK_LOW if data['tank_percent'] < control.TANK_STOP_BELOW else TANK_OK
+    raining = 1 if data['rain'] == 0 else 0
+    return (data['soil_value'], soil_state, data['tank_value'], tank_state, raining,
+            data['temp'], data['humidity'])
+
+
+if Blynk:
+    class SocketBlynk(Blynk):
+        """BlynkLib's Blynk on a socket BlynkSink has already connected"""
+
+        def __init__(self, auth, sock):
+            self.sock = sock
+            Blynk.__init__(self, auth, insecure=True)
+
+        def connect(self):
+            self.conn = self.sock
+            BlynkProtocol.connect(self)  # sends the login; run() reads the answer
+
+
+def blynk_connect(auth, sock):
+    return SocketBlynk(auth, sock)
+
+
+class BlynkSink:
+    def __init__(self, auth, server, port, wifi, on_mode=None, on_pump=None, mode='pins',
+                 outbox_file='outbox.bin', batch_port=BATCH_PORT, connect=None, ip=None):
+        self.auth = auth
+        self.server = server
+        self.port = port
+        self.wifi = wifi  # wifimgr.WiFiManager; no connection attempts while it is down
+        self.on_mode = on_mode
+        self.on_pump = on_pump
+        self.mode = mode  # pins: V0-V6 states as text / batch: all of telemetry.BLYNK_FIELDS on V10
+        self.connect = connect or blynk_connect  # (auth, connected socket) -> Blynk-like object
+        self.blynk = None
+        self.conn = None  # the socket under self.blynk
+        self.opening = None  # socket with a connect in progress
+        self.poller = None
+        self.resolver = resolver.Resolver(server, port, ip)
+        self.opened_at = None
+        self.retry_at = hal.ticks_ms()
+        self.last_run = None
+        self.run_gap_ms = control.Stat()  # between blynk.run() calls: how long an app command can wait
+        self.connects = 0
+        self.drops = 0
+        self.link = uplink.Uplink(self._write, DEADBANDS, HEARTBEAT_MS)  # one socket write per flush
+        self.backlog = outbox.Outbox(len(telemetry.BLYNK_FIELDS), outbox_file)
+        self.sink = outbox.HttpSink(server, batch_port, auth, BACKLOG_PINS, ip=ip)
+
+    def _write(self, data):
+        self.blynk._write(data)
+
+    def _mode(self, value):
+        if self.on_mode:
+            self.on_mode(int(value[0]) == 1)
+
+    def _pump(self, value):
+        self.link.forget(7)  # the app moved the button; the next sample sets it to the relay
+        if self.on_pump:
+            self.on_pump(int(value[0]) == 1)
+
+    def _close(self):
+        """Close the connection and any connect in progress"""
+        for s in (self.conn, self.opening):
+            if s:
+                try:
+                    s.close()
+                except OSError:
+                    pass
+        self.blynk = self.conn = self.opening = self.poller = None
+        self.last_run = None
+
+    def _drop(self, e):
+        print("Blynk connection lost:", e)
+        self._close()
+        self.drops += 1
+
+    def _open(self, now):
+        """Start a TCP connect without waiting; _opened() finishes it"""
+        self.retry_at = hal.ticks_add(now, RETRY_MS)
+        failures = self.resolver.failures
+        addr = self.resolver.address()
+        if addr is None:  # lookup failed, or backing off after one
+            if self.resolver.failures != failures:
+                print("Blynk server lookup failed:", self.server)
+            return
+        try:
+            s = self.opening = socket.socket()
+            s.setblocking(False)
+            self.poller = select.poll()
+            self.poller.register(s, select.POLLOUT)
+            self.opened_at = now
+            s.connect(addr)
+        except OSError as e:
+            if self.opening is None or e.args[0] not in outbox.HttpSink.WOULD_BLOCK:
+                print("Blynk connect failed:", e)
+                self._close()
+
+    def _opened(self, now):
+        """Log in once the connect has finished; on failure poll() retries after RETRY_MS"""
+        if not self.poller.poll(0):
+            if hal.ticks_diff(now, self.opened_at) >= CONNECT_TIMEOUT_MS:
+                print("Blynk connect timed out")
+                self._close()
+            return
+        s = self.conn = self.opening
+        self.opening = self.poller = None
+        try:
+            s.settimeout(READ_TIMEOUT_S)
+            blynk = self.connect(self.auth, s)  # a refused connect fails here, on the login
+            s.settimeout(READ_TIMEOUT_S)  # whatever timeout the connection set for itself
+        except OSError as e:
+            print("Blynk connect failed:", e)
+            self._close()
+            return
+        blynk.on("V8")(self._mode)
+        blynk.on("V7")(self._pump)
+        self.blynk = blynk
+        self.connects += 1
+
+    def __call__(self, data):
+        """Sink entry: stage the snapshot, or queue it while offline"""
+        reading = values(data)
+        if not self.blynk:
+            self.backlog.put(hal.time(), reading)
+            return
+        link = self.link
+        link.set(7, 1 if data['relay'] == control.ON else 0)  # the app's pump button follows the relay
+        if self.mode == 'batch':
+            link.set(telemetry.BLYNK_PIN, reading)  # one message, the app maps the codes
+            return
+        soil_val, soil_state, tank_val, tank_state, raining, temp, hum = reading
+        link.set(0, soil_val)
+        link.set(1, SOIL_MSG[soil_state])
+        link.set(2, tank_val)
+        link.set(3, TANK_MSG[tank_state])
+        link.set(4, RAIN_MSG[raining])
+        link.set(5, temp)
+        link.set(6, hum)
+
+    def poll(self):
+        """Keep the connection, dispatch app commands, send what is staged and queued"""
+        if not self.wifi.is_up():
+            if self.conn or self.opening:
+                self._close()
+            return
+        now = hal.ticks_ms()
+        if self.blynk is None:
+            if self.opening is None:
+                if hal.ticks_diff(now, self.retry_at) < 0:
+                    return
+                self._open(now)
+            if self.opening is not None:
+                self._opened(now)
+            if self.blynk is None:
+                return
+        if self.last_run is not None:
+            self.run_gap_ms.add(hal.ticks_diff(now, self.last_run))
+        self.last_run = now
+        try:
+            self.blynk.run()
+            self.link.flush()  # rate-limited; sends only what changed
+        except OSError as e:
+            self._drop(e)
+            return
+        if len(self.backlog):
+            self.backlog.pump(self.sink)  # one batch per outbox.DRAIN_INTERVAL_MS, oldest first
+
+    async def run(self, period_ms=POLL_MS):
+        while True:
+            self.poll()
+            await asyncio.sleep(hal.real_s(period_ms))
+
+    def stats(self):
+        return {
+            'connected': self.blynk is not None,
+            'connects': self.connects,
+            'drops': self.drops,
+            'run_gap_ms': self.run_gap_ms.as_dict(),
+            'dns': self.resolver.stats(),
+            'uplink': self.link.stats(),
+            'outbox': self.backlog.stats(),
+        }
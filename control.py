@@ -0,0 +1,179 @@
+"""Auto-irrigation controller: fixed-rate scheduler, hysteresis, minimum dwell
+
+The controller owns every automatic relay decision. It runs on its own
+schedule (not on HTTP requests), switches on below one soil threshold
+and off above another, and holds the relay for a minimum on/off time so
+sensor noise can't toggle it. Rain stops the pump in auto mode, or in
+every mode with rain_all_modes (the Blynk app's rule). Sensors, relay
+and clock are injected, so it runs the same on the board and against
+hal_sim on Linux.
+"""
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+import eventlog
+import hal
+import profiler
+
+PERIOD_MS = 2000  # evaluation period
+SOIL_ON_BELOW = 30  # % - start irrigating below this
+SOIL_OFF_ABOVE = 80  # % - stop irrigating above this
+TANK_STOP_BELOW = 20  # % - dry-run protection
+TANK_RESUME_ABOVE = 30  # % - tank must refill past this before pumping again
+MIN_ON_MS = 20000  # soil-driven switch-off needs the pump on at least this long
+MIN_OFF_MS = 30000  # soil-driven switch-on needs the pump off at least this long
+
+ON = 0  # relay is active-low
+OFF = 1
+
+
+class Stat:
+    """count/min/max/mean/last of one measurement"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.last = None
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.last = value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': round(self.total / self.count, 1) if self.count else None,
+            'last': self.last,
+        }
+
+
+class Controller:
+    def __init__(self, relay, read, is_auto, log=None, period_ms=PERIOD_MS,
+                 clock=None, min_on_ms=MIN_ON_MS, min_off_ms=MIN_OFF_MS):
+        self.relay = relay
+        self.read = read  # () -> snapshot dict
+        self.is_auto = is_auto  # () -> bool
+        self.log = log or (lambda code, arg=0: None)
+        self.period_ms = period_ms
+        self.clock = clock = clock or hal.ticks_ms
+        self.min_on_ms = min_on_ms
+        self.min_off_ms = min_off_ms
+        self.state = relay.value()
+        self.changed_at = hal.ticks_add(clock(), -max(min_on_ms, min_off_ms))
+        self.tank_low = False
+        self.rain_all_modes = False  # rain also ends manual runs
+        self.next_due = clock()
+        self.switches = 0
+        self.held = 0  # switches suppressed by the dwell time
+        self.jitter_ms = Stat()
+        self.decision_us = Stat()
+        self.wakeup = None  # asyncio.Event, created by run()
+
+    def _switch(self, state, now, reason):
+        self.relay.value(state)
+        self.state = state
+        self.changed_at = now
+        self.switches += 1
+        self.log(reason)
+
+    def _dwell_ok(self, now):
+        held_for = hal.ticks_diff(now, self.changed_at)
+        return held_for >= (self.min_on_ms if self.state == ON else self.min_off_ms)
+
+    def decide(self, data, now):
+        """Apply one decision for snapshot `data` at clock time `now`"""
+        actual = self.relay.value()
+        if actual != self.state:  # switched by hand or by the force-water timer
+            self.state = actual
+            self.changed_at = now
+
+        tank = data['tank_percent']
+        if tank < TANK_STOP_BELOW:
+            self.tank_low = True
+        elif tank >= TANK_RESUME_ABOVE:
+            self.tank_low = False
+
+        auto = self.is_auto()
+        pump_on = self.state == ON
+        if data['rain'] == 0 and (auto or self.rain_all_modes):
+            if pump_on:
+                self._switch(OFF, now, eventlog.RAIN_DETECTED)
+        elif self.tank_low:
+            if pump_on:
+                self._switch(OFF, now, eventlog.TANK_EMPTY)
+        elif auto:
+            soil = data['soil_percent']
+            if soil < SOIL_ON_BELOW and not pump_on:
+                if self._dwell_ok(now):
+                    self._switch(ON, now, eventlog.SOIL_DRY)
+                else:
+                    self.held += 1
+            elif soil > SOIL_OFF_ABOVE and pump_on:
+                if self._dwell_ok(now):
+                    self._switch(OFF, now, eventlog.SOIL_WET)
+                else:
+                    self.held += 1
+
+    def step(self, now=None):
+        """One scheduled evaluation; records jitter and decision latency"""
+        if now is None:
+            now = self.clock()
+        self.jitter_ms.add(hal.ticks_diff(now, self.next_due))
+        t0 = hal.ticks_us()
+        self.decide(self.read(), now)
+        us = hal.ticks_diff(hal.ticks_us(), t0)
+        self.decision_us.add(us)
+        profiler.record('control', us)
+        # fixed rate: the next slot is one period after the last one, not after now
+        self.next_due = hal.ticks_add(self.next_due, self.period_ms)
+        if hal.ticks_diff(now, self.next_due) >= 0:  # fell behind, skip missed slots
+            self.next_due = hal.ticks_add(now, self.period_ms)
+
+    def poll(self):
+        """Run step() if it is due; for loops that can't await"""
+        now = self.clock()
+        if hal.ticks_diff(now, self.next_due) >= 0:
+            self.step(now)
+
+    def wake(self):
+        """Evaluate now instead of waiting for the next slot (e.g. mode change)"""
+        self.next_due = self.clock()
+        if self.wakeup:
+            self.wakeup.set()
+
+    async def run(self):
+        self.wakeup = asyncio.Event()
+        while True:
+            wait_ms = hal.ticks_diff(self.next_due, self.clock())
+            if wait_ms > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), hal.real_s(wait_ms))
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+                continue
+            try:
+                self.step()
+            except Exception as e:
+                print(f"Control error: {e}")
+                self.next_due = hal.ticks_add(self.clock(), self.period_ms)
+
+    def stats(self):
+        return {
+            'period_ms': self.period_ms,
+            'switches': self.switches,
+            'held_by_dwell': self.held,
+            'jitter_ms': self.jitter_ms.as_dict(),
+            'decision_us': self.decision_us.as_dict(),
+        }
@@ -0,0 +1,172 @@
+"""Table-driven crop suitability scoring
+
+The crop table is data, loaded once. A score is season points (40) plus
+temperature points (30) plus moisture points (30); each part is a table
+lookup instead of an if/elif ladder, and integer readings index
+per-crop columns computed at import. score_batch() scores many
+(temp, moisture, season) samples at once - NumPy on the host, flat
+arrays on the board, where each distinct reading is scored once per
+batch (sensor readings change slowly, so most samples repeat one).
+"""
+import math
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SEASON_TYPES = ("rabi", "kharif", "zaid")
+
+# id, display name, min temp, max temp, min moisture %, max moisture %, season
+CROP_TABLE = (
+    ("paddy", "Rice", 20, 35, 70, 95, "kharif"),
+    ("wheat", "Wheat", 10, 25, 40, 70, "rabi"),
+    ("maize", "Maize", 15, 30, 50, 80, "both"),
+    ("vegetables", "Vegetables", 15, 30, 60, 85, "all"),
+    ("cotton", "Cotton", 20, 35, 45, 75, "kharif"),
+    ("millets", "Millets", 20, 40, 30, 65, "kharif"),
+    ("groundnut", "Groundnut", 22, 35, 40, 70, "kharif"),
+    ("sugarcane", "Sugarcane", 20, 35, 65, 90, "all"),
+)
+
+# Season points by crop season, columns in SEASON_TYPES order
+SEASON_POINTS = {
+    "all": (40, 40, 40),
+    "both": (40, 40, 5),
+    "rabi": (40, 5, 15),
+    "kharif": (5, 40, 20),
+}
+
+# Points by whole degrees / percent outside the crop's band (0 = inside)
+TEMP_POINTS = (30,) + (20,) * 5 + (10,) * 5 + (5,)
+MOISTURE_POINTS = (30,) + (20,) * 10 + (10,) * 10 + (5,)
+
+CROP_IDS = tuple(c[0] for c in CROP_TABLE)
+CROP_NAMES = tuple(c[1] for c in CROP_TABLE)
+N_CROPS = len(CROP_TABLE)
+
+# Integer readings inside these ranges are scored from precomputed columns
+TEMP_RANGE = (-20, 70)
+MOISTURE_RANGE = (0, 100)
+
+# Column-wise copies of the table for the scoring loops
+MIN_TEMP = array('f', [c[2] for c in CROP_TABLE])
+MAX_TEMP = array('f', [c[3] for c in CROP_TABLE])
+MIN_MOIST = array('f', [c[4] for c in CROP_TABLE])
+MAX_MOIST = array('f', [c[5] for c in CROP_TABLE])
+# SEASON_BY_TYPE[s][i] = season points of crop i in season type s
+SEASON_BY_TYPE = tuple(
+    bytes(SEASON_POINTS[c[6]][s] for c in CROP_TABLE) for s in range(len(SEASON_TYPES))
+)
+
+
+def season_index(season_type):
+    """Index of a season type in SEASON_TYPES"""
+    return SEASON_TYPES.index(season_type)
+
+
+def band_points(points, value, low, high):
+    """Lookup score for how far `value` lies outside [low, high]"""
+    if value < low:
+        dist = low - value
+    elif value > high:
+        dist = value - high
+    else:
+        return points[0]
+    idx = math.ceil(dist)
+    return points[idx if idx < len(points) else -1]
+
+
+def _band_columns(points, lows, highs, value_range):
+    """{value: bytes of every crop's band points} for integer values in range"""
+    first, last = value_range
+    return {
+        v: bytes(band_points(points, v, lows[i], highs[i]) for i in range(N_CROPS))
+        for v in range(first, last + 1)
+    }
+
+# TEMP_COLUMNS[t][i] = temperature points of crop i at t degrees
+TEMP_COLUMNS = _band_columns(TEMP_POINTS, MIN_TEMP, MAX_TEMP, TEMP_RANGE)
+MOISTURE_COLUMNS = _band_columns(MOISTURE_POINTS, MIN_MOIST, MAX_MOIST, MOISTURE_RANGE)
+
+
+def _columns(columns, points, lows, highs, value):
+    """Precomputed column for value, or computed for fractional/out-of-range values"""
+    col = columns.get(value)
+    if col is None:
+        col = bytes(band_points(points, value, lows[i], highs[i]) for i in range(N_CROPS))
+    return col
+
+
+def score_sample(temp, moisture, season_type):
+    """Score of every crop for one sample, in CROP_TABLE order"""
+    seasons = SEASON_BY_TYPE[season_index(season_type)]
+    temps = _columns(TEMP_COLUMNS, TEMP_POINTS, MIN_TEMP, MAX_TEMP, temp)
+    moists = _columns(MOISTURE_COLUMNS, MOISTURE_POINTS, MIN_MOIST, MAX_MOIST, moisture)
+    return [s + t + m for s, t, m in zip(seasons, temps, moists)]
+
+
+def rank_crops(temp, moisture, season_type):
+    """[(crop_id, crop_name, score), ...] best first"""
+    scores = score_sample(temp, moisture, season_type)
+    ranked = [(CROP_IDS[i], CROP_NAMES[i], scores[i]) for i in range(N_CROPS)]
+    ranked.sort(key=lambda x: x[2], reverse=True)
+    return ranked
+
+
+def score_batch(temps, moistures, season_types):
+    """Score many samples at once
+
+    season_types holds SEASON_TYPES indexes. Returns (scores, best):
+    an n x N_CROPS score matrix and the best crop index per sample.
+    NumPy arrays when NumPy is available, otherwise flat bytearrays
+    (scores row-major).
+    """
+    if np is not None:
+        return _score_batch_numpy(temps, moistures, season_types)
+    return _score_batch_arrays(temps, moistures, season_types)
+
+
+def _band_points_numpy(points, values, low, high):
+    dist = np.maximum(np.maximum(low - values, values - high), 0)
+    idx = np.minimum(np.ceil(dist).astype(np.intp), len(points) - 1)
+    return points[idx]
+
+
+def _score_batch_numpy(temps, moistures, season_types):
+    t = np.asarray(temps, dtype=np.float32)[:, None]
+    m = np.asarray(moistures, dtype=np.float32)[:, None]
+    s = np.asarray(season_types, dtype=np.intp)
+    season_matrix = np.array([list(row) for row in SEASON_BY_TYPE], dtype=np.int16)
+    scores = (
+        season_matrix[s]
+        + _band_points_numpy(np.array(TEMP_POINTS, dtype=np.int16), t,
+                             np.array(MIN_TEMP, dtype=np.float32), np.array(MAX_TEMP, dtype=np.float32))
+        + _band_points_numpy(np.array(MOISTURE_POINTS, dtype=np.int16), m,
+                             np.array(MIN_MOIST, dtype=np.float32), np.array(MAX_MOIST, dtype=np.float32))
+    )
+    return scores, np.argmax(scores, axis=1)
+
+
+def _score_batch_arrays(temps, moistures, season_types):
+    n = len(temps)
+    scores = bytearray(n * N_CROPS)
+    best = bytearray(n)
+    seen = {}  # (temp, moisture, season) -> (score row, best index); readings repeat a lot
+    temp_cols = TEMP_COLUMNS
+    moist_cols = MOISTURE_COLUMNS
+    base = 0
+    for j in range(n):
+        key = (temps[j], moistures[j], season_types[j])
+        hit = seen.get(key)
+        if hit is None:
+            t, m, s = key
+            tc = temp_cols.get(t) or _columns(temp_cols, TEMP_POINTS, MIN_TEMP, MAX_TEMP, t)
+            mc = moist_cols.get(m) or _columns(moist_cols, MOISTURE_POINTS, MIN_MOIST, MAX_MOIST, m)
+            row = [a + b + c for a, b, c in zip(SEASON_BY_TYPE[s], tc, mc)]
+            hit = seen[key] = (bytes(row), row.index(max(row)))
+        scores[base:base + N_CROPS] = hit[0]
+        best[j] = hit[1]
+        base += N_CROPS
+    return scores, best
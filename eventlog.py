@@ -0,0 +1,131 @@
+"""Operation log as a preallocated ring of structured events
+
+log() stores (timestamp, event code, numeric arg) into fixed arrays, so
+the control loop and the force-water callback can log without building
+strings. Text is only produced by render(), in the language asked for.
+"""
+import time
+from array import array
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+import i18n
+
+CAPACITY = 32
+
+# Event codes
+STARTED = 1
+PUMP_ON = 2
+PUMP_OFF = 3
+MODE = 4  # arg: 0 auto, 1 manual
+FORCE_ON = 5  # arg: seconds
+FORCE_OFF = 6
+STOP = 7
+CLEARED = 8
+LANGUAGE = 9  # arg: index into i18n.LANGUAGES
+RAIN_DETECTED = 10
+TANK_EMPTY = 11
+SOIL_DRY = 12
+SOIL_WET = 13
+WIFI_UP = 14  # arg: seconds the link was down
+WIFI_DOWN = 15
+
+MODES = ("auto", "manual")
+
+# code -> (translation key, how to show the arg)
+MESSAGES = {
+    STARTED: ("events.started", None),
+    PUMP_ON: ("events.pump_on", None),
+    PUMP_OFF: ("events.pump_off", None),
+    MODE: ("events.mode", "mode"),
+    FORCE_ON: ("events.force_on", "int"),
+    FORCE_OFF: ("events.force_off", None),
+    STOP: ("events.stop", None),
+    CLEARED: ("events.cleared", None),
+    LANGUAGE: ("events.language", "language"),
+    RAIN_DETECTED: ("rain_detected", None),
+    TANK_EMPTY: ("tank_empty", None),
+    SOIL_DRY: ("soil_dry", None),
+    SOIL_WET: ("soil_wet", None),
+    WIFI_UP: ("events.wifi_up", "int"),
+    WIFI_DOWN: ("events.wifi_down", None),
+}
+
+
+class _NoLock:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class EventLog:
+    def __init__(self, capacity=CAPACITY, clock=time.time):
+        self.capacity = capacity
+        self.clock = clock
+        self.times = array('L', [0] * capacity)
+        self.codes = bytearray(capacity)
+        self.args = array('h', [0] * capacity)
+        self.head = 0  # next slot to write
+        self.count = 0
+        self.seq = 0  # bumped on every change, for cheap change detection
+        self.lock = _thread.allocate_lock() if _thread else _NoLock()
+        self._cache_key = None
+        self._cache = None
+
+    def log(self, code, arg=0):
+        """Record one event; no allocation beyond the lock"""
+        with self.lock:
+            i = self.head
+            self.times[i] = int(self.clock())
+            self.codes[i] = code
+            self.args[i] = arg
+            self.head = (i + 1) % self.capacity
+            if self.count < self.capacity:
+                self.count += 1
+            self.seq += 1
+
+    def clear(self):
+        with self.lock:
+            self.head = 0
+            self.count = 0
+            self.seq += 1
+
+    def __len__(self):
+        return self.count
+
+    def events(self, n=None):
+        """[(timestamp, code, arg), ...] newest first"""
+        with self.lock:
+            n = self.count if n is None else min(n, self.count)
+            out = []
+            for k in range(1, n + 1):
+                i = (self.head - k) % self.capacity
+                out.append((self.times[i], self.codes[i], self.args[i]))
+        return out
+
+    def render(self, n, lang):
+        """Newest n events as '[HH:MM:SS] message' in `lang`; cached until the log changes"""
+        key = (self.seq, n, lang)
+        if key != self._cache_key:
+            T = i18n.table(lang)
+            self._cache = [format_event(T, ts, code, arg) for ts, code, arg in self.events(n)]
+            self._cache_key = key
+        return self._cache
+
+
+def format_event(T, ts, code, arg):
+    key, kind = MESSAGES.get(code, ("events.unknown", "int"))
+    msg = T.get(key, key)
+    if kind == "mode":
+        msg = msg.format(MODES[arg] if 0 <= arg < len(MODES) else arg)
+    elif kind == "language":
+        msg = msg.format(i18n.LANGUAGES[arg][1] if 0 <= arg < len(i18n.LANGUAGES) else arg)
+    elif kind:
+        msg = msg.format(arg)
+    t = time.localtime(ts)
+    return f"[{t[3]:02d}:{t[4]:02d}:{t[5]:02d}] {msg}"
@@ -0,0 +1,71 @@
+"""Adaptive garbage collection instead of gc.collect() after every request
+
+A MicroPython collection stops the world for milliseconds, so the server
+no longer collects after each response. It collects right away only when
+free heap drops below a low-water mark (so the next page still fits), and
+otherwise waits for an idle window once enough has been allocated since
+the last pass. gc.threshold() stays as a backstop inside request bursts.
+
+Pauses are timed into the profiler's 'gc' stage. CPython has no
+mem_free(), so there a request budget stands in for the watermarks.
+"""
+import gc
+
+import profiler
+
+LOW_WATER = 24 * 1024  # free bytes below which a request triggers a collection
+IDLE_BYTES = 8 * 1024  # allocated since the last pass before an idle collection pays off
+THRESHOLD_FRACTION = 4  # backstop: auto-collect after 1/4 of free heap is allocated
+REQUEST_BUDGET = 32  # host fallback: collect after this many requests
+
+
+class GCPolicy:
+    def __init__(self, mode='adaptive', low_water=LOW_WATER, idle_bytes=IDLE_BYTES, budget=REQUEST_BUDGET):
+        self.mode = mode  # 'adaptive' or 'always' (collect after every request)
+        self.low_water = low_water
+        self.idle_bytes = idle_bytes
+        self.budget = budget
+        self.heap = hasattr(gc, 'mem_free')
+        self.pending = 0  # requests since the last collection
+        self.base_alloc = gc.mem_alloc() if self.heap else 0
+        self.runs = {'request': 0, 'low_water': 0, 'idle': 0}
+
+    def setup(self):
+        """Install the allocation threshold backstop (MicroPython only)"""
+        if self.heap and hasattr(gc, 'threshold') and self.mode == 'adaptive':
+            gc.threshold(gc.mem_free() // THRESHOLD_FRACTION + gc.mem_alloc())
+
+    def _collect(self, reason):
+        profiler.collect()
+        self.runs[reason] += 1
+        self.pending = 0
+        if self.heap:
+            self.base_alloc = gc.mem_alloc()
+
+    def after_request(self):
+        """Call once per finished (or failed) request"""
+        self.pending += 1
+        if self.mode == 'always':
+            self._collect('request')
+        elif self.heap:
+            if gc.mem_free() < self.low_water:
+                self._collect('low_water')
+        elif self.pending >= self.budget:
+            self._collect('low_water')
+
+    def idle(self):
+        """Call when no request is in flight; collects if it is worth it"""
+        if self.mode == 'always':
+            return
+        if self.heap:
+            if gc.mem_alloc() - self.base_alloc >= self.idle_bytes:
+                self._collect('idle')
+        elif self.pending:
+            self._collect('idle')
+
+    def stats(self):
+        out = {'mode': self.mode, 'runs': self.runs, 'pending_requests': self.pending}
+        if self.heap:
+            out['mem_free'] = gc.mem_free()
+            out['mem_alloc'] = gc.mem_alloc()
+        return out
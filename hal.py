@@ -0,0 +1,101 @@
+"""Hardware abstraction: ESP32 pins or a simulated farm, plus the clock
+
+Apps ask the board for named devices (`board.adc('soil', 34)`) instead of
+importing machine/dht/network, so the same code runs on the ESP32 and on
+CPython. On the board the real pins are used; anywhere `machine` is
+missing the simulator in hal_sim.py takes over.
+
+The clock functions below (ticks_ms, time, sleep_ms, ...) follow the
+active board, so a simulated board can run faster than real time.
+"""
+import time as _time
+
+try:
+    import machine
+except ImportError:
+    machine = None
+
+_board = None
+
+# seconds to add to time() for Unix time (MicroPython ports count from 2000)
+EPOCH_OFFSET = 946684800 if _time.gmtime(0)[0] == 2000 else 0
+
+
+class Esp32Board:
+    """Real pins; names are ignored, `span` is only used by the simulator"""
+
+    def __init__(self):
+        import dht
+        import network
+        self._dht = dht
+        self._network = network
+
+    def adc(self, name, pin, span=None):
+        a = machine.ADC(machine.Pin(pin))
+        a.atten(machine.ADC.ATTN_11DB)
+        return a
+
+    def input(self, name, pin):
+        return machine.Pin(pin, machine.Pin.IN)
+
+    def output(self, name, pin, value=1):
+        p = machine.Pin(pin, machine.Pin.OUT)
+        p.value(value)
+        return p
+
+    def dht11(self, name, pin):
+        return self._dht.DHT11(machine.Pin(pin))
+
+    def wlan(self, interface='sta'):
+        net = self._network
+        return net.WLAN(net.STA_IF if interface == 'sta' else net.AP_IF)
+
+    # clock
+    ticks_ms = staticmethod(_time.ticks_ms) if machine else None
+    ticks_us = staticmethod(_time.ticks_us) if machine else None
+    ticks_diff = staticmethod(_time.ticks_diff) if machine else None
+    ticks_add = staticmethod(_time.ticks_add) if machine else None
+    time = staticmethod(_time.time)
+
+    @staticmethod
+    def set_time(unix_s):
+        """Set the RTC, as ntptime.settime() does"""
+        tm = _time.gmtime(int(unix_s) - EPOCH_OFFSET)
+        machine.RTC().datetime((tm[0], tm[1], tm[2], tm[6] + 1, tm[3], tm[4], tm[5], 0))
+
+    @staticmethod
+    def sleep_ms(ms):
+        _time.sleep_ms(ms)
+
+    @staticmethod
+    def real_s(ms):
+        return ms / 1000
+
+
+def use(board):
+    """Make `board` the active board and point the clock functions at it"""
+    global _board, ticks_ms, ticks_us, ticks_diff, ticks_add, time, set_time, sleep_ms, real_s
+    _board = board
+    ticks_ms = board.ticks_ms
+    ticks_us = board.ticks_us
+    ticks_diff = board.ticks_diff
+    ticks_add = board.ticks_add  # deadlines: never plain +, ticks wrap (2**30 on the ESP32)
+    time = board.time
+    set_time = board.set_time  # Unix seconds; timesync.TimeSync calls it
+    sleep_ms = board.sleep_ms
+    real_s = board.real_s  # virtual ms -> real seconds, for asyncio waits
+    return board
+
+
+def get_board():
+    """The active board; ESP32 if `machine` exists, else a default simulator"""
+    if _board is None:
+        if machine:
+            use(Esp32Board())
+        else:
+            import hal_sim
+            use(hal_sim.SimBoard())
+    return _board
+
+
+get_board()
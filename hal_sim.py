@@ -0,0 +1,338 @@
+"""Simulated farm behind hal: field model, virtual clock and fake devices
+
+The field follows the live demo page (LIVEDEMOLBRCE.html): temperature
+and humidity drift, the soil dries out, rain wets the soil and fills the
+tank, and the pump (the active-low 'relay' output) wets the soil and
+drains the tank. Runs are deterministic for a given seed. TraceField
+replays a recorded /history export instead.
+
+The clock runs at `speed` x real time, or only moves when slept on
+(speed=0) for step-by-step harnesses that don't use asyncio. Ticks wrap
+like MicroPython's (TICKS_PERIOD), and `ticks_start` starts them
+anywhere in the period, e.g. just before the wrap; ticks_diff() rejects
+values that are not ticks, so a deadline built with plain + fails there.
+`start` sets time() (an ESP32 RTC nobody set reads 946684800, 2000-01-01)
+and set_time() moves it as an NTP sync would. The station interface joins after an association delay and drops while
+`board.wifi_reachable` is off, so outages can be scripted.
+"""
+import json
+import random
+import time
+
+ADC_MAX = 4095
+TICKS_PERIOD = 1 << 30  # MicroPython's ticks_ms/ticks_us wrap here
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALF = TICKS_PERIOD // 2
+
+
+class SimClock:
+    def __init__(self, speed=1, start=None):
+        self.speed = speed
+        self.epoch = time.time() if start is None else start  # time() at ms 0
+        self.ms = 0  # stepped time, used when speed is 0
+        self._t0 = time.monotonic()
+
+    def now_ms(self):
+        if self.speed:
+            return int((time.monotonic() - self._t0) * 1000 * self.speed)
+        return self.ms
+
+    def sleep_ms(self, ms):
+        if self.speed:
+            time.sleep(ms / 1000 / self.speed)
+        else:
+            self.ms += int(ms)
+
+
+class Field:
+    """Synthetic farm, advanced in whole seconds"""
+
+    SOIL_DRY_RATE = 0.02  # %/s lost without water
+    SOIL_PUMP_RATE = 1.2  # %/s gained while pumping
+    SOIL_RAIN_RATE = 0.05  # %/s gained in rain
+    TANK_PUMP_RATE = 0.15  # %/s drained while pumping
+    TANK_RAIN_RATE = 0.03  # %/s collected in rain
+    TANK_REFILL_RATE = 0.002  # %/s from the well
+    RAIN_CHANCE = 1 / 21600  # per second: about one shower every 6 h
+    RAIN_SECONDS = (600, 2400)
+    SOIL_NOISE = 3  # sensor noise, % (1 sigma)
+    TANK_NOISE = 2
+
+    def __init__(self, seed=1, temp=28.0, humidity=65.0, soil=60.0, tank=80.0):
+        self.rng = random.Random(seed)
+        self.noise = random.Random(seed + 1)
+        self.temp = temp
+        self.humidity = humidity
+        self.soil = soil
+        self.tank = tank
+        self.rain_left = 0  # seconds of rain remaining
+        self.carry = 0.0  # fraction of a second not yet simulated
+
+    def advance(self, seconds, pump_on):
+        self.carry += seconds
+        while self.carry >= 1:
+            self.carry -= 1
+            self._tick(pump_on)
+
+    def _tick(self, pump_on):
+        rng = self.rng
+        self.temp = clamp(self.temp + (rng.random() - 0.5) * 0.1 + (28 - self.temp) * 0.0005, 15, 45)
+        self.humidity = clamp(self.humidity + (rng.random() - 0.5) * 0.15 + (65 - self.humidity) * 0.0005, 20, 95)
+        if self.rain_left:
+            self.rain_left -= 1
+            self.soil += self.SOIL_RAIN_RATE
+            self.tank += self.TANK_RAIN_RATE
+        elif rng.random() < self.RAIN_CHANCE:
+            self.rain_left = rng.randint(*self.RAIN_SECONDS)
+        else:
+            self.soil -= self.SOIL_DRY_RATE
+        if pump_on and self.tank > 0:
+            self.soil += self.SOIL_PUMP_RATE
+            self.tank -= self.TANK_PUMP_RATE
+        self.tank += self.TANK_REFILL_RATE
+        self.soil = clamp(self.soil, 0, 100)
+        self.tank = clamp(self.tank, 0, 100)
+
+    def reading(self, name):
+        """Sensor view of the field in %, with noise"""
+        if name == 'soil':
+            return clamp(self.soil + self.noise.gauss(0, self.SOIL_NOISE), 0, 100)
+        if name == 'tank':
+            return clamp(self.tank + self.noise.gauss(0, self.TANK_NOISE), 0, 100)
+        if name == 'rain':
+            return 100 if self.rain_left else 0
+        if name == 'temp':
+            return self.temp
+        if name == 'humidity':
+            return self.humidity
+        return 0
+
+
+class TraceField:
+    """Replays /history rows [t, temp, humidity, soil, tank, rain %, pump %]
+
+    Each row holds until the next one; the trace loops at the end. The
+    pump output has no effect, the recording already contains it.
+    """
+
+    COLUMNS = {'temp': 1, 'humidity': 2, 'soil': 3, 'tank': 4, 'rain': 5}
+
+    def __init__(self, rows, loop=True):
+        self.rows = rows
+        self.loop = loop
+        self.t0 = rows[0][0]
+        self.length = rows[-1][0] - self.t0 + 1
+        self.elapsed = 0.0
+        self.index = 0
+
+    def advance(self, seconds, pump_on):
+        self.elapsed += seconds
+        if self.loop and self.elapsed >= self.length:
+            self.elapsed %= self.length
+            self.index = 0
+        rows = self.rows
+        t = self.t0 + self.elapsed
+        while self.index + 1 < len(rows) and rows[self.index + 1][0] <= t:
+            self.index += 1
+
+    def reading(self, name):
+        col = self.COLUMNS.get(name)
+        return self.rows[self.index][col] if col else 0
+
+
+def load_trace(path):
+    """Rows of a saved /history response"""
+    with open(path) as f:
+        return json.load(f)['rows']
+
+
+def clamp(x, lo, hi):
+    return lo if x < lo else hi if x > hi else x
+
+
+class SimADC:
+    """Maps the field's 0-100 % onto raw counts: span = (raw at 0 %, raw at 100 %)"""
+
+    def __init__(self, board, name, span):
+        self.board = board
+        self.name = name
+        self.span = span or (0, ADC_MAX)
+
+    def atten(self, attenuation):
+        pass
+
+    def read(self):
+        lo, hi = self.span
+        raw = lo + (hi - lo) * self.board.reading(self.name) / 100
+        return int(clamp(raw, 0, ADC_MAX))
+
+
+class SimInput:
+    """Digital sensor module: pulls low while its reading is 50 % or more"""
+
+    def __init__(self, board, name):
+        self.board = board
+        self.name = name
+
+    def value(self):
+        return 0 if self.board.reading(self.name) >= 50 else 1
+
+
+class SimOutput:
+    def __init__(self, board, name, value):
+        self.board = board
+        self.name = name
+        self.v = value
+        self.toggles = 0
+
+    def value(self, v=None):
+        if v is None:
+            return self.v
+        if v != self.v:
+            self.board.update()  # the field saw the old state until now
+            self.v = v
+            self.toggles += 1
+
+
+class SimDHT:
+    def __init__(self, board, name, fail_rate):
+        self.board = board
+        self.fail_rate = fail_rate
+        self.t = 0
+        self.h = 0
+
+    def measure(self):
+        board = self.board
+        if self.fail_rate and board.field_rng.random() < self.fail_rate:
+            raise OSError("DHT timeout")
+        self.t = int(round(board.reading('temp')))
+        self.h = int(round(board.reading('humidity')))
+
+    def temperature(self):
+        return self.t
+
+    def humidity(self):
+        return self.h
+
+
+class SimWLAN:
+    """Station joins CONNECT_MS after connect() while board.wifi_reachable; drops when it isn't"""
+
+    CONNECT_MS = 1500  # association + DHCP
+
+    def __init__(self, board, ip):
+        self.board = board
+        self.ip = ip
+        self.up = False
+        self.joining_since = None  # ticks of the pending connect()
+        self.connected = False
+
+    def active(self, on=None):
+        if on is None:
+            return self.up
+        self.up = on
+        if not on:
+            self.disconnect()
+
+    def connect(self, ssid=None, password=None):
+        self.joining_since = self.board.ticks_ms()
+
+    def disconnect(self):
+        self.joining_since = None
+        self.connected = False
+
+    def isconnected(self):
+        if not self.board.wifi_reachable:
+            self.connected = False
+            self.joining_since = None  # like the ESP32 after its retries: connect() again
+        elif not self.connected and self.joining_since is not None:
+            self.connected = self.board.ticks_diff(self.board.ticks_ms(), self.joining_since) >= self.CONNECT_MS
+        return self.connected
+
+    def ifconfig(self):
+        return (self.ip, '255.0.0.0', self.ip, '8.8.8.8')
+
+    def config(self, *args, **kwargs):
+        pass
+
+
+class SimBoard:
+    """hal board backed by a Field (or TraceField) and a SimClock"""
+
+    def __init__(self, field=None, speed=1, seed=1, dht_fail_rate=0, ip='127.0.0.1', start=None,
+                 ticks_start=0):
+        self.field = field or Field(seed)
+        self.clock = SimClock(speed, start)
+        self.ticks_start = ticks_start  # ticks_ms() at ms 0
+        self.field_rng = random.Random(seed + 2)
+        self.dht_fail_rate = dht_fail_rate
+        self.ip = ip
+        self.wifi_reachable = True  # benches switch this off to simulate outages
+        self.outputs = {}
+        self.last_ms = self.clock.now_ms()
+
+    def update(self):
+        """Advance the field to the clock"""
+        now = self.clock.now_ms()
+        if now != self.last_ms:
+            relay = self.outputs.get('relay')
+            self.field.advance((now - self.last_ms) / 1000, relay is not None and relay.v == 0)
+            self.last_ms = now
+
+    def reading(self, name):
+        self.update()
+        return self.field.reading(name)
+
+    # devices
+    def adc(self, name, pin, span=None):
+        return SimADC(self, name, span)
+
+    def input(self, name, pin):
+        return SimInput(self, name)
+
+    def output(self, name, pin, value=1):
+        out = self.outputs[name] = SimOutput(self, name, value)
+        return out
+
+    def dht11(self, name, pin):
+        return SimDHT(self, name, self.dht_fail_rate)
+
+    def wlan(self, interface='sta'):
+        return SimWLAN(self, self.ip if interface == 'sta' else '192.168.4.1')
+
+    # clock
+    def ticks_ms(self):
+        return (self.ticks_start + self.clock.now_ms()) & TICKS_MAX
+
+    @staticmethod
+    def ticks_us():
+        """Always real time: it measures code, not the field"""
+        return int(time.perf_counter() * 1000000) & TICKS_MAX
+
+    @staticmethod
+    def ticks_diff(a, b):
+        """Signed a - b across the wrap, as time.ticks_diff()
+
+        Stricter than the board: values that didn't come from ticks_ms(),
+        ticks_us() or ticks_add() (a deadline built with plain +) raise.
+        """
+        if not (0 <= a <= TICKS_MAX and 0 <= b <= TICKS_MAX):
+            raise ValueError('ticks out of range: %r, %r' % (a, b))
+        return ((a - b + TICKS_HALF) & TICKS_MAX) - TICKS_HALF
+
+    @staticmethod
+    def ticks_add(ticks, delta):
+        return (ticks + delta) & TICKS_MAX
+
+    def time(self):
+        return self.clock.epoch + self.clock.now_ms() / 1000
+
+    def set_time(self, unix_s):
+        self.clock.epoch = unix_s - self.clock.now_ms() / 1000
+
+    def sleep_ms(self, ms):
+        self.clock.sleep_ms(ms)
+
+    def real_s(self, ms):
+        speed = self.clock.speed
+        return ms / 1000 / speed if speed else 0
@@ -0,0 +1,298 @@
+"""Sensor history: fixed-size binary records in ring files on flash
+
+Samples are averaged into one record per minute, and minutes into one
+record per hour. Each tier is a ring file of struct-packed records with
+a small header. Records are batched in RAM and written in one go so
+flash sees a few writes per hour, not one per sample. Range queries
+seek straight to the first matching record and stream aggregated rows,
+so the file is never read into memory as a whole.
+
+The rings must stay in time order for that search. Samples are refused
+until the clock has been set (timesync.valid(); the RTC restarts at
+2000 on every boot) and whenever their time is not past the newest
+period already stored, e.g. after the clock was stepped back.
+"""
+import struct
+import time
+
+import timesync
+
+try:
+    import os
+except ImportError:
+    import uos as os
+
+# ts (s), temp x10, humidity %, soil %, tank %, raining % of period, pump on %
+RECORD_FMT = '<IhBBBBB'
+RECORD_SIZE = struct.calcsize(RECORD_FMT)
+HEADER_FMT = '<4sBBHHH'  # magic, version, record size, capacity, head, count
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+MAGIC = b'HIST'
+VERSION = 1
+
+FIELDS = ('t', 'temp', 'humidity', 'soil', 'tank', 'rain', 'pump')
+READ_BLOCK = 32  # records per file read while scanning
+
+# (file name, seconds per record, ring capacity, records per flash write)
+TIERS = (
+    ('hist_min.bin', 60, 2880, 15),  # 2 days of minutes
+    ('hist_hour.bin', 3600, 2160, 1),  # 90 days of hours
+)
+
+
+def pack(ts, temp10, humidity, soil, tank, rain_pct, pump_pct):
+    return struct.pack(RECORD_FMT, ts, temp10, humidity, soil, tank, rain_pct, pump_pct)
+
+
+def unpack(buf, offset=0):
+    return struct.unpack_from(RECORD_FMT, buf, offset)
+
+
+class RingFile:
+    """Fixed-capacity ring of records in one file, with a RAM write batch"""
+
+    def __init__(self, path, capacity, batch):
+        self.path = path
+        self.capacity = capacity
+        self.head = 0  # next slot to write
+        self.count = 0  # records on flash
+        self.pending = bytearray(batch * RECORD_SIZE)
+        self.npending = 0
+        self.writes = 0  # flash write batches, for wear monitoring
+        self._load_header()
+
+    def _load_header(self):
+        try:
+            with open(self.path, 'rb') as f:
+                magic, version, size, capacity, head, count = struct.unpack(HEADER_FMT, f.read(HEADER_SIZE))
+        except (OSError, ValueError):
+            return self._reset()
+        if magic != MAGIC or version != VERSION or size != RECORD_SIZE or capacity != self.capacity:
+            return self._reset()
+        self.head = head
+        self.count = count
+
+    def _reset(self):
+        self.head = 0
+        self.count = 0
+        with open(self.path, 'wb') as f:
+            f.write(self._header())
+
+    def _header(self):
+        return struct.pack(HEADER_FMT, MAGIC, VERSION, RECORD_SIZE, self.capacity, self.head, self.count)
+
+    def __len__(self):
+        return self.count + self.npending
+
+    def append(self, record):
+        """Queue one packed record; flushes when the batch is full"""
+        start = self.npending * RECORD_SIZE
+        self.pending[start:start + RECORD_SIZE] = record
+        self.npending += 1
+        if self.npending * RECORD_SIZE == len(self.pending):
+            self.flush()
+
+    def flush(self):
+        """Write the RAM batch to flash (at most two writes if it wraps)"""
+        if not self.npending:
+            return
+        mv = memoryview(self.pending)
+        with open(self.path, 'r+b') as f:
+            done = 0
+            while done < self.npending:
+                run = min(self.npending - done, self.capacity - self.head)
+                f.seek(HEADER_SIZE + self.head * RECORD_SIZE)
+                f.write(mv[done * RECORD_SIZE:(done + run) * RECORD_SIZE])
+                self.head = (self.head + run) % self.capacity
+                done += run
+            self.count = min(self.capacity, self.count + self.npending)
+            f.seek(0)
+            f.write(self._header())
+        self.npending = 0
+        self.writes += 1
+
+    def _slot(self, index):
+        """File slot of logical record `index` (0 = oldest on flash)"""
+        return (self.head - self.count + index) % self.capacity
+
+    def read(self, f, index, n, buf):
+        """Read n records from logical index into buf; returns records read"""
+        n = min(n, len(self) - index)
+        got = 0
+        while got < n:
+            i = index + got
+            if i >= self.count:  # still in the RAM batch
+                start = (i - self.count) * RECORD_SIZE
+                run = min(n - got, self.npending - (i - self.count))
+                buf[got * RECORD_SIZE:(got + run) * RECORD_SIZE] = self.pending[start:start + run * RECORD_SIZE]
+            else:
+                slot = self._slot(i)
+                run = min(n - got, self.capacity - slot, self.count - i)
+                f.seek(HEADER_SIZE + slot * RECORD_SIZE)
+                f.readinto(memoryview(buf)[got * RECORD_SIZE:(got + run) * RECORD_SIZE])
+            got += run
+        return got
+
+    def timestamp(self, f, index, buf):
+        self.read(f, index, 1, buf)
+        return unpack(buf)[0]
+
+    def first_at_or_after(self, f, ts, buf):
+        """Binary search for the first record with timestamp >= ts"""
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.timestamp(f, mid, buf) < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+class Accumulator:
+    """Running sums for averaging samples into one record"""
+
+    def __init__(self):
+        self.reset(0)
+
+    def reset(self, period):
+        self.period = period
+        self.n = 0
+        self.temp = self.humidity = self.soil = self.tank = self.rain = self.pump = 0
+
+    def add(self, temp10, humidity, soil, tank, rain_pct, pump_pct, weight=1):
+        self.n += weight
+        self.temp += temp10 * weight
+        self.humidity += humidity * weight
+        self.soil += soil * weight
+        self.tank += tank * weight
+        self.rain += rain_pct * weight
+        self.pump += pump_pct * weight
+
+    def record(self, ts):
+        n = self.n
+        return pack(ts, int(self.temp / n), int(self.humidity / n), int(self.soil / n),
+                    int(self.tank / n), int(self.rain / n), int(self.pump / n))
+
+
+class HistoryStore:
+    """Minute and hour tiers fed from sensor snapshots"""
+
+    def __init__(self, directory='', tiers=TIERS, clock=time.time):
+        self.clock = clock
+        self.tiers = []
+        for name, seconds, capacity, batch in tiers:
+            path = directory + '/' + name if directory else name
+            self.tiers.append((seconds, RingFile(path, capacity, batch), Accumulator()))
+        self.buf = bytearray(READ_BLOCK * RECORD_SIZE)
+        self.last = self._stored_until()  # newest accepted timestamp
+        self.refused = 0  # samples dropped by the time checks
+
+    def _stored_until(self):
+        """Last second of the newest period on flash (0 if empty)"""
+        seconds, ring, _ = self.tiers[0]
+        if not len(ring):
+            return 0
+        with open(ring.path, 'rb') as f:
+            return ring.timestamp(f, len(ring) - 1, self.buf) + seconds - 1
+
+    def record(self, data, ts=None):
+        """Add one snapshot (read_sensors() dict); False if its time was refused"""
+        if ts is None:
+            ts = int(self.clock())
+        if ts <= self.last or not timesync.valid(ts):
+            self.refused += 1
+            return False
+        self.last = ts
+        self._add(0, ts, int(data['temp'] * 10), data['humidity'], data['soil_percent'],
+                  data['tank_percent'], 100 if data['rain'] == 0 else 0,
+                  100 if data['relay'] == 0 else 0, 1)
+        return True
+
+    def _add(self, level, ts, temp10, humidity, soil, tank, rain_pct, pump_pct, weight):
+        seconds, ring, acc = self.tiers[level]
+        period = ts // seconds
+        if acc.n and period != acc.period:
+            record = acc.record(acc.period * seconds)
+            ring.append(record)
+            if level + 1 < len(self.tiers):
+                self._add(level + 1, acc.period * seconds, *unpack(record)[1:], weight=acc.n)
+            acc.reset(period)
+        if not acc.n:
+            acc.reset(period)
+        acc.add(temp10, humidity, soil, tank, rain_pct, pump_pct, weight)
+
+    def flush(self):
+        for _, ring, _ in self.tiers:
+            ring.flush()
+
+    def stats(self):
+        return {
+            'refused': self.refused,
+            'tiers': [{'seconds': s, 'records': len(r), 'flash_writes': r.writes} for s, r, _ in self.tiers],
+        }
+
+    def plan(self, t_from, step):
+        """(tier index, effective step) for a query
+
+        The finest tier still holding t_from is used, unless the next
+        coarser tier already fits in one step (fewer records to scan).
+        """
+        now = int(self.clock())
+        last = len(self.tiers) - 1
+        for i in range(last + 1):
+            seconds, ring, _ = self.tiers[i]
+            covers = t_from >= now - ring.capacity * seconds
+            coarser_fits = i < last and self.tiers[i + 1][0] <= step
+            if covers and not coarser_fits:
+                break
+        return i, max(step, self.tiers[i][0])
+
+    def query(self, t_from, t_to, step):
+        """Yield [t, temp, humidity, soil, tank, rain %, pump %] averaged per step"""
+        level, step = self.plan(t_from, step)
+        ring = self.tiers[level][1]
+        buf = self.buf
+        try:
+            f = open(ring.path, 'rb')
+        except OSError:
+            return
+        try:
+            index = ring.first_at_or_after(f, t_from, buf)
+            acc = Accumulator()
+            bucket = None
+            total = len(ring)
+            while index < total:
+                n = ring.read(f, index, READ_BLOCK, buf)
+                for k in range(n):
+                    ts, temp10, humidity, soil, tank, rain_pct, pump_pct = unpack(buf, k * RECORD_SIZE)
+                    if ts > t_to:
+                        index = total
+                        break
+                    b = (ts - t_from) // step
+                    if bucket is not None and b != bucket:
+                        yield row(t_from + bucket * step, acc)
+                        acc.reset(0)
+                    bucket = b
+                    acc.add(temp10, humidity, soil, tank, rain_pct, pump_pct)
+                else:
+                    index += n
+            if acc.n:
+                yield row(t_from + bucket * step, acc)
+        finally:
+            f.close()
+
+
+def row(ts, acc):
+    n = acc.n
+    return [ts, round(acc.temp / n / 10, 1), round(acc.humidity / n), round(acc.soil / n),
+            round(acc.tank / n), round(acc.rain / n), round(acc.pump / n)]
+
+
+def remove_files(directory='', tiers=TIERS):
+    """Delete the ring files (e.g. after changing TIERS)"""
+    for name, _, _, _ in tiers:
+        try:
+            os.remove(directory + '/' + name if directory else name)
+        except OSError:
+            pass
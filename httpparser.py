@@ -0,0 +1,167 @@
+"""Incremental HTTP/1.1 request parser
+
+feed() takes bytes as they arrive and returns the requests completed so
+far, so a request split over several packets, or several pipelined in
+one, parses the same as one delivered whole. The request line, headers
+and body are size-capped; a violation raises HTTPError carrying the
+status to answer with (the connection should then be closed).
+"""
+MAX_LINE = 1024  # request line or one header line
+MAX_HEADERS = 32
+MAX_BODY = 1024
+
+HEX = '0123456789abcdefABCDEF'
+
+
+class HTTPError(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+class Request:
+    def __init__(self, method, target, version):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.path, self.query = split_target(target)
+        self.headers = {}  # lower-case names
+        self.body = b''
+
+
+def unquote(s):
+    """Percent-decode a query component ('+' is a space)"""
+    if '%' not in s and '+' not in s:
+        return s
+    s = s.replace('+', ' ')
+    parts = s.split('%')
+    out = bytearray(parts[0].encode())
+    for part in parts[1:]:
+        if len(part) >= 2 and part[0] in HEX and part[1] in HEX:
+            out.append(int(part[:2], 16))
+            out.extend(part[2:].encode())
+        else:
+            out.extend(b'%' + part.encode())
+    try:
+        return out.decode()
+    except UnicodeError:
+        return s
+
+
+def parse_query(qs):
+    query = {}
+    for pair in qs.split('&'):
+        if pair:
+            key, _, value = pair.partition('=')
+            query[unquote(key)] = unquote(value)
+    return query
+
+
+def split_target(target):
+    """'/data?since=3' -> ('/data', {'since': '3'})"""
+    path, _, qs = target.partition('?')
+    if '%' in path:
+        path = unquote(path.replace('+', '%2B'))  # '+' is literal in paths
+    return path, parse_query(qs) if qs else {}
+
+
+class RequestParser:
+    """One per connection; feed() until it returns requests or raises"""
+
+    LINE = 0
+    HEADERS = 1
+    BODY = 2
+
+    def __init__(self, max_line=MAX_LINE, max_headers=MAX_HEADERS, max_body=MAX_BODY):
+        self.max_line = max_line
+        self.max_headers = max_headers
+        self.max_body = max_body
+        self.buf = b''
+        self.state = self.LINE
+        self.request = None
+        self.need = 0  # body bytes still expected
+
+    def partial(self):
+        """True while a request has started but isn't complete"""
+        return self.state != self.LINE or bool(self.buf)
+
+    def feed(self, data):
+        """Consume bytes; returns the list of requests completed by them"""
+        self.buf += data
+        done = []
+        while True:
+            if self.state == self.BODY:
+                if len(self.buf) < self.need:
+                    break
+                self.request.body = self.buf[:self.need]
+                self.buf = self.buf[self.need:]
+                done.append(self._finish())
+                continue
+            end = self.buf.find(b'\n')
+            if end < 0:
+                if len(self.buf) > self.max_line:
+                    raise HTTPError('414 URI Too Long' if self.state == self.LINE
+                                    else '431 Request Header Fields Too Large')
+                break
+            if end > self.max_line:
+                raise HTTPError('414 URI Too Long' if self.state == self.LINE
+                                else '431 Request Header Fields Too Large')
+            line = self.buf[:end]
+            self.buf = self.buf[end + 1:]
+            if line.endswith(b'\r'):
+                line = line[:-1]
+            try:
+                line = line.decode()
+            except UnicodeError:
+                raise HTTPError('400 Bad Request')
+            if self.state == self.LINE:
+                self._request_line(line)
+            elif line:
+                self._header(line)
+            elif self._end_of_headers():
+                done.append(self._finish())
+        return done
+
+    def _request_line(self, line):
+        if not line:  # stray CRLF between requests is allowed
+            return
+        parts = line.split(' ')
+        if len(parts) != 3 or not parts[0] or not parts[1].startswith('/'):
+            raise HTTPError('400 Bad Request')
+        if not parts[2].startswith('HTTP/1.'):
+            raise HTTPError('505 HTTP Version Not Supported')
+        self.request = Request(parts[0], parts[1], parts[2])
+        self.state = self.HEADERS
+
+    def _header(self, line):
+        headers = self.request.headers
+        name, sep, value = line.partition(':')
+        if not sep or not name or name[0] in ' \t' or name[-1] in ' \t':
+            raise HTTPError('400 Bad Request')
+        if len(headers) >= self.max_headers:
+            raise HTTPError('431 Request Header Fields Too Large')
+        headers[name.lower()] = value.strip()
+
+    def _end_of_headers(self):
+        """Headers done: True if the request is complete, False if a body follows"""
+        headers = self.request.headers
+        if 'transfer-encoding' in headers:
+            raise HTTPError('501 Not Implemented')
+        length = headers.get('content-length', '0')
+        if not length.isdigit():
+            raise HTTPError('400 Bad Request')
+        length = int(length)
+        if length > self.max_body:
+            raise HTTPError('413 Payload Too Large')
+        if not length:
+            return True
+        self.need = length
+        self.state = self.BODY
+        return False
+
+    def _finish(self):
+        request = self.request
+        self.request = None
+        self.need = 0
+        self.state = self.LINE
+        return request
@@ -0,0 +1,100 @@
+"""Chunked HTTP response writer with preallocated buffers
+
+Streamed pages are copied into a fixed bytearray and sent as HTTP/1.1
+chunks, so peak heap per response is one buffer instead of the whole
+rendered page.
+"""
+
+CHUNK_SIZE = 1024  # payload bytes per HTTP chunk
+POOL_SIZE = 2  # buffers kept for concurrent responses (async mode)
+HEAD_LEN = 6  # "hhhh\r\n" - fixed width so the frame is built in place
+LAST_CHUNK = b'0\r\n\r\n'
+HEX = b'0123456789abcdef'
+
+
+class ChunkedEncoder:
+    """Frames byte chunks into HTTP chunks inside one reusable buffer"""
+
+    def __init__(self, size=CHUNK_SIZE):
+        self.size = size
+        self.buf = bytearray(HEAD_LEN + size + 2)
+        self.mv = memoryview(self.buf)
+
+    def _frame(self, n):
+        """Write the size header and trailer around n payload bytes"""
+        buf = self.buf
+        for i in range(4):
+            buf[3 - i] = HEX[(n >> (4 * i)) & 0xF]
+        buf[4] = 13
+        buf[5] = 10
+        buf[HEAD_LEN + n] = 13
+        buf[HEAD_LEN + n + 1] = 10
+        return self.mv[:HEAD_LEN + n + 2]
+
+    def frames(self, chunks):
+        """Yield ready-to-send frames; each is only valid until the next one"""
+        size = self.size
+        mv = self.mv
+        n = 0
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            chunk = memoryview(chunk)  # slice without copying
+            pos = 0
+            left = len(chunk)
+            while left:
+                take = min(left, size - n)
+                mv[HEAD_LEN + n:HEAD_LEN + n + take] = chunk[pos:pos + take]
+                n += take
+                pos += take
+                left -= take
+                if n == size:
+                    yield self._frame(n)
+                    n = 0
+        if n:
+            yield self._frame(n)
+        yield LAST_CHUNK
+
+
+class EncoderPool:
+    """Small pool of encoders so concurrent responses never share a buffer"""
+
+    def __init__(self, count=POOL_SIZE, size=CHUNK_SIZE):
+        self.count = count  # buffers kept; extras allocated on a miss are dropped
+        self.size = size
+        self.free = [ChunkedEncoder(size) for _ in range(count)]
+        self.misses = 0  # responses that had to allocate a temporary buffer
+
+    def acquire(self):
+        if self.free:
+            return self.free.pop()
+        self.misses += 1
+        return ChunkedEncoder(self.size)
+
+    def release(self, encoder):
+        if len(self.free) < self.count and encoder.size == self.size:
+            self.free.append(encoder)
+
+
+pool = EncoderPool()
+
+
+def send_chunked(sock, chunks):
+    """Blocking send of a chunk iterator as a chunked body"""
+    encoder = pool.acquire()
+    try:
+        for frame in encoder.frames(chunks):
+            sock.sendall(frame)
+    finally:
+        pool.release(encoder)
+
+
+async def write_chunked(writer, chunks):
+    """asyncio StreamWriter version of send_chunked()"""
+    encoder = pool.acquire()
+    try:
+        for frame in encoder.frames(chunks):
+            writer.write(bytes(frame))  # transports may hold on to a view
+            await writer.drain()
+    finally:
+        pool.release(encoder)
@@ -0,0 +1,268 @@
+"""Translations compiled into flat per-language lookup tables
+
+TRANSLATIONS is the editable source tree. At import it is flattened into
+one dict per language keyed by dotted path ("crops.paddy.name"), with
+English filling any key a language is missing, so a lookup is a single
+dict access instead of a split-and-walk.
+"""
+import sys
+
+DEFAULT_LANGUAGE = "en"
+LANGUAGES = (("en", "English"), ("hi", "हिन्दी"), ("te", "తెలుగు"))
+
+TRANSLATIONS = {
+    "en": {
+        "title": "Smart Crop Predictor",
+        "temperature": "Temperature",
+        "humidity": "Humidity",
+        "soil_moisture": "Soil Moisture",
+        "rain_status": "Rain Status",
+        "tank_level": "Tank Level",
+        "irrigation": "Pump",
+        "refresh": "Refresh",
+        "toggle_pump": "Toggle Pump",
+        "change_mode": "Mode",
+        "force_water": "Force Water",
+        "manual_water": "Manual Water",
+        "stop_water": "Stop Water",
+        "status_good": "Good",
+        "status_warn": "Warning",
+        "status_crit": "Critical",
+        "suggestion": "Suggestion:",
+        "logs": "Logs",
+        "clear_logs": "Clear",
+        "rain_detected": "Rain detected - Pump OFF",
+        "no_rain": "No rain",
+        "soil_dry": "Soil dry - irrigation needed",
+        "soil_wet": "Soil wet - stop irrigation",
+        "tank_empty": "Tank empty! Refill needed",
+        "normal": "Normal conditions",
+        "predicted_crop": "PREDICTED CROP",
+        "best_crop": "Best Crop:",
+        "crop_score": "Suitability:",
+        "auto_mode": "Auto Prediction",
+        "current_season": "Season:",
+        "language": "Language",
+        "rating_excellent": "⭐⭐⭐ Excellent",
+        "rating_good": "⭐⭐ Good",
+        "rating_fair": "⭐ Fair",
+        "rating_poor": "⭕ Poor",
+        "rain_on": "🌧️ RAINING",
+        "rain_off": "☀️ NO RAIN",
+        "pump_on": "💧 ON",
+        "pump_off": "❌ OFF",
+        "low_water": "Low water level!",
+        "events": {
+            "started": "System started - Multi-language support",
+            "pump_on": "Pump ON",
+            "pump_off": "Pump OFF",
+            "mode": "Mode: {}",
+            "force_on": "Force water ON ({}s)",
+            "force_off": "Force water OFF",
+            "stop": "Water STOP",
+            "cleared": "Logs cleared",
+            "language": "Language: {}",
+            "wifi_up": "WiFi connected (down {}s)",
+            "wifi_down": "WiFi lost - control continues offline",
+            "unknown": "Event {}"
+        },
+        "crops": {
+            "paddy": {"name": "Rice", "emoji": "🌾", "desc": "Kharif crop", "season_type": "kharif"},
+            "wheat": {"name": "Wheat", "emoji": "🌾", "desc": "Rabi crop", "season_type": "rabi"},
+            "maize": {"name": "Maize", "emoji": "🌽", "desc": "Kharif/Rabi", "season_type": "both"},
+            "vegetables": {"name": "Vegetables", "emoji": "🥦", "desc": "All seasons", "season_type": "all"},
+            "cotton": {"name": "Cotton", "emoji": "🧵", "desc": "Kharif crop", "season_type": "kharif"},
+            "millets": {"name": "Millets", "emoji": "🌾", "desc": "Kharif crop", "season_type": "kharif"},
+            "groundnut": {"name": "Groundnut", "emoji": "🥜", "desc": "Kharif crop", "season_type": "kharif"},
+            "sugarcane": {"name": "Sugarcane", "emoji": "🎋", "desc": "Year-round", "season_type": "all"}
+        },
+        "seasons": {
+            "rabi_sowing": "🌱 Rabi (Sowing)",
+            "rabi_growing": "🌾 Rabi (Growing)",
+            "rabi_harvest": "📦 Rabi (Harvest)",
+            "kharif_sowing": "🌱 Kharif (Sowing)",
+            "kharif_growing": "🌾 Kharif (Growing)", 
+            "kharif_harvest": "📦 Kharif (Harvest)",
+            "zaid": "☀️ Zaid (Summer)"
+        }
+    },
+    "hi": {
+        "title": "स्मार्ट फसल भविष्यवक्ता",
+        "temperature": "तापमान",
+        "humidity": "नमी",
+        "soil_moisture": "मिट्टी नमी",
+        "rain_status": "वर्षा स्थिति",
+        "tank_level": "टैंक स्तर",
+        "irrigation": "पम्प",
+        "refresh": "रिफ्रेश",
+        "toggle_pump": "पम्प टॉगल",
+        "change_mode": "मोड",
+        "force_water": "जबरन पानी",
+        "manual_water": "मैन्युअल पानी",
+        "stop_water": "पानी रोको",
+        "status_good": "अच्छा",
+        "status_warn": "चेतावनी",
+        "status_crit": "गंभीर",
+        "suggestion": "सलाह:",
+        "logs": "लॉग",
+        "clear_logs": "साफ",
+        "rain_detected": "बारिश - पम्प बंद",
+        "no_rain": "बारिश नहीं",
+        "soil_dry": "मिट्टी सूखी - सिंचाई चाहिए",
+        "soil_wet": "मिट्टी गीली - सिंचाई बंद",
+        "tank_empty": "टैंक खाली! भरें",
+        "normal": "सामान्य",
+        "predicted_crop": "भविष्यवाणी फसल",
+        "best_crop": "सर्वोत्तम फसल:",
+        "crop_score": "उपयुक्तता:",
+        "auto_mode": "स्वचालित भविष्यवाणी",
+        "current_season": "मौसम:",
+        "language": "भाषा",
+        "rating_excellent": "⭐⭐⭐ उत्तम",
+        "rating_good": "⭐⭐ अच्छा",
+        "rating_fair": "⭐ ठीक",
+        "rating_poor": "⭕ खराब",
+        "rain_on": "🌧️ बारिश",
+        "rain_off": "☀️ बारिश नहीं",
+        "pump_on": "💧 चालू",
+        "pump_off": "❌ बंद",
+        "low_water": "कम पानी!",
+        "events": {
+            "started": "सिस्टम शुरू - बहुभाषी समर्थन",
+            "pump_on": "पम्प चालू",
+            "pump_off": "पम्प बंद",
+            "mode": "मोड: {}",
+            "force_on": "जबरन पानी चालू ({}s)",
+            "force_off": "जबरन पानी बंद",
+            "stop": "पानी रोका",
+            "cleared": "लॉग साफ",
+            "language": "भाषा: {}",
+            "wifi_up": "वाईफाई जुड़ा ({}s बंद रहा)",
+            "wifi_down": "वाईफाई टूटा - नियंत्रण ऑफ़लाइन जारी"
+        },
+        "crops": {
+            "paddy": {"name": "धान", "emoji": "🌾", "desc": "खरीफ फसल", "season_type": "kharif"},
+            "wheat": {"name": "गेहूं", "emoji": "🌾", "desc": "रबी फसल", "season_type": "rabi"},
+            "maize": {"name": "मक्का", "emoji": "🌽", "desc": "खरीफ/रबी", "season_type": "both"},
+            "vegetables": {"name": "सब्जियां", "emoji": "🥦", "desc": "सभी मौसम", "season_type": "all"},
+            "cotton": {"name": "कपास", "emoji": "🧵", "desc": "खरीफ फसल", "season_type": "kharif"},
+            "millets": {"name": "मोटे अनाज", "emoji": "🌾", "desc": "खरीफ फसल", "season_type": "kharif"},
+            "groundnut": {"name": "मूंगफली", "emoji": "🥜", "desc": "खरीफ फसल", "season_type": "kharif"},
+            "sugarcane": {"name": "गन्ना", "emoji": "🎋", "desc": "पूरे साल", "season_type": "all"}
+        },
+        "seasons": {
+            "rabi_sowing": "🌱 रबी (बुवाई)",
+            "rabi_growing": "🌾 रबी (बढ़ रहा)",
+            "rabi_harvest": "📦 रबी (कटाई)",
+            "kharif_sowing": "🌱 खरीफ (बुवाई)",
+            "kharif_growing": "🌾 खरीफ (बढ़ रहा)", 
+            "kharif_harvest": "📦 खरीफ (कटाई)",
+            "zaid": "☀️ जायद (गर्मी)"
+        }
+    },
+    "te": {
+        "title": "స్మార్ట్ పంట ఊహించేందుకు",
+        "temperature": "ఉష్ణోగ్రత",
+        "humidity": "తేమ",
+        "soil_moisture": "నేల తేమ",
+        "rain_status": "వర్షం స్థితి",
+        "tank_level": "ట్యాంక్ స్థాయి",
+        "irrigation": "పంపు",
+        "refresh": "రిఫ్రెష్",
+        "toggle_pump": "పంపు మార్పు",
+        "change_mode": "మోడ్",
+        "force_water": "నీరు బలం",
+        "manual_water": "మాన్యువల్ నీరు",
+        "stop_water": "నీరు ఆపండి",
+        "status_good": "మంచిది",
+        "status_warn": "హెచ్చరిక",
+        "status_crit": "క్లిష్టం",
+        "suggestion": "సలహా:",
+        "logs": "లాగ్‌లు",
+        "clear_logs": "క్లియర్",
+        "rain_detected": "వర్షం - పంపు ఆఫ్",
+        "no_rain": "వర్షం లేదు",
+        "soil_dry": "నేల పొడి - నీరు కావాలి",
+        "soil_wet": "నేల తడి - నీరు ఆపండి",
+        "tank_empty": "ట్యాంక్ ఖాళీ! నింపండి",
+        "normal": "సాధారణం",
+        "predicted_crop": "ఊహించిన పంట",
+        "best_crop": "ఉత్తమ పంట:",
+        "crop_score": "సరిపడుతుంది:",
+        "auto_mode": "స్వయంచాలకంగా ఊహించు",
+        "current_season": "ఋతువు:",
+        "language": "భాష",
+        "rating_excellent": "⭐⭐⭐ అద్భుతం",
+        "rating_good": "⭐⭐ మంచిది",
+        "rating_fair": "⭐ సరిపోతుంది",
+        "rating_poor": "⭕ పేలవం",
+        "rain_on": "🌧️ వర్షం",
+        "rain_off": "☀️ వర్షం లేదు",
+        "pump_on": "💧 ఆన్",
+        "pump_off": "❌ ఆఫ్",
+        "low_water": "నీటి స్థాయి తక్కువ!",
+        "events": {
+            "started": "సిస్టమ్ ప్రారంభమైంది - బహుభాషా మద్దతు",
+            "pump_on": "పంపు ఆన్",
+            "pump_off": "పంపు ఆఫ్",
+            "mode": "మోడ్: {}",
+            "force_on": "బలవంతపు నీరు ఆన్ ({}s)",
+            "force_off": "బలవంతపు నీరు ఆఫ్",
+            "stop": "నీరు ఆపబడింది",
+            "cleared": "లాగ్‌లు క్లియర్",
+            "language": "భాష: {}",
+            "wifi_up": "వైఫై కనెక్ట్ అయింది ({}s ఆగింది)",
+            "wifi_down": "వైఫై పోయింది - నియంత్రణ ఆఫ్‌లైన్‌లో కొనసాగుతుంది"
+        },
+        "crops": {
+            "paddy": {"name": "వరి", "emoji": "🌾", "desc": "ఖరీఫ్ పంట", "season_type": "kharif"},
+            "wheat": {"name": "గోధుమ", "emoji": "🌾", "desc": "రబీ పంట", "season_type": "rabi"},
+            "maize": {"name": "మొక్కజొన్న", "emoji": "🌽", "desc": "ఖరీఫ్/రబీ", "season_type": "both"},
+            "vegetables": {"name": "కూరగాయలు", "emoji": "🥦", "desc": "అన్ని ఋతువులు", "season_type": "all"},
+            "cotton": {"name": "పత్తి", "emoji": "🧵", "desc": "ఖరీఫ్ పంట", "season_type": "kharif"},
+            "millets": {"name": "చిన్నధాన్యాలు", "emoji": "🌾", "desc": "ఖరీఫ్ పంట", "season_type": "kharif"},
+            "groundnut": {"name": "వేరుశనగ", "emoji": "🥜", "desc": "ఖరీఫ్ పంట", "season_type": "kharif"},
+            "sugarcane": {"name": "చెరకు", "emoji": "🎋", "desc": "సంవత్సరం పొడవునా", "season_type": "all"}
+        },
+        "seasons": {
+            "rabi_sowing": "🌱 రబీ (విత్తడం)",
+            "rabi_growing": "🌾 రబీ (పెరుగుతోంది)",
+            "rabi_harvest": "📦 రబీ (కోత)",
+            "kharif_sowing": "🌱 ఖరీఫ్ (విత్తడం)",
+            "kharif_growing": "🌾 ఖరీఫ్ (పెరుగుతోంది)", 
+            "kharif_harvest": "📦 ఖరీఫ్ (కోత)",
+            "zaid": "☀️ జైద్ (వేసవి)"
+        }
+    }
+}
+
+_intern = getattr(sys, "intern", lambda s: s)  # MicroPython has no sys.intern
+
+def _flatten(tree, prefix, out):
+    """Add every node of `tree` to `out` under its dotted path"""
+    for key, value in tree.items():
+        path = _intern(prefix + key)
+        out[path] = value
+        if isinstance(value, dict):
+            _flatten(value, path + ".", out)
+    return out
+
+def compile_tables():
+    """One flat table per language, falling back to English key by key"""
+    english = _flatten(TRANSLATIONS[DEFAULT_LANGUAGE], "", {})
+    tables = {}
+    for lang, tree in TRANSLATIONS.items():
+        table = dict(english)
+        _flatten(tree, "", table)
+        tables[lang] = table
+    return tables
+
+TABLES = compile_tables()
+
+def table(lang):
+    """Flat lookup table for `lang` (English if unknown) - pick once per request"""
+    return TABLES.get(lang) or TABLES[DEFAULT_LANGUAGE]
+
+def translate(key, lang):
+    """Look up `key` in `lang`, then English, then return the key itself"""
+    return table(lang).get(key, key)
@@ -0,0 +1,63 @@
+"""Small bounded LRU cache with hit/miss counters
+
+MicroPython dicts don't keep insertion order, so recency is tracked in a
+separate key list. Capacities here are a few dozen entries at most, where
+the list scan is cheaper than an extra linked structure per entry.
+"""
+
+
+class LRUCache:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = {}
+        self.order = []  # least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Cached value or None; counts the hit or miss"""
+        value = self.data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.order[-1] != key:
+            self.order.remove(key)
+            self.order.append(key)
+        return value
+
+    def put(self, key, value):
+        if key in self.data:
+            self.order.remove(key)
+        elif len(self.order) >= self.capacity:
+            oldest = self.order.pop(0)
+            del self.data[oldest]
+            self.evictions += 1
+        self.data[key] = value
+        self.order.append(key)
+
+    def evict(self, key):
+        """Drop one entry; True if it was cached"""
+        if key not in self.data:
+            return False
+        del self.data[key]
+        self.order.remove(key)
+        self.evictions += 1
+        return True
+
+    def clear(self):
+        self.evictions += len(self.order)
+        self.data.clear()
+        self.order = []
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.order),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0,
+        }
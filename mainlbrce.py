@@ -1,22 +1,31 @@
-import network
 import socket
 import time
-import machine
-import dht
+import errno
 import json
 import gc
-from machine import Pin, ADC
-
-# ==== PINS SETUP ====
-soil = ADC(Pin(34))
-soil.atten(ADC.ATTN_11DB)
-tank = ADC(Pin(35))
-tank.atten(ADC.ATTN_11DB)
-rain_sensor = ADC(Pin(32))
-rain_sensor.atten(ADC.ATTN_11DB)
-relay = Pin(27, Pin.OUT)
-relay.value(1)  # Initially OFF
-dht_sensor = dht.DHT11(Pin(4))
+import binascii
+import httpwriter
+import i18n
+import crops
+import lru
+import history
+import eventlog
+import control
+import actuator
+import blynksink
+import hal
+import profiler
+import gcpolicy
+import httpparser
+import push
+import sampler as sampling
+import telemetry
+import timesync
+import wifimgr
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
 
 # ==== SYSTEM VARIABLES ====
 system_mode = "auto"  # auto/manual
@@ -25,18 +34,80 @@ wet_threshold = 1500   # ADC value when wet
 tank_low_threshold = 3000  # Empty tank ADC
 tank_full_threshold = 800  # Full tank ADC
 current_language = "en"
-operation_logs = []
+event_log = eventlog.EventLog(clock=hal.time)
+LOGS_SHOWN = 8  # events on the dashboard
 predicted_crop = "paddy"
 RAIN_THRESHOLD = 50  # Adjust based on your sensor
 
+# ==== PINS SETUP ====
+# ESP32 pins on the board, the simulated farm in hal_sim elsewhere
+board = hal.get_board()
+soil = board.adc('soil', 34, span=(dry_threshold, wet_threshold))
+tank = board.adc('tank', 35, span=(tank_low_threshold, tank_full_threshold))
+rain_sensor = board.adc('rain', 32, span=(4095, 0))
+relay = board.output('relay', 27, 1)  # Initially OFF
+dht_sensor = board.dht11('dht', 4)
+
+# ==== SERVER CONFIG ====
+SERVER_MODE = "async"  # async/serial
+HTTP_PORT = 80
+MAX_BACKLOG = 5
+CLIENT_TIMEOUT = 10  # seconds a client may take to send its request
+KEEPALIVE_IDLE = 5  # seconds an idle persistent connection is kept (async)
+SERIAL_KEEPALIVE_IDLE = 1  # serial mode serves no one else meanwhile, keep it short
+KEEPALIVE_MAX_REQUESTS = 100  # then the connection is closed and reopened
+MAX_CLIENTS = 4  # open connections (async, /events streams aside); more are answered 503 and closed
+CONTROL_PERIOD_MS = 2000  # auto-irrigation evaluation period, independent of HTTP
+FORCE_RUN_MS = 5000  # "Force water" runs the pump this long; pressing again restarts the count
+PROFILING = True  # per-stage timings at /metrics; near zero cost when off
+profiler.enable(PROFILING)
+GC_POLICY = "adaptive"  # adaptive/always (gc.collect() after every request)
+gc_policy = gcpolicy.GCPolicy(GC_POLICY)
+MAX_SUBSCRIBERS = 4  # live /events dashboards (async); more are told to poll
+push_hub = push.Hub(MAX_SUBSCRIBERS)
+active_clients = 0  # async requests in flight; GC waits for zero
+open_clients = 0  # async connections open, idle keep-alive ones included
+refused_clients = 0  # connections answered 503 at MAX_CLIENTS
+
+# ==== SAMPLER CONFIG ====
+SAMPLE_PERIOD_MS = 2000  # DHT11 can't be polled faster than ~1 Hz
+SNAPSHOT_MAX_AGE_MS = 10000  # older snapshots are re-read on demand
+SERIAL_LOG = False  # print one line per sample
+
+# ==== HISTORY CONFIG ====
+HISTORY_DIR = ''  # flash directory for the ring files ('' = root)
+HISTORY_SPAN = 3600  # default /history window in seconds
+history_store = None  # history.HistoryStore, opened in start_server()
+
+# ==== PREDICTION CACHE ====
+PREDICTION_CACHE_SIZE = 16
+SOIL_BUCKET = 1  # soil % per cache bucket (1 = exact)
+
 # ==== WIFI CONFIG ====
 WIFI_SSID = "kusuma"
 WIFI_PASSWORD = "12345678"
+AP_ESSID = "SmartFarm-AP"  # raised while the station is down
+AP_PASSWORD = "12345678"
+
+# ==== CLOCK CONFIG ====
+NTP_SERVER = "pool.ntp.org"  # a literal IP skips the DNS lookup
+time_sync = None  # timesync.TimeSync, started in start_server(); history and the outbox wait for it
+
+# ==== BLYNK CONFIG ====
+# the Blynk app is another sink of the same samples (BLYNKAPPCODE.py turns it on)
+BLYNK_ENABLED = False
+BLYNK_AUTH = "WZGOoNTn9bplmZ-EUusXL_gUYgGXTKdK"
+BLYNK_SERVER = "blynk.cloud"  # bench/fake_blynk.py serves the same protocol locally
+BLYNK_SERVER_IP = ""  # the server's IP skips the DNS lookup (BLYNK_SERVER still names the host)
+BLYNK_PORT = 80
+BLYNK_UPLINK = "pins"  # pins: V0-V6 states as text / batch: all of telemetry.BLYNK_FIELDS on V10
+MANUAL_RUN_MS = 10000  # a pump start from the app in manual mode switches itself off after this
+blynk_sink = None  # blynksink.BlynkSink, set up in start_server()
 
 # ==== SEASON DETECTION ====
 def get_season():
     """Determine season based on month with Rabi/Kharif classification"""
-    month = time.localtime()[1]
+    month = time.localtime(int(hal.time()))[1]
     
     if month in [10, 11, 12, 1, 2]:
         season_type = "rabi"
@@ -60,180 +131,13 @@ def get_season():
         season_type = "zaid"
         return "zaid", season_type
 
-# ==== TRANSLATIONS ====
-TRANSLATIONS = {
-    "en": {
-        "title": "Smart Crop Predictor",
-        "temperature": "Temperature",
-        "humidity": "Humidity",
-        "soil_moisture": "Soil Moisture",
-        "rain_status": "Rain Status",
-        "tank_level": "Tank Level",
-        "irrigation": "Pump",
-        "refresh": "Refresh",
-        "toggle_pump": "Toggle Pump",
-        "change_mode": "Mode",
-        "force_water": "Force Water",
-        "manual_water": "Manual Water",
-        "stop_water": "Stop Water",
-        "status_good": "Good",
-        "status_warn": "Warning",
-        "status_crit": "Critical",
-        "suggestion": "Suggestion:",
-        "logs": "Logs",
-        "clear_logs": "Clear",
-        "rain_detected": "Rain detected - Pump OFF",
-        "no_rain": "No rain",
-        "soil_dry": "Soil dry - irrigation needed",
-        "soil_wet": "Soil wet - stop irrigation",
-        "tank_empty": "Tank empty! Refill needed",
-        "normal": "Normal conditions",
-        "predicted_crop": "PREDICTED CROP",
-        "best_crop": "Best Crop:",
-        "crop_score": "Suitability:",
-        "auto_mode": "Auto Prediction",
-        "current_season": "Season:",
-        "language": "Language",
-        "crops": {
-            "paddy": {"name": "Rice", "emoji": "🌾", "desc": "Kharif crop", "season_type": "kharif"},
-            "wheat": {"name": "Wheat", "emoji": "🌾", "desc": "Rabi crop", "season_type": "rabi"},
-            "maize": {"name": "Maize", "emoji": "🌽", "desc": "Kharif/Rabi", "season_type": "both"},
-            "vegetables": {"name": "Vegetables", "emoji": "🥦", "desc": "All seasons", "season_type": "all"},
-            "cotton": {"name": "Cotton", "emoji": "🧵", "desc": "Kharif crop", "season_type": "kharif"},
-            "millets": {"name": "Millets", "emoji": "🌾", "desc": "Kharif crop", "season_type": "kharif"},
-            "groundnut": {"name": "Groundnut", "emoji": "🥜", "desc": "Kharif crop", "season_type": "kharif"},
-            "sugarcane": {"name": "Sugarcane", "emoji": "🎋", "desc": "Year-round", "season_type": "all"}
-        },
-        "seasons": {
-            "rabi_sowing": "🌱 Rabi (Sowing)",
-            "rabi_growing": "🌾 Rabi (Growing)",
-            "rabi_harvest": "📦 Rabi (Harvest)",
-            "kharif_sowing": "🌱 Kharif (Sowing)",
-            "kharif_growing": "🌾 Kharif (Growing)", 
-            "kharif_harvest": "📦 Kharif (Harvest)",
-            "zaid": "☀️ Zaid (Summer)"
-        }
-    },
-    "hi": {
-        "title": "स्मार्ट फसल भविष्यवक्ता",
-        "temperature": "तापमान",
-        "humidity": "नमी",
-        "soil_moisture": "मिट्टी नमी",
-        "rain_status": "वर्षा स्थिति",
-        "tank_level": "टैंक स्तर",
-        "irrigation": "पम्प",
-        "refresh": "रिफ्रेश",
-        "toggle_pump": "पम्प टॉगल",
-        "change_mode": "मोड",
-        "force_water": "जबरन पानी",
-        "manual_water": "मैन्युअल पानी",
-        "stop_water": "पानी रोको",
-        "status_good": "अच्छा",
-        "status_warn": "चेतावनी",
-        "status_crit": "गंभीर",
-        "suggestion": "सलाह:",
-        "logs": "लॉग",
-        "clear_logs": "साफ",
-        "rain_detected": "बारिश - पम्प बंद",
-        "no_rain": "बारिश नहीं",
-        "soil_dry": "मिट्टी सूखी - सिंचाई चाहिए",
-        "soil_wet": "मिट्टी गीली - सिंचाई बंद",
-        "tank_empty": "टैंक खाली! भरें",
-        "normal": "सामान्य",
-        "predicted_crop": "भविष्यवाणी फसल",
-        "best_crop": "सर्वोत्तम फसल:",
-        "crop_score": "उपयुक्तता:",
-        "auto_mode": "स्वचालित भविष्यवाणी",
-        "current_season": "मौसम:",
-        "language": "भाषा",
-        "crops": {
-            "paddy": {"name": "धान", "emoji": "🌾", "desc": "खरीफ फसल", "season_type": "kharif"},
-            "wheat": {"name": "गेहूं", "emoji": "🌾", "desc": "रबी फसल", "season_type": "rabi"},
-            "maize": {"name": "मक्का", "emoji": "🌽", "desc": "खरीफ/रबी", "season_type": "both"},
-            "vegetables": {"name": "सब्जियां", "emoji": "🥦", "desc": "सभी मौसम", "season_type": "all"},
-            "cotton": {"name": "कपास", "emoji": "🧵", "desc": "खरीफ फसल", "season_type": "kharif"},
-            "millets": {"name": "मोटे अनाज", "emoji": "🌾", "desc": "खरीफ फसल", "season_type": "kharif"},
-            "groundnut": {"name": "मूंगफली", "emoji": "🥜", "desc": "खरीफ फसल", "season_type": "kharif"},
-            "sugarcane": {"name": "गन्ना", "emoji": "🎋", "desc": "पूरे साल", "season_type": "all"}
-        },
-        "seasons": {
-            "rabi_sowing": "🌱 रबी (बुवाई)",
-            "rabi_growing": "🌾 रबी (बढ़ रहा)",
-            "rabi_harvest": "📦 रबी (कटाई)",
-            "kharif_sowing": "🌱 खरीफ (बुवाई)",
-            "kharif_growing": "🌾 खरीफ (बढ़ रहा)", 
-            "kharif_harvest": "📦 खरीफ (कटाई)",
-            "zaid": "☀️ जायद (गर्मी)"
-        }
-    },
-    "te": {
-        "title": "స్మార్ట్ పంట ఊహించేందుకు",
-        "temperature": "ఉష్ణోగ్రత",
-        "humidity": "తేమ",
-        "soil_moisture": "నేల తేమ",
-        "rain_status": "వర్షం స్థితి",
-        "tank_level": "ట్యాంక్ స్థాయి",
-        "irrigation": "పంపు",
-        "refresh": "రిఫ్రెష్",
-        "toggle_pump": "పంపు మార్పు",
-        "change_mode": "మోడ్",
-        "force_water": "నీరు బలం",
-        "manual_water": "మాన్యువల్ నీరు",
-        "stop_water": "నీరు ఆపండి",
-        "status_good": "మంచిది",
-        "status_warn": "హెచ్చరిక",
-        "status_crit": "క్లిష్టం",
-        "suggestion": "సలహా:",
-        "logs": "లాగ్‌లు",
-        "clear_logs": "క్లియర్",
-        "rain_detected": "వర్షం - పంపు ఆఫ్",
-        "no_rain": "వర్షం లేదు",
-        "soil_dry": "నేల పొడి - నీరు కావాలి",
-        "soil_wet": "నేల తడి - నీరు ఆపండి",
-        "tank_empty": "ట్యాంక్ ఖాళీ! నింపండి",
-        "normal": "సాధారణం",
-        "predicted_crop": "ఊహించిన పంట",
-        "best_crop": "ఉత్తమ పంట:",
-        "crop_score": "సరిపడుతుంది:",
-        "auto_mode": "స్వయంచాలకంగా ఊహించు",
-        "current_season": "ఋతువు:",
-        "language": "భాష",
-        "crops": {
-            "paddy": {"name": "వరి", "emoji": "🌾", "desc": "ఖరీఫ్ పంట", "season_type": "kharif"},
-            "wheat": {"name": "గోధుమ", "emoji": "🌾", "desc": "రబీ పంట", "season_type": "rabi"},
-            "maize": {"name": "మొక్కజొన్న", "emoji": "🌽", "desc": "ఖరీఫ్/రబీ", "season_type": "both"},
-            "vegetables": {"name": "కూరగాయలు", "emoji": "🥦", "desc": "అన్ని ఋతువులు", "season_type": "all"},
-            "cotton": {"name": "పత్తి", "emoji": "🧵", "desc": "ఖరీఫ్ పంట", "season_type": "kharif"},
-            "millets": {"name": "చిన్నధాన్యాలు", "emoji": "🌾", "desc": "ఖరీఫ్ పంట", "season_type": "kharif"},
-            "groundnut": {"name": "వేరుశనగ", "emoji": "🥜", "desc": "ఖరీఫ్ పంట", "season_type": "kharif"},
-            "sugarcane": {"name": "చెరకు", "emoji": "🎋", "desc": "సంవత్సరం పొడవునా", "season_type": "all"}
-        },
-        "seasons": {
-            "rabi_sowing": "🌱 రబీ (విత్తడం)",
-            "rabi_growing": "🌾 రబీ (పెరుగుతోంది)",
-            "rabi_harvest": "📦 రబీ (కోత)",
-            "kharif_sowing": "🌱 ఖరీఫ్ (విత్తడం)",
-            "kharif_growing": "🌾 ఖరీఫ్ (పెరుగుతోంది)", 
-            "kharif_harvest": "📦 ఖరీఫ్ (కోత)",
-            "zaid": "☀️ జైద్ (వేసవి)"
-        }
-    }
-}
-
-def get_translation(key):
-    """Get translation for current language"""
-    keys = key.split('.')
-    value = TRANSLATIONS.get(current_language, TRANSLATIONS["en"])
-    
-    for k in keys:
-        if isinstance(value, dict):
-            value = value.get(k)
-        else:
-            return key
-    return value if value is not None else key
+def get_translation(key, lang=None):
+    """Get translation for current language (or `lang`)"""
+    return i18n.table(lang or current_language).get(key, key)
 
 def read_sensors():
     """Read all sensor values"""
+    t0 = profiler.begin()
     try:
         dht_sensor.measure()
         temperature = dht_sensor.temperature()
@@ -241,6 +145,7 @@ def read_sensors():
     except:
         temperature = 28
         humidity = 65
+    profiler.end('dht', t0)
     
     soil_value = soil.read()
     tank_value = tank.read()
@@ -279,744 +184,1196 @@ def read_sensors():
         'relay': relay.value()
     }
 
+sampler = sampling.Sampler(read_sensors, SAMPLE_PERIOD_MS, SNAPSHOT_MAX_AGE_MS)
+
+def sample_sensors():
+    """Read hardware once and fan the snapshot out to the sinks"""
+    return sampler.sample()
+
+def get_snapshot(max_age_ms=None):
+    """Latest sensor snapshot; only touches sensors if missing or stale"""
+    data = sampler.snapshot(max_age_ms)
+    data['relay'] = relay.value()  # relay changes between samples
+    return data
+
+prediction_cache = lru.LRUCache(PREDICTION_CACHE_SIZE)
+
 def predict_best_crop(data):
-    """Predict the best crop based on sensor data AND season"""
-    temp = data['temp']
-    moisture = data['soil_percent']
-    rain = data['rain']
+    """Predict the best crop, memoized on quantized temp/soil/season/language"""
     season, season_type = get_season()
+    temp = int(round(data['temp']))
+    moisture = data['soil_percent'] // SOIL_BUCKET * SOIL_BUCKET
+    key = (temp, moisture, season_type, current_language)
     
-    crops = [
-        ("paddy", "Rice", 20, 35, 70, 95, "kharif"),
-        ("wheat", "Wheat", 10, 25, 40, 70, "rabi"),
-        ("maize", "Maize", 15, 30, 50, 80, "both"),
-        ("vegetables", "Vegetables", 15, 30, 60, 85, "all"),
-        ("cotton", "Cotton", 20, 35, 45, 75, "kharif"),
-        ("millets", "Millets", 20, 40, 30, 65, "kharif"),
-        ("groundnut", "Groundnut", 22, 35, 40, 70, "kharif"),
-        ("sugarcane", "Sugarcane", 20, 35, 65, 90, "all")
-    ]
-    
-    crop_scores = []
-    for crop_id, crop_name, min_temp, max_temp, min_moisture, max_moisture, crop_season in crops:
-        score = 0
-        
-        # Season compatibility (40% weight)
-        if crop_season == "all":
-            score += 40
-        elif crop_season == "both" and season_type in ["rabi", "kharif"]:
-            score += 40
-        elif crop_season == season_type:
-            score += 40
-        elif crop_season == "kharif" and season_type == "zaid":
-            score += 20
-        elif crop_season == "rabi" and season_type == "zaid":
-            score += 15
-        else:
-            score += 5
-        
-        # Temperature score (30% weight)
-        if min_temp <= temp <= max_temp:
-            score += 30
-        elif temp < min_temp:
-            temp_diff = min_temp - temp
-            if temp_diff <= 5:
-                score += 20
-            elif temp_diff <= 10:
-                score += 10
-            else:
-                score += 5
-        else:
-            temp_diff = temp - max_temp
-            if temp_diff <= 5:
-                score += 20
-            elif temp_diff <= 10:
-                score += 10
-            else:
-                score += 5
-        
-        # Moisture score (30% weight)
-        if min_moisture <= moisture <= max_moisture:
-            score += 30
-        elif moisture < min_moisture:
-            if min_moisture - moisture <= 10:
-                score += 20
-            elif min_moisture - moisture <= 20:
-                score += 10
-            else:
-                score += 5
-        else:
-            if moisture - max_moisture <= 10:
-                score += 20
-            elif moisture - max_moisture <= 20:
-                score += 10
-            else:
-                score += 5
-        
-        crop_scores.append((crop_id, crop_name, score))
-    
-    crop_scores.sort(key=lambda x: x[2], reverse=True)
+    result = prediction_cache.get(key)
+    if result is None:
+        result = score_crops(temp, moisture, season_type)
+        prediction_cache.put(key, result)
+    return result
+
+def score_crops(temp, moisture, season_type):
+    """Rank crops and rate the best one in the current language"""
+    crop_scores = crops.rank_crops(temp, moisture, season_type)
     best_crop_id = crop_scores[0][0]
     best_score = crop_scores[0][2]
     
     score_percent = min(100, int(best_score))
+    T = i18n.table(current_language)
     if score_percent >= 80:
-        rating = "⭐⭐⭐ Excellent" if current_language == "en" else "⭐⭐⭐ उत्तम" if current_language == "hi" else "⭐⭐⭐ అద్భుతం"
+        rating = T["rating_excellent"]
         color = "#10b981"
     elif score_percent >= 60:
-        rating = "⭐⭐ Good" if current_language == "en" else "⭐⭐ अच्छा" if current_language == "hi" else "⭐⭐ మంచిది"
+        rating = T["rating_good"]
         color = "#3b82f6"
     elif score_percent >= 40:
-        rating = "⭐ Fair" if current_language == "en" else "⭐ ठीक" if current_language == "hi" else "⭐ సరిపోతుంది"
+        rating = T["rating_fair"]
         color = "#f59e0b"
     else:
-        rating = "⭕ Poor" if current_language == "en" else "⭕ खराब" if current_language == "hi" else "⭕ పేలవం"
+        rating = T["rating_poor"]
         color = "#ef4444"
     
     return best_crop_id, score_percent, rating, color, crop_scores
 
-def analyze_conditions():
-    """Analyze sensor data and provide advice"""
-    data = read_sensors()
+def analyze_conditions(data=None):
+    """Advice for the dashboard; relay decisions are made by `controller`"""
+    if data is None:
+        data = get_snapshot()
     
     if data['rain'] == 0:
-        if relay.value() == 0 and system_mode == "auto":
-            relay.value(1)
-            add_log(get_translation("rain_detected"))
         return {"advice": get_translation("rain_detected"), "status": "warn"}
     
-    if data['tank_percent'] < 20:
-        if relay.value() == 0:
-            relay.value(1)
-            add_log(get_translation("tank_empty"))
+    if data['tank_percent'] < control.TANK_STOP_BELOW:
         return {"advice": get_translation("tank_empty"), "status": "crit"}
     
     if system_mode == "auto":
-        if data['soil_percent'] < 30:
-            if data['tank_percent'] > 20:
-                if relay.value() == 1:
-                    relay.value(0)
-                    add_log(get_translation("soil_dry"))
-                return {"advice": get_translation("soil_dry"), "status": "warn"}
-        
-        elif data['soil_percent'] > 80:
-            if relay.value() == 0:
-                relay.value(1)
-                add_log(get_translation("soil_wet"))
+        if data['soil_percent'] < control.SOIL_ON_BELOW:
+            return {"advice": get_translation("soil_dry"), "status": "warn"}
+        elif data['soil_percent'] > control.SOIL_OFF_ABOVE:
             return {"advice": get_translation("soil_wet"), "status": "good"}
     
     return {"advice": get_translation("normal"), "status": "good"}
 
-def add_log(msg):
-    """Add log entry"""
-    t = time.localtime()
-    timestamp = f"{t[3]:02d}:{t[4]:02d}:{t[5]:02d}"
-    operation_logs.insert(0, f"[{timestamp}] {msg}")
-    if len(operation_logs) > 10:
-        operation_logs.pop()
-
-def connect_wifi():
-    """Connect to WiFi"""
-    print("Connecting to WiFi...")
-    wlan = network.WLAN(network.STA_IF)
-    wlan.active(True)
-    wlan.connect(WIFI_SSID, WIFI_PASSWORD)
-    
-    max_wait = 20
-    while max_wait > 0:
-        if wlan.isconnected():
-            break
-        max_wait -= 1
-        time.sleep(1)
-    
-    if wlan.isconnected():
-        ip = wlan.ifconfig()[0]
-        print(f"✅ Connected! IP: {ip}")
-        return ip
-    else:
-        print("❌ WiFi failed. Creating Access Point...")
-        ap = network.WLAN(network.AP_IF)
-        ap.active(True)
-        ap.config(essid='SmartFarm-AP', password='12345678')
-        time.sleep(2)
-        ip = ap.ifconfig()[0]
-        print(f"📡 AP IP: {ip}")
-        return ip
+pump = actuator.Actuator(relay, event_log.log)  # all relay writes go through here
+controller = control.Controller(pump, get_snapshot, lambda: system_mode == "auto",
+                                event_log.log, CONTROL_PERIOD_MS)
 
-def generate_html():
-    """Generate HTML page"""
-    data = read_sensors()
-    analysis = analyze_conditions()
-    season, season_type = get_season()
-    
-    best_crop_id, score_percent, rating, rating_color, all_scores = predict_best_crop(data)
-    
-    crop_info = get_translation(f"crops.{best_crop_id}")
-    if isinstance(crop_info, dict):
-        crop_name = crop_info.get("name", best_crop_id)
-        crop_emoji = crop_info.get("emoji", "🌱")
-        crop_desc = crop_info.get("desc", "")
+def sync_clock():
+    """NTP while WiFi is up; the RTC restarts at 2000 on every boot"""
+    if time_sync and wifi.is_up():
+        time_sync.poll()
+
+async def clock_loop():
+    while True:
+        sync_clock()
+        await asyncio.sleep(hal.real_s(timesync.POLL_MS))
+
+def poll_tasks():
+    """Everything the async tasks do, for the serial server; ms until the pump's next event"""
+    sync_clock()
+    sampler.poll()
+    controller.poll()
+    if blynk_sink:
+        blynk_sink.poll()
+    return pump.poll()
+
+def tasks_wait_ms(pump_wait):
+    """How long the serial server may block before poll_tasks() is due again"""
+    wait_ms = blynksink.POLL_MS if blynk_sink else CONTROL_PERIOD_MS
+    if pump_wait is not None:
+        wait_ms = max(10, min(pump_wait, wait_ms))
+    return wait_ms
+
+def wifi_changed(manager):
+    """Link came up or went down (the manager keeps reconnecting in the background)"""
+    if manager.is_up():
+        print(f"✅ Connected! IP: {manager.ip()}")
+        event_log.log(eventlog.WIFI_UP, min(manager.last_outage_ms // 1000, 32767))
     else:
-        crop_name = best_crop_id
-        crop_emoji = "🌱"
-        crop_desc = ""
-    
-    status_colors = {
-        "good": "#10b981",
-        "warn": "#f59e0b", 
-        "crit": "#ef4444"
+        print("❌ WiFi lost, reconnecting in the background...")
+        event_log.log(eventlog.WIFI_DOWN)
+
+wifi = wifimgr.WiFiManager(board.wlan('sta'), WIFI_SSID, WIFI_PASSWORD,
+                           board.wlan('ap'), AP_ESSID, AP_PASSWORD, wifi_changed)
+
+# ==== DASHBOARD ASSETS ====
+# Served once from /app.css and /app.js with ETag + Cache-Control; the
+# page then updates itself in place from /data instead of reloading.
+DASHBOARD_CSS = """body {
+    font-family: Arial, sans-serif;
+    margin: 0;
+    padding: 15px;
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    min-height: 100vh;
+}
+.container {
+    max-width: 800px;
+    margin: 0 auto;
+}
+.header {
+    background: white;
+    padding: 20px;
+    border-radius: 15px;
+    margin-bottom: 15px;
+    box-shadow: 0 5px 15px rgba(0,0,0,0.1);
+    text-align: center;
+}
+.sensor-grid {
+    display: grid;
+    grid-template-columns: repeat(3, 1fr);
+    gap: 12px;
+    margin-bottom: 15px;
+}
+.sensor-card {
+    background: white;
+    padding: 15px;
+    border-radius: 10px;
+    text-align: center;
+    box-shadow: 0 3px 10px rgba(0,0,0,0.1);
+}
+.value {
+    font-size: 24px;
+    font-weight: bold;
+    margin: 5px 0;
+}
+.label {
+    font-size: 12px;
+    color: #6b7280;
+    font-weight: bold;
+}
+.prediction-card {
+    background: white;
+    padding: 20px;
+    border-radius: 15px;
+    margin-bottom: 15px;
+    box-shadow: 0 5px 15px rgba(0,0,0,0.1);
+    text-align: center;
+    border: 3px solid #10b981;
+}
+.controls {
+    background: white;
+    padding: 20px;
+    border-radius: 15px;
+    margin-bottom: 15px;
+    box-shadow: 0 5px 15px rgba(0,0,0,0.1);
+}
+.btn-row {
+    display: flex;
+    flex-wrap: wrap;
+    gap: 10px;
+    margin: 10px 0;
+}
+.btn {
+    flex: 1;
+    background: #10b981;
+    color: white;
+    border: none;
+    padding: 12px;
+    border-radius: 8px;
+    cursor: pointer;
+    font-weight: bold;
+    min-width: 120px;
+}
+.btn:disabled {
+    opacity: 0.5;
+    cursor: not-allowed;
+}
+.btn-danger { background: #ef4444; }
+.btn-warn { background: #f59e0b; }
+.btn-blue { background: #3b82f6; }
+.btn-purple { background: #8b5cf6; }
+.logs {
+    background: white;
+    padding: 20px;
+    border-radius: 15px;
+    box-shadow: 0 5px 15px rgba(0,0,0,0.1);
+}
+.log-entry {
+    padding: 8px;
+    border-bottom: 1px solid #e5e7eb;
+    font-size: 12px;
+    font-family: monospace;
+}
+.status {
+    padding: 6px 15px;
+    border-radius: 20px;
+    font-size: 14px;
+    font-weight: bold;
+    display: inline-block;
+}
+.crop-comparison {
+    background: white;
+    padding: 20px;
+    border-radius: 15px;
+    margin-bottom: 15px;
+    box-shadow: 0 5px 15px rgba(0,0,0,0.1);
+}
+.crop-row {
+    display: flex;
+    align-items: center;
+    gap: 15px;
+    padding: 10px 0;
+    border-bottom: 1px solid #f3f4f6;
+}
+.advice-box {
+    padding: 15px;
+    border-radius: 10px;
+    margin: 15px 0;
+    border-left: 5px solid #10b981;
+}
+.alert {
+    background: #fef3c7;
+    border-left: 5px solid #f59e0b;
+    padding: 10px;
+    border-radius: 5px;
+    margin: 10px 0;
+    font-size: 12px;
+}
+select {
+    padding: 8px 15px;
+    border-radius: 8px;
+    border: 2px solid #e5e7eb;
+    background: white;
+    font-weight: bold;
+    margin: 5px;
+}
+.loading {
+    display: none;
+    position: fixed;
+    top: 50%;
+    left: 50%;
+    transform: translate(-50%, -50%);
+    background: rgba(0,0,0,0.8);
+    color: white;
+    padding: 20px 40px;
+    border-radius: 10px;
+    z-index: 1000;
+    font-size: 18px;
+}
+@media (max-width: 600px) {
+    .sensor-grid { grid-template-columns: repeat(2, 1fr); }
+    .btn { min-width: 100px; }
+}
+"""
+
+DASHBOARD_JS = """let isProcessing = false;
+let pollTimer = null;
+let events = null;
+let seq = 0;
+const POLL_MS = 5000;
+const STATUS_COLORS = {good: '#10b981', warn: '#f59e0b', crit: '#ef4444'};
+
+function byId(id) {
+    return document.getElementById(id);
+}
+
+function setText(id, text) {
+    const el = byId(id);
+    if (el) el.textContent = text;
+}
+
+function barColor(score) {
+    return score >= 70 ? '#10b981' : score >= 50 ? '#3b82f6' : score >= 30 ? '#f59e0b' : '#ef4444';
+}
+
+function showLoading() {
+    byId('loading').style.display = 'block';
+    document.querySelectorAll('.btn').forEach(btn => btn.disabled = true);
+}
+
+function hideLoading() {
+    byId('loading').style.display = 'none';
+    document.querySelectorAll('.btn').forEach(btn => btn.disabled = false);
+}
+
+function applyData(d) {
+    if ('temp' in d) setText('v-temp', d.temp + '\\u00b0C');
+    if ('humidity' in d) setText('v-humidity', d.humidity + '%');
+    if ('soil' in d) setText('v-soil', d.soil + '%');
+    if ('tank' in d) {
+        setText('v-tank', d.tank + '%');
+        byId('tank-alert').style.display = d.tank < 20 ? 'block' : 'none';
     }
+    if ('rain' in d) byId('v-rain').style.color = d.rain == 0 ? '#3b82f6' : '#f59e0b';
+    if ('rain_text' in d) setText('v-rain', d.rain_text);
+    if ('rain_value' in d) setText('v-rain-adc', 'ADC: ' + d.rain_value);
+    if ('pump' in d) {
+        const on = d.pump == 0;
+        byId('v-pump').style.color = on ? '#ef4444' : '#10b981';
+        byId('btn-pump').className = 'btn ' + (on ? 'btn-danger' : 'btn-blue');
+        byId('btn-stop').className = 'btn ' + (on ? 'btn-danger' : '');
+        setText('pump-action', on ? 'STOP' : 'START');
+    }
+    if ('pump_text' in d) setText('v-pump', d.pump_text);
+    if ('mode' in d) {
+        const mode = d.mode.toUpperCase();
+        setText('v-mode', mode);
+        setText('mode-name', mode);
+        byId('btn-mode').className = 'btn ' + (d.mode == 'auto' ? 'btn-warn' : 'btn-purple');
+        byId('manual-alert').style.display = d.mode == 'manual' ? 'block' : 'none';
+    }
+    if ('status' in d) {
+        const color = STATUS_COLORS[d.status];
+        byId('advice-box').style.background = color + '20';
+        byId('advice-box').style.borderLeftColor = color;
+        byId('v-status').style.background = color;
+    }
+    if ('status_text' in d) setText('v-status', d.status_text);
+    if ('advice' in d) setText('v-advice', d.advice);
+    if ('crop_emoji' in d) setText('v-crop-emoji', d.crop_emoji);
+    if ('crop_name' in d) setText('v-crop-name', d.crop_name);
+    if ('crop_desc' in d) setText('v-crop-desc', d.crop_desc);
+    if ('rating' in d) setText('v-rating', d.rating);
+    if ('crop_score' in d) {
+        setText('v-score', d.crop_score);
+        setText('v-score-footer', d.crop_score);
+    }
+    if ('rating_color' in d) {
+        byId('prediction-card').style.borderColor = d.rating_color;
+        byId('v-rating-line').style.color = d.rating_color;
+    }
+    if ('crops' in d) {
+        byId('crop-table').innerHTML = d.crops.map(c => {
+            const color = barColor(c[2]);
+            return '<div class="crop-row">' +
+                '<div style="flex: 1; font-weight: bold;">' + c[0] + ' ' + c[1] + '</div>' +
+                '<div style="width: 60px; text-align: right; font-weight: bold; color:' + color + ';">' + c[2] + '%</div>' +
+                '<div style="width: 100px;"><div style="height: 8px; background: #e5e7eb; border-radius: 4px; overflow: hidden;">' +
+                '<div style="width: ' + Math.min(100, c[2]) + '%; height: 100%; background: ' + color + ';"></div></div></div></div>';
+        }).join('');
+    }
+    if ('logs' in d) {
+        const box = byId('logs');
+        box.textContent = '';
+        d.logs.forEach(line => {
+            const div = document.createElement('div');
+            div.className = 'log-entry';
+            div.textContent = line;
+            box.appendChild(div);
+        });
+    }
+}
+
+function live() {
+    return events && events.readyState == EventSource.OPEN;
+}
+
+function poll() {
+    if (pollTimer) clearTimeout(pollTimer);
+    pollTimer = null;
+    return fetch('/data?since=' + seq)
+        .then(response => response.json())
+        .then(d => {
+            applyData(d);
+            seq = d.seq;
+        })
+        .catch(err => console.error('Poll error:', err))
+        .then(() => {
+            if (!live()) pollTimer = setTimeout(poll, POLL_MS);
+        });
+}
+
+// Pushed deltas from /events; polling only if the device refuses the stream
+function listen() {
+    if (!window.EventSource) return false;
+    events = new EventSource('/events?since=' + seq);
+    events.onmessage = e => {
+        applyData(JSON.parse(e.data));
+        seq = Number(e.lastEventId);
+    };
+    events.onopen = () => {
+        if (pollTimer) clearTimeout(pollTimer);
+        pollTimer = null;
+    };
+    events.onerror = () => {
+        if (events.readyState == EventSource.CLOSED) {
+            events = null;
+            if (!pollTimer) pollTimer = setTimeout(poll, POLL_MS);
+        }
+    };
+    return true;
+}
+
+function changeLanguage(lang) {
+    if (isProcessing) return;
+    isProcessing = true;
+    showLoading();
+
+    fetch('/lang?l=' + lang)
+        .then(response => response.text())
+        .then(() => {
+            window.location.href = '/';
+        })
+        .catch(err => {
+            console.error('Error:', err);
+            hideLoading();
+            isProcessing = false;
+            alert('Error changing language');
+        });
+}
+
+function refreshData() {
+    if (isProcessing) return;
+    poll();
+}
+
+function handleAction(action) {
+    if (isProcessing) return;
+    isProcessing = true;
+    showLoading();
+
+    fetch('/control?a=' + action)
+        .then(response => response.text())
+        .then(data => {
+            console.log('Action completed:', data);
+            return live() ? null : poll();
+        })
+        .catch(err => {
+            console.error('Error:', err);
+            alert('Error: ' + err);
+        })
+        .then(() => {
+            hideLoading();
+            isProcessing = false;
+        });
+}
+
+window.addEventListener('load', function() {
+    if (!listen()) pollTimer = setTimeout(poll, POLL_MS);
+});
+"""
+
+def asset_etag(body):
+    """Strong ETag from the asset's CRC32"""
+    return '"%08x"' % (binascii.crc32(body.encode()) & 0xffffffff)
+
+STATIC_ASSETS = {
+    '/app.css': ('text/css', DASHBOARD_CSS, asset_etag(DASHBOARD_CSS)),
+    '/app.js': ('application/javascript', DASHBOARD_JS, asset_etag(DASHBOARD_JS)),
+}
+ASSET_MAX_AGE = 86400  # seconds browsers may reuse /app.css and /app.js
+
+STATUS_COLORS = {
+    "good": "#10b981",
+    "warn": "#f59e0b",
+    "crit": "#ef4444"
+}
+
+def get_display_values(data, analysis):
+    """Localised strings and scores shown on the dashboard for one snapshot"""
+    T = i18n.table(current_language)
+    best_crop_id, score_percent, rating, rating_color, all_scores = predict_best_crop(data)
     
-    rain_text = "🌧️ " + ("RAINING" if current_language == "en" else "बारिश" if current_language == "hi" else "వర్షం") if data['rain'] == 0 else "☀️ " + ("NO RAIN" if current_language == "en" else "बारिश नहीं" if current_language == "hi" else "వర్షం లేదు")
-    rain_color = "#3b82f6" if data['rain'] == 0 else "#f59e0b"
-    
-    pump_text = "💧 " + ("ON" if current_language == "en" else "चालू" if current_language == "hi" else "ఆన్") if data['relay'] == 0 else "❌ " + ("OFF" if current_language == "en" else "बंद" if current_language == "hi" else "ఆఫ్")
-    pump_color = "#ef4444" if data['relay'] == 0 else "#10b981"
-    
-    status_text = get_translation(f"status_{analysis['status']}")
-    
-    season_trans = get_translation(f"seasons.{season}")
+    crop_key = "crops." + best_crop_id
+    crop_name = T.get(crop_key + ".name", best_crop_id)
+    crop_emoji = T.get(crop_key + ".emoji", "🌱")
+    crop_desc = T.get(crop_key + ".desc", "")
     
-    logs_html = ""
-    for log in operation_logs[:8]:
-        logs_html += f'<div class="log-entry">{log}</div>'
+    rain_text = T["rain_on"] if data['rain'] == 0 else T["rain_off"]
+    pump_text = T["pump_on"] if data['relay'] == 0 else T["pump_off"]
     
-    crop_table = ""
+    crop_rows = []
     for crop_id, crop_name_disp, score in all_scores[:4]:
-        crop_emoji_local = get_translation(f"crops.{crop_id}.emoji") if isinstance(get_translation(f"crops.{crop_id}"), dict) else "🌱"
-        crop_display = get_translation(f"crops.{crop_id}.name") if isinstance(get_translation(f"crops.{crop_id}"), dict) else crop_name_disp
-        bar_width = min(100, int(score))
-        bar_color = "#10b981" if score >= 70 else "#3b82f6" if score >= 50 else "#f59e0b" if score >= 30 else "#ef4444"
-        
-        crop_table += f"""
-        <div class="crop-row">
-            <div style="flex: 1; font-weight: bold;">{crop_emoji_local} {crop_display}</div>
-            <div style="width: 60px; text-align: right; font-weight: bold; color:{bar_color};">{int(score)}%</div>
-            <div style="width: 100px;">
-                <div style="height: 8px; background: #e5e7eb; border-radius: 4px; overflow: hidden;">
-                    <div style="width: {bar_width}%; height: 100%; background: {bar_color};"></div>
-                </div>
-            </div>
-        </div>"""
+        crop_key = "crops." + crop_id
+        crop_rows.append([T.get(crop_key + ".emoji", "🌱"), T.get(crop_key + ".name", crop_name_disp), int(score)])
     
-    manual_alert = f'<div class="alert">⚠️ {get_translation("manual_water")}: {get_translation("auto_mode") if system_mode == "manual" else ""}</div>' if system_mode == "manual" else ''
-    tank_alert = '<div class="alert">⚠️ ' + ("Low water level!" if current_language == "en" else "कम पानी!" if current_language == "hi" else "నీటి స్థాయి తక్కువ!") + '</div>' if data['tank_percent'] < 20 else ''
-    
-    # Language selection
-    lang_options = ""
-    for lang_code, lang_name in [("en", "English"), ("hi", "हिन्दी"), ("te", "తెలుగు")]:
-        selected = "selected" if current_language == lang_code else ""
-        lang_options += f'<option value="{lang_code}" {selected}>{lang_name}</option>'
-    
-    html = f"""<!DOCTYPE html>
+    return {
+        'predicted_crop': best_crop_id,
+        'crop_score': score_percent,
+        'rating': rating,
+        'rating_color': rating_color,
+        'crop_name': crop_name,
+        'crop_emoji': crop_emoji,
+        'crop_desc': crop_desc,
+        'crops': crop_rows,
+        'rain_text': rain_text,
+        'pump_text': pump_text,
+        'advice': analysis['advice'],
+        'status': analysis['status'],
+        'status_text': T["status_" + analysis['status']],
+    }
+
+# ==== PAGE TEMPLATE ====
+# {t:key} is filled from the language's strings when the template is
+# compiled; {name} is a per-render value passed to render_page().
+PAGE_TEMPLATE = """<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{get_translation("title")}</title>
-    <style>
-        body {{ 
-            font-family: Arial, sans-serif; 
-            margin: 0; 
-            padding: 15px; 
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-        }}
-        .container {{ 
-            max-width: 800px; 
-            margin: 0 auto; 
-        }}
-        .header {{ 
-            background: white; 
-            padding: 20px; 
-            border-radius: 15px; 
-            margin-bottom: 15px;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-            text-align: center;
-        }}
-        .sensor-grid {{ 
-            display: grid; 
-            grid-template-columns: repeat(3, 1fr); 
-            gap: 12px; 
-            margin-bottom: 15px;
-        }}
-        .sensor-card {{ 
-            background: white; 
-            padding: 15px; 
-            border-radius: 10px; 
-            text-align: center;
-            box-shadow: 0 3px 10px rgba(0,0,0,0.1);
-        }}
-        .value {{ 
-            font-size: 24px; 
-            font-weight: bold; 
-            margin: 5px 0;
-        }}
-        .label {{ 
-            font-size: 12px; 
-            color: #6b7280;
-            font-weight: bold;
-        }}
-        .prediction-card {{ 
-            background: white; 
-            padding: 20px; 
-            border-radius: 15px; 
-            margin-bottom: 15px;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-            text-align: center;
-            border: 3px solid {rating_color};
-        }}
-        .controls {{ 
-            background: white; 
-            padding: 20px; 
-            border-radius: 15px; 
-            margin-bottom: 15px;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        }}
-        .btn-row {{ 
-            display: flex; 
-            flex-wrap: wrap; 
-            gap: 10px; 
-            margin: 10px 0;
-        }}
-        .btn {{ 
-            flex: 1; 
-            background: #10b981; 
-            color: white; 
-            border: none; 
-            padding: 12px; 
-            border-radius: 8px; 
-            cursor: pointer;
-            font-weight: bold;
-            min-width: 120px;
-        }}
-        .btn:disabled {{
-            opacity: 0.5;
-            cursor: not-allowed;
-        }}
-        .btn-danger {{ background: #ef4444; }}
-        .btn-warn {{ background: #f59e0b; }}
-        .btn-blue {{ background: #3b82f6; }}
-        .btn-purple {{ background: #8b5cf6; }}
-        .logs {{ 
-            background: white; 
-            padding: 20px; 
-            border-radius: 15px;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        }}
-        .log-entry {{ 
-            padding: 8px; 
-            border-bottom: 1px solid #e5e7eb; 
-            font-size: 12px;
-            font-family: monospace;
-        }}
-        .status {{ 
-            padding: 6px 15px; 
-            border-radius: 20px; 
-            font-size: 14px; 
-            font-weight: bold;
-            display: inline-block;
-        }}
-        .crop-comparison {{ 
-            background: white; 
-            padding: 20px; 
-            border-radius: 15px; 
-            margin-bottom: 15px;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        }}
-        .crop-row {{ 
-            display: flex; 
-            align-items: center; 
-            gap: 15px; 
-            padding: 10px 0;
-            border-bottom: 1px solid #f3f4f6;
-        }}
-        .advice-box {{ 
-            background: {status_colors[analysis['status']]}20; 
-            padding: 15px; 
-            border-radius: 10px; 
-            margin: 15px 0;
-            border-left: 5px solid {status_colors[analysis['status']]};
-        }}
-        .alert {{ 
-            background: #fef3c7; 
-            border-left: 5px solid #f59e0b; 
-            padding: 10px; 
-            border-radius: 5px; 
-            margin: 10px 0;
-            font-size: 12px;
-        }}
-        select {{
-            padding: 8px 15px;
-            border-radius: 8px;
-            border: 2px solid #e5e7eb;
-            background: white;
-            font-weight: bold;
-            margin: 5px;
-        }}
-        .loading {{
-            display: none;
-            position: fixed;
-            top: 50%;
-            left: 50%;
-            transform: translate(-50%, -50%);
-            background: rgba(0,0,0,0.8);
-            color: white;
-            padding: 20px 40px;
-            border-radius: 10px;
-            z-index: 1000;
-            font-size: 18px;
-        }}
-        @media (max-width: 600px) {{
-            .sensor-grid {{ grid-template-columns: repeat(2, 1fr); }}
-            .btn {{ min-width: 100px; }}
-        }}
-    </style>
+    <title>{t:title}</title>
+    <link rel="stylesheet" href="/app.css">
 </head>
 <body>
     <div class="loading" id="loading">⏳ Processing...</div>
     <div class="container">
         <div class="header">
-            <h1 style="margin:0;color:#2e7d32;">{get_translation("title")}</h1>
-            <div style="color:#6b7280;margin:5px 0;">{season_type.upper()} {get_translation("current_season")} • {get_translation("auto_mode")}</div>
+            <h1 style="margin:0;color:#2e7d32;">{t:title}</h1>
+            <div style="color:#6b7280;margin:5px 0;">{season_type} {t:current_season} • {t:auto_mode}</div>
             <div style="margin-top:10px;">
                 <select id="languageSelect" onchange="changeLanguage(this.value)">
-                    {lang_options}
+                    {t:lang_options}
                 </select>
                 <div class="status" style="background:#8b5cf6;color:white;display:inline-block;margin-left:10px;">
-                    {get_translation("current_season")} {season_trans}
+                    {t:current_season} {season_trans}
                 </div>
             </div>
         </div>
         
-        <div class="prediction-card">
-            <div class="label" style="color:#6b7280;font-size:14px;">{get_translation("predicted_crop")}</div>
-            <div style="font-size:48px;margin:10px 0;">{crop_emoji}</div>
-            <div style="font-size:28px;font-weight:bold;color:#1f2937;margin:5px 0;">{crop_name}</div>
-            <div style="color:#6b7280;margin:10px 0;font-size:14px;">{crop_desc}</div>
-            <div style="font-size:20px;font-weight:bold;color:{rating_color};margin:10px 0;">{rating} ({score_percent}%)</div>
-            <div style="font-size:12px;color:#9ca3af;">{get_translation("auto_mode")}</div>
+        <div class="prediction-card" id="prediction-card" style="border-color:{rating_color};">
+            <div class="label" style="color:#6b7280;font-size:14px;">{t:predicted_crop}</div>
+            <div id="v-crop-emoji" style="font-size:48px;margin:10px 0;">{crop_emoji}</div>
+            <div id="v-crop-name" style="font-size:28px;font-weight:bold;color:#1f2937;margin:5px 0;">{crop_name}</div>
+            <div id="v-crop-desc" style="color:#6b7280;margin:10px 0;font-size:14px;">{crop_desc}</div>
+            <div id="v-rating-line" style="font-size:20px;font-weight:bold;color:{rating_color};margin:10px 0;"><span id="v-rating">{rating}</span> (<span id="v-score">{crop_score}</span>%)</div>
+            <div style="font-size:12px;color:#9ca3af;">{t:auto_mode}</div>
         </div>
         
         <div class="sensor-grid">
             <div class="sensor-card">
-                <div class="label">{get_translation("temperature")}</div>
-                <div class="value" style="color:#ef4444;">{data['temp']}°C</div>
+                <div class="label">{t:temperature}</div>
+                <div class="value" id="v-temp" style="color:#ef4444;">{temp}°C</div>
             </div>
             <div class="sensor-card">
-                <div class="label">{get_translation("humidity")}</div>
-                <div class="value" style="color:#3b82f6;">{data['humidity']}%</div>
+                <div class="label">{t:humidity}</div>
+                <div class="value" id="v-humidity" style="color:#3b82f6;">{humidity}%</div>
             </div>
             <div class="sensor-card">
-                <div class="label">{get_translation("soil_moisture")}</div>
-                <div class="value" style="color:#10b981;">{data['soil_percent']}%</div>
+                <div class="label">{t:soil_moisture}</div>
+                <div class="value" id="v-soil" style="color:#10b981;">{soil}%</div>
             </div>
             <div class="sensor-card">
-                <div class="label">{get_translation("tank_level")}</div>
-                <div class="value" style="color:#8b5cf6;">{data['tank_percent']}%</div>
-                {tank_alert}
+                <div class="label">{t:tank_level}</div>
+                <div class="value" id="v-tank" style="color:#8b5cf6;">{tank}%</div>
+                <div class="alert" id="tank-alert" style="display:{tank_display};">⚠️ {t:low_water}</div>
             </div>
             <div class="sensor-card">
-                <div class="label">{get_translation("rain_status")}</div>
-                <div class="value" style="color:{rain_color};">{rain_text}</div>
-                <div style="font-size:11px;color:#9ca3af;">ADC: {data['rain_value']}</div>
+                <div class="label">{t:rain_status}</div>
+                <div class="value" id="v-rain" style="color:{rain_color};">{rain_text}</div>
+                <div id="v-rain-adc" style="font-size:11px;color:#9ca3af;">ADC: {rain_value}</div>
             </div>
             <div class="sensor-card">
-                <div class="label">{get_translation("irrigation")}</div>
-                <div class="value" style="color:{pump_color};">{pump_text}</div>
-                <div style="font-size:11px;color:#9ca3af;">{system_mode.upper()} {get_translation("change_mode")}</div>
+                <div class="label">{t:irrigation}</div>
+                <div class="value" id="v-pump" style="color:{pump_color};">{pump_text}</div>
+                <div style="font-size:11px;color:#9ca3af;"><span id="v-mode">{mode}</span> {t:change_mode}</div>
             </div>
         </div>
         
-        <div class="advice-box">
+        <div class="advice-box" id="advice-box" style="background:{status_color}20;border-left-color:{status_color};">
             <div style="display: flex; justify-content: space-between; align-items: center;">
                 <div style="font-weight: bold; color:#1f2937;">
-                    {get_translation("suggestion")} {analysis['advice']}
-                </div>
-                <div class="status" style="background:{status_colors[analysis['status']]};color:white;">
-                    {status_text}
+                    {t:suggestion} <span id="v-advice">{advice}</span>
                 </div>
+                <div class="status" id="v-status" style="background:{status_color};color:white;">{status_text}</div>
             </div>
-            {manual_alert}
+            <div class="alert" id="manual-alert" style="display:{manual_display};">⚠️ {t:manual_water}: {t:auto_mode}</div>
         </div>
         
         <div class="crop-comparison">
-            <h3 style="margin:0 0 15px 0;color:#1f2937;">🌱 {get_translation("best_crop")}</h3>
-            {crop_table}
+            <h3 style="margin:0 0 15px 0;color:#1f2937;">🌱 {t:best_crop}</h3>
+            <div id="crop-table">{crop_table}</div>
             <div style="text-align:center;margin-top:10px;font-size:12px;color:#6b7280;">
-                {get_translation("crop_score")} {score_percent}%
+                {t:crop_score} <span id="v-score-footer">{crop_score}</span>%
             </div>
         </div>
         
         <div class="controls">
             <div class="btn-row">
-                <button class="btn" onclick="refreshData()">{get_translation("refresh")} 🔄</button>
-                <button class="btn {'btn-danger' if data['relay']==0 else 'btn-blue'}" onclick="handleAction('pump')">
-                    {get_translation("toggle_pump")} ({'STOP' if data['relay']==0 else 'START'})
+                <button class="btn" onclick="refreshData()">{t:refresh} 🔄</button>
+                <button class="btn {pump_btn}" id="btn-pump" onclick="handleAction('pump')">
+                    {t:toggle_pump} (<span id="pump-action">{pump_action}</span>)
                 </button>
-                <button class="btn {'btn-warn' if system_mode=='auto' else 'btn-purple'}" onclick="handleAction('mode')">
-                    {get_translation("change_mode")} ({system_mode.upper()})
+                <button class="btn {mode_btn}" id="btn-mode" onclick="handleAction('mode')">
+                    {t:change_mode} (<span id="mode-name">{mode}</span>)
                 </button>
             </div>
             <div class="btn-row">
-                <button class="btn btn-blue" onclick="handleAction('force')">{get_translation("force_water")} (5s)</button>
-                <button class="btn {'btn-danger' if data['relay']==0 else ''}" onclick="handleAction('stop')">{get_translation("stop_water")}</button>
+                <button class="btn btn-blue" onclick="handleAction('force')">{t:force_water} (5s)</button>
+                <button class="btn {stop_btn}" id="btn-stop" onclick="handleAction('stop')">{t:stop_water}</button>
             </div>
         </div>
         
         <div class="logs">
-            <h3 style="margin:0 0 15px 0;color:#1f2937;">📝 {get_translation("logs")}</h3>
-            <div style="max-height:200px;overflow-y:auto;">
+            <h3 style="margin:0 0 15px 0;color:#1f2937;">📝 {t:logs}</h3>
+            <div id="logs" style="max-height:200px;overflow-y:auto;">
                 {logs_html}
             </div>
-            <button class="btn btn-danger" onclick="handleAction('clear')" style="margin-top:15px;width:100%;">{get_translation("clear_logs")}</button>
+            <button class="btn btn-danger" onclick="handleAction('clear')" style="margin-top:15px;width:100%;">{t:clear_logs}</button>
         </div>
         
         <div style="text-align:center;margin-top:20px;font-size:12px;color:white;">
-            <div>{get_translation("title")} • {season_type.upper()} {get_translation("current_season")} • {get_translation("auto_mode")}</div>
-            <div>{get_translation("language")}: {current_language.upper()} • Auto-refresh: 5s</div>
+            <div>{t:title} • {season_type} {t:current_season} • {t:auto_mode}</div>
+            <div>{t:language}: {t:lang_code} • Auto-refresh: 5s</div>
         </div>
     </div>
-    
-    <script>
-        let isProcessing = false;
-        let autoRefreshTimer = null;
-        
-        function showLoading() {{
-            document.getElementById('loading').style.display = 'block';
-            document.querySelectorAll('.btn').forEach(btn => btn.disabled = true);
-        }}
-        
-        function hideLoading() {{
-            document.getElementById('loading').style.display = 'none';
-            document.querySelectorAll('.btn').forEach(btn => btn.disabled = false);
-        }}
-        
-        function changeLanguage(lang) {{
-            if (isProcessing) return;
-            isProcessing = true;
-            showLoading();
-            
-            fetch('/lang?l=' + lang)
-                .then(response => response.text())
-                .then(() => {{
-                    setTimeout(() => {{
-                        window.location.href = '/';
-                    }}, 400);
-                }})
-                .catch(err => {{
-                    console.error('Error:', err);
-                    hideLoading();
-                    isProcessing = false;
-                    alert('Error changing language');
-                }});
-        }}
-        
-        function refreshData() {{
-            if (isProcessing) return;
-            showLoading();
-            window.location.href = '/';
-        }}
-        
-        function handleAction(action) {{
-            if (isProcessing) return;
-            isProcessing = true;
-            showLoading();
-            
-            // Stop auto-refresh during action
-            if (autoRefreshTimer) {{
-                clearTimeout(autoRefreshTimer);
-            }}
-            
-            fetch('/control?a=' + action)
-                .then(response => response.text())
-                .then(data => {{
-                    console.log('Action completed:', data);
-                    setTimeout(() => {{
-                        window.location.href = '/';
-                    }}, 500);
-                }})
-                .catch(err => {{
-                    console.error('Error:', err);
-                    hideLoading();
-                    isProcessing = false;
-                    startAutoRefresh();
-                    alert('Error: ' + err);
-                }});
-        }}
-        
-        function startAutoRefresh() {{
-            // Auto-refresh every 5 seconds
-            if (autoRefreshTimer) {{
-                clearTimeout(autoRefreshTimer);
-            }}
-            autoRefreshTimer = setTimeout(() => {{
-                if (!isProcessing) {{
-                    window.location.href = '/';
-                }}
-            }}, 5000);
-        }}
-        
-        // Start auto-refresh on page load
-        window.addEventListener('load', function() {{
-            startAutoRefresh();
-        }});
-    </script>
+    <script src="/app.js"></script>
 </body>
 </html>"""
+
+page_templates = {}  # language -> compiled template (current language only)
+
+def page_strings(lang):
+    """Static strings a compiled page needs for one language"""
+    lang_options = ""
+    for lang_code, lang_name in i18n.LANGUAGES:
+        selected = "selected" if lang == lang_code else ""
+        lang_options += f'<option value="{lang_code}" {selected}>{lang_name}</option>'
     
-    return html
+    extras = {
+        "lang_options": lang_options,
+        "lang_code": lang.upper(),
+    }
+    return i18n.table(lang), extras
 
-def start_server():
-    """Start web server"""
-    print("\n" + "="*50)
-    print("Starting Smart Crop Prediction System...")
-    print("="*50)
+def compile_page(lang):
+    """Resolve {t:...} once; return [static_bytes, slot, static_bytes, slot, ...]"""
+    T, extras = page_strings(lang)
+    parts = []
+    static = ""
+    pos = 0
+    while True:
+        start = PAGE_TEMPLATE.find('{', pos)
+        if start < 0:
+            static += PAGE_TEMPLATE[pos:]
+            break
+        end = PAGE_TEMPLATE.find('}', start)
+        static += PAGE_TEMPLATE[pos:start]
+        name = PAGE_TEMPLATE[start + 1:end]
+        if name.startswith('t:'):
+            key = name[2:]
+            static += extras[key] if key in extras else str(T.get(key, key))
+        else:
+            parts.append(static.encode())
+            parts.append(name)
+            static = ""
+        pos = end + 1
+    parts.append(static.encode())
+    return parts
+
+def get_page_template(lang):
+    """Compiled template for `lang`, built on first use"""
+    template = page_templates.get(lang)
+    if template is None:
+        template = compile_page(lang)
+        page_templates[lang] = template
+    return template
+
+def invalidate_page_templates():
+    """Drop compiled templates (called on /lang to free heap)"""
+    page_templates.clear()
+
+def page_values(data, analysis, view):
+    """Per-render values for the page template slots"""
+    season, season_type = get_season()
+    status_color = STATUS_COLORS[analysis['status']]
+    pump_on = data['relay'] == 0
+    
+    logs_html = ""
+    for log in event_log.render(LOGS_SHOWN, current_language):
+        logs_html += f'<div class="log-entry">{log}</div>'
+    
+    crop_table = ""
+    for crop_emoji_local, crop_display, score in view['crops']:
+        bar_width = min(100, score)
+        bar_color = "#10b981" if score >= 70 else "#3b82f6" if score >= 50 else "#f59e0b" if score >= 30 else "#ef4444"
+        
+        crop_table += f"""
+        <div class="crop-row">
+            <div style="flex: 1; font-weight: bold;">{crop_emoji_local} {crop_display}</div>
+            <div style="width: 60px; text-align: right; font-weight: bold; color:{bar_color};">{score}%</div>
+            <div style="width: 100px;">
+                <div style="height: 8px; background: #e5e7eb; border-radius: 4px; overflow: hidden;">
+                    <div style="width: {bar_width}%; height: 100%; background: {bar_color};"></div>
+                </div>
+            </div>
+        </div>"""
+    
+    view.update({
+        'season_type': season_type.upper(),
+        'season_trans': i18n.translate("seasons." + season, current_language),
+        'temp': data['temp'],
+        'humidity': data['humidity'],
+        'soil': data['soil_percent'],
+        'tank': data['tank_percent'],
+        'tank_display': "block" if data['tank_percent'] < 20 else "none",
+        'rain_color': "#3b82f6" if data['rain'] == 0 else "#f59e0b",
+        'rain_value': data['rain_value'],
+        'pump_color': "#ef4444" if pump_on else "#10b981",
+        'pump_btn': 'btn-danger' if pump_on else 'btn-blue',
+        'pump_action': 'STOP' if pump_on else 'START',
+        'stop_btn': 'btn-danger' if pump_on else '',
+        'mode': system_mode.upper(),
+        'mode_btn': 'btn-warn' if system_mode == 'auto' else 'btn-purple',
+        'manual_display': "block" if system_mode == "manual" else "none",
+        'status_color': status_color,
+        'crop_table': crop_table,
+        'logs_html': logs_html,
+    })
+    return view
+
+def render_page():
+    """Yield the dashboard as byte chunks (first paint only, /data keeps it current)"""
+    data = get_snapshot()
+    analysis = analyze_conditions(data)
+    values = page_values(data, analysis, get_display_values(data, analysis))
+    template = get_page_template(current_language)
+    
+    for i in range(0, len(template) - 1, 2):
+        yield template[i]
+        yield str(values[template[i + 1]]).encode()
+    yield template[-1]
+
+def generate_html():
+    """Generate HTML page as one string"""
+    return b''.join(render_page()).decode()
+
+# ==== INCREMENTAL /data ====
+data_seq = 0  # bumped whenever any /data field changes
+data_fields = {}  # last value of every /data field
+data_changed_at = {}  # field -> data_seq of its last change
+
+def build_data_fields():
+    """Every value the dashboard shows, keyed as in /data"""
+    data = get_snapshot()
+    analysis = analyze_conditions(data)
+    fields = get_display_values(data, analysis)
+    fields.update({
+        'temp': data['temp'],
+        'humidity': data['humidity'],
+        'soil': data['soil_percent'],
+        'tank': data['tank_percent'],
+        'rain': data['rain'],
+        'rain_value': data['rain_value'],
+        'pump': data['relay'],
+        'mode': system_mode,
+        'season': get_season()[0],
+        'logs': event_log.render(LOGS_SHOWN, current_language),
+    })
+    return fields
+
+def refresh_data_fields():
+    """Rebuild the /data fields; data_seq moves on if any of them changed"""
+    global data_seq
+    bumped = False
+    for key, value in build_data_fields().items():
+        if key not in data_fields or data_fields[key] != value:
+            if not bumped:
+                data_seq += 1
+                bumped = True
+            data_fields[key] = value
+            data_changed_at[key] = data_seq
+
+def data_delta(since=0):
+    """JSON of the fields changed after sequence `since` (all of them if unknown)"""
+    if since <= 0 or since > data_seq:  # first poll, or device rebooted
+        out = dict(data_fields)
+    else:
+        out = {}
+        for key, value in data_fields.items():
+            if data_changed_at[key] > since:
+                out[key] = value
+    out['seq'] = data_seq
+    return json.dumps(out)
+
+def data_payload(since=0):
+    """JSON for /data with only the fields changed after sequence `since`"""
+    refresh_data_fields()
+    return data_delta(since)
+
+def telemetry_record():
+    """/data?fmt=bin: the whole state as one telemetry.FIELDS record, no strings built"""
+    data = get_snapshot()
+    analysis = analyze_conditions(data)
+    best_crop_id, score = predict_best_crop(data)[:2]
+    return telemetry.encode(data['sample'], data, analysis['status'], get_season()[0],
+                            best_crop_id, score, system_mode == "manual")
+
+# ==== LIVE PUSH ====
+event_cache = {}  # since -> data_delta() JSON for event_cache_seq
+event_cache_seq = 0
+
+def event_payload(since):
+    """data_delta() shared by every viewer at the same sequence"""
+    global event_cache_seq
+    if event_cache_seq != data_seq:
+        event_cache.clear()
+        event_cache_seq = data_seq
+    text = event_cache.get(since)
+    if text is None:
+        text = event_cache[since] = data_delta(since)
+    return text
+
+def publish_data():
+    """Rebuild /data once and wake the live viewers; nothing to do without any"""
+    if not push_hub.subscribers:
+        return
+    t0 = profiler.begin()
+    refresh_data_fields()
+    push_hub.publish(data_seq)
+    profiler.end('push', t0)
+
+# ==== SAMPLE SINKS ====
+# every sample is read once by `sampler` and handed to these in order
+def record_history(data):
+    if history_store:
+        history_store.record(data)
+
+def log_sample(data):
+    """One serial line per sample"""
+    line = (f"Soil:{data['soil_value']}({data['soil_percent']}%) Tank:{data['tank_value']}({data['tank_percent']}%) "
+            f"Rain:{'Yes' if data['rain'] == 0 else 'No'} Temp:{data['temp']} Hum:{data['humidity']} "
+            f"Pump:{'ON' if data['relay'] == 0 else 'OFF'} Mode:{system_mode} WiFi:{wifi.state}")
+    if blynk_sink:
+        line += (f" Up:{blynk_sink.link.sent}/{blynk_sink.link.suppressed} Queue:{len(blynk_sink.backlog)}"
+                 f" Gap:{blynk_sink.run_gap_ms.max}ms")
+    print(line)
+
+def app_mode(auto):
+    """V8 from the Blynk app"""
+    set_mode("auto" if auto else "manual")
+    publish_data()
+
+def app_pump(on):
+    """V7 from the Blynk app: a timed run in manual mode, ignored in auto or in rain"""
+    if system_mode != "manual":
+        return
+    if on and sampler.snapshot()['rain'] == 0:
+        return  # the app's button follows the relay again with the next sample
+    if on:
+        pump.run_for(MANUAL_RUN_MS)
+    else:
+        pump.cancel()
+    publish_data()
+
+sampler.add_sink('history', record_history)
+sampler.add_sink('dashboard', lambda data: publish_data())
+
+def setup_sinks():
+    """The optional sinks, per config"""
+    global blynk_sink
+    if BLYNK_ENABLED and blynk_sink is None:
+        blynk_sink = blynksink.BlynkSink(BLYNK_AUTH, BLYNK_SERVER, BLYNK_PORT, wifi, app_mode, app_pump,
+                                         BLYNK_UPLINK, ip=BLYNK_SERVER_IP or None)
+        sampler.add_sink('blynk', blynk_sink)
+        controller.rain_all_modes = True  # the Blynk program stopped the pump in rain in every mode
+    if SERIAL_LOG:
+        sampler.add_sink('log', log_sample)
+
+def history_body(t_from, t_to, step):
+    """Stream /history as JSON without holding all rows in memory"""
+    level, step = history_store.plan(t_from, step)
+    yield '{"from":%d,"to":%d,"step":%d,"fields":%s,"rows":[' % (t_from, t_to, step, json.dumps(history.FIELDS))
+    sep = ''
+    for row in history_store.query(t_from, t_to, step):
+        yield sep + json.dumps(row)
+        sep = ','
+    yield ']}'
+
+def response_head(status, content_type=None, extra='', keep_alive=0):
+    """Build the HTTP status line and headers; keep_alive is the idle timeout in seconds, 0 closes"""
+    head = 'HTTP/1.1 ' + status + '\r\n'
+    if content_type:
+        head += 'Content-Type: ' + content_type + '\r\n'
+    if keep_alive:
+        return head + extra + f'Connection: keep-alive\r\nKeep-Alive: timeout={keep_alive}\r\n\r\n'
+    return head + extra + 'Connection: close\r\n\r\n'
+
+def frame_response(status, content_type, body, extra, keep_alive=0):
+    """Encoded head plus body: bytes with Content-Length, or a chunk stream"""
+    if isinstance(body, str):
+        body = body.encode()
+    if isinstance(body, bytes):
+        if not status.startswith('304'):
+            extra += f'Content-Length: {len(body)}\r\n'
+    else:
+        extra += 'Transfer-Encoding: chunked\r\n'
+    return response_head(status, content_type, extra, keep_alive).encode(), body
+
+def serve_asset(path, headers):
+    """Static CSS/JS with ETag revalidation"""
+    content_type, body, etag = STATIC_ASSETS[path]
+    extra = f'ETag: {etag}\r\nCache-Control: max-age={ASSET_MAX_AGE}\r\n'
+    if headers.get('if-none-match') == etag:
+        return '304 Not Modified', None, '', extra
+    return '200 OK', content_type, body, extra
+
+# ==== ROUTES ====
+def route_page(query, headers):
+    return '200 OK', 'text/html', render_page(), 'Cache-Control: no-cache\r\n'
+
+def action_pump():
+    pump.value(1 if pump.value() == 0 else 0)
+    event_log.log(eventlog.PUMP_ON if pump.value() == 0 else eventlog.PUMP_OFF)
+
+def set_mode(mode):
+    global system_mode
+    if mode != system_mode:
+        system_mode = mode
+        event_log.log(eventlog.MODE, 0 if mode == "auto" else 1)
+        controller.wake()
+
+def action_mode():
+    set_mode("manual" if system_mode == "auto" else "auto")
+
+def action_force():
+    pump.run_for(FORCE_RUN_MS)  # the actuator switches it off again and logs both
+
+def action_extend():
+    pump.extend(FORCE_RUN_MS)
+
+def action_stop():
+    pump.cancel()
+    event_log.log(eventlog.STOP)
+
+def action_clear():
+    event_log.clear()
+    event_log.log(eventlog.CLEARED)
+
+CONTROL_ACTIONS = {
+    'pump': action_pump,
+    'mode': action_mode,
+    'force': action_force,
+    'extend': action_extend,
+    'stop': action_stop,
+    'clear': action_clear,
+}
+
+def route_control(query, headers):
+    action = CONTROL_ACTIONS.get(query.get('a'))
+    if action is None:
+        return '400 Bad Request', 'text/plain', 'Unknown action', ''
+    action()
+    publish_data()
+    return '200 OK', 'text/plain', 'OK', ''
+
+def route_lang(query, headers):
+    global current_language
+    lang = query.get('l')
+    codes = [code for code, _ in i18n.LANGUAGES]
+    if lang not in codes:
+        return '400 Bad Request', 'text/plain', 'Unknown language', ''
+    if lang != current_language:
+        current_language = lang
+        invalidate_page_templates()
+        event_log.log(eventlog.LANGUAGE, codes.index(lang))
+        publish_data()
+    return '200 OK', 'text/plain', 'OK', ''
+
+def route_data(query, headers):
+    if query.get('fmt') == 'bin':
+        return '200 OK', 'application/octet-stream', telemetry_record(), 'Cache-Control: no-store\r\n'
+    try:
+        since = int(query.get('since', 0))
+    except ValueError:
+        since = 0
+    return '200 OK', 'application/json', data_payload(since), 'Cache-Control: no-store\r\n'
+
+def route_events(query, headers):
+    # handle_client takes /events over before routing; the serial server can't hold a stream
+    return '503 Service Unavailable', 'text/plain', 'Live updates need the async server', ''
+
+def route_history(query, headers):
+    if not history_store:
+        return '503 Service Unavailable', 'text/plain', 'History disabled', ''
+    try:
+        t_to = int(query.get('to', hal.time()))
+        t_from = int(query.get('from', t_to - HISTORY_SPAN))
+        step = max(1, int(query.get('step', 60)))
+    except ValueError:
+        return '400 Bad Request', 'text/plain', 'from, to and step must be integers', ''
+    return '200 OK', 'application/json', history_body(t_from, t_to, step), 'Cache-Control: no-store\r\n'
+
+def route_logs(query, headers):
+    lang = query.get('lang', current_language)
+    try:
+        n = min(event_log.capacity, int(query.get('n', event_log.capacity)))
+    except ValueError:
+        n = event_log.capacity
+    return '200 OK', 'application/json', json.dumps({
+        'seq': event_log.seq,
+        'logs': event_log.render(n, lang),
+    }), 'Cache-Control: no-store\r\n'
+
+def route_stats(query, headers):
+    return '200 OK', 'application/json', json.dumps({
+        'prediction_cache': prediction_cache.stats(),
+        'control': controller.stats(),
+        'pump': pump.stats(),
+        'history': history_store.stats() if history_store else None,
+        'gc': gc_policy.stats(),
+        'push': push_hub.stats(),
+        'wifi': wifi.stats(),
+        'time': time_sync.stats() if time_sync else None,
+        'sampler': sampler.stats(),
+        'blynk': blynk_sink.stats() if blynk_sink else None,
+    }), 'Cache-Control: no-store\r\n'
+
+def route_metrics(query, headers):
+    return '200 OK', 'text/plain; version=0.0.4', profiler.metrics(metrics_extra()), 'Cache-Control: no-store\r\n'
+
+# exact path -> handler(query, headers); static assets are looked up in STATIC_ASSETS
+ROUTES = {
+    '/': route_page,
+    '/dashboard': route_page,
+    '/control': route_control,
+    '/lang': route_lang,
+    '/data': route_data,
+    '/events': route_events,
+    '/history': route_history,
+    '/logs': route_logs,
+    '/stats': route_stats,
+    '/metrics': route_metrics,
+}
+
+def handle_request(method, path, headers=None, query=None):
+    """Route one request, return (status, content_type, body, extra_headers)
+
+    `path` may still carry its query string when `query` isn't given.
+    """
+    if query is None:
+        path, query = httpparser.split_target(path)
+    if headers is None:
+        headers = {}
     
-    ip = connect_wifi()
+    if method != 'GET':
+        return '405 Method Not Allowed', None, '', 'Allow: GET\r\n'
     
+    if path in STATIC_ASSETS:
+        return serve_asset(path, headers)
+    
+    route = ROUTES.get(path)
+    if route is None:
+        return '404 Not Found', 'text/plain', '404 Not Found', ''
+    return route(query, headers)
+
+def metrics_extra():
+    """App counters for /metrics: (name, type, help, value)"""
+    return [
+        ('uptime_seconds', 'gauge', 'Seconds since boot', hal.ticks_ms() // 1000),
+        ('prediction_cache_hits_total', 'counter', 'Crop prediction cache hits', prediction_cache.hits),
+        ('prediction_cache_misses_total', 'counter', 'Crop prediction cache misses', prediction_cache.misses),
+        ('pump_switches_total', 'counter', 'Relay switches by the controller', controller.switches),
+        ('pump_relay_writes_total', 'counter', 'Relay switches from any source', pump.switches),
+        ('pump_timed_runs_total', 'counter', 'Timed pump runs (force water)', pump.runs),
+        ('pump_remaining_ms', 'gauge', 'Time left on the current timed run', pump.remaining_ms()),
+        ('encoder_pool_misses_total', 'counter', 'Responses that allocated a chunk buffer', httpwriter.pool.misses),
+        ('open_connections', 'gauge', 'Client connections open (async mode)', open_clients),
+        ('connections_refused_total', 'counter', 'Connections answered 503 at MAX_CLIENTS', refused_clients),
+        ('push_subscribers', 'gauge', 'Dashboards on /events', len(push_hub.subscribers)),
+        ('push_events_total', 'counter', 'Events sent to /events subscribers', push_hub.sent),
+        ('push_rejected_total', 'counter', 'Subscribers refused at MAX_SUBSCRIBERS', push_hub.rejected),
+        ('push_dropped_total', 'counter', 'Subscribers dropped for not keeping up', push_hub.dropped),
+        ('samples_total', 'counter', 'Sensor reads, shared by every sink', sampler.count),
+        ('wifi_up', 'gauge', 'Station link up', 1 if wifi.is_up() else 0),
+        ('wifi_reconnects_total', 'counter', 'Station links re-established', max(0, wifi.connects - 1)),
+        ('wifi_downtime_seconds_total', 'counter', 'Seconds without a station link', wifi.stats()['downtime_s']),
+        ('gc_idle_runs_total', 'counter', 'Collections in idle windows', gc_policy.runs['idle']),
+        ('gc_low_water_runs_total', 'counter', 'Collections forced by low free heap', gc_policy.runs['low_water']),
+    ]
+
+def keep_alive(request, served, clients=1):
+    """Whether the connection stays open after this response
+
+    The connection taking the last of MAX_CLIENTS slots is closed, so
+    idle keep-alives never hold every slot.
+    """
+    connection = request.headers.get('connection', '').lower()
+    if 'close' in connection or served >= KEEPALIVE_MAX_REQUESTS or clients >= MAX_CLIENTS:
+        return False
+    return request.version == 'HTTP/1.1' or 'keep-alive' in connection
+
+def error_response(status):
+    """Head and body for a request the parser rejected; the connection is closed after it"""
+    return frame_response(status, 'text/plain', status, '')
+
+# ==== SERIAL SERVER ====
+def serve_connection(conn):
+    """Answer requests on one connection in order until it closes or idles out"""
+    parser = httpparser.RequestParser()
+    pending = []
+    served = 0
+    pump_wait = pump.poll()
+    give_up = None  # ticks when the client has been silent too long
+    while True:
+        if not pending:
+            # recv in slices no longer than the next task deadline, so the pump
+            # switches off on time while a slow or idle client holds the server
+            now = hal.ticks_ms()
+            if give_up is None:
+                idle_s = CLIENT_TIMEOUT if parser.partial() or not served else SERIAL_KEEPALIVE_IDLE
+                give_up = hal.ticks_add(now, idle_s * 1000)
+            left = hal.ticks_diff(give_up, now)
+            if left <= 0:
+                return
+            conn.settimeout(hal.real_s(min(left, tasks_wait_ms(pump_wait))))
+            try:
+                data = conn.recv(1024)
+            except OSError as e:
+                if not (isinstance(e, socket.timeout) or (e.args and e.args[0] == errno.ETIMEDOUT)):
+                    return
+                pump_wait = poll_tasks()  # slice over, client still has time
+                continue
+            if not data:
+                return
+            give_up = None
+            t0 = profiler.begin()
+            try:
+                pending = parser.feed(data)
+            except httpparser.HTTPError as e:
+                head, body = error_response(e.status)
+                conn.sendall(head)
+                conn.sendall(body)
+                return
+            profiler.end('parse', t0)
+            if not pending:
+                pump_wait = poll_tasks()  # partial request, keep control running
+            continue
+        
+        request = pending.pop(0)
+        t_req = profiler.begin()
+        served += 1
+        keep = SERIAL_KEEPALIVE_IDLE if keep_alive(request, served) else 0
+        
+        t0 = profiler.begin()
+        response = handle_request(request.method, request.path, request.headers, request.query)
+        profiler.end('handle', t0)
+        head, body = frame_response(*response, keep_alive=keep)
+        t0 = profiler.begin()
+        conn.sendall(head)
+        if isinstance(body, bytes):
+            conn.sendall(body)
+        else:
+            httpwriter.send_chunked(conn, profiler.timed('render', body))  # streamed page, never joined
+        profiler.end('send', t0)
+        profiler.end('request', t_req)
+        
+        gc_policy.after_request()
+        if not keep:
+            return
+        if not pending:  # nothing pipelined; keep control running while we wait
+            pump_wait = poll_tasks()
+
+def serve_serial(ip):
+    """Blocking accept loop - one client at a time"""
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    s.bind(('0.0.0.0', 80))
+    s.bind(('0.0.0.0', HTTP_PORT))
     s.listen(5)
-    
-    print(f"\n✅ Server started!")
-    print(f"📱 Open browser: http://{ip}")
-    season, season_type = get_season()
-    print(f"🌾 Current season: {season_type.upper()}")
-    print(f"🌐 Languages: English, Hindi, Telugu")
-    print("="*50)
-    
-    add_log("System started - Multi-language support")
+    print_banner(ip)
     
     while True:
         conn = None
         try:
-            conn, addr = s.accept()
-            request = conn.recv(1024).decode()
-            
-            if not request:
-                conn.close()
-                continue
-            
-            lines = request.split('\r\n')
-            if not lines:
-                conn.close()
+            pump_wait = poll_tasks()
+            wifi.poll()
+            # wake up for the sampler, controller, pump deadline and Blynk without traffic
+            s.settimeout(hal.real_s(tasks_wait_ms(pump_wait)))
+            try:
+                conn, addr = s.accept()
+            except OSError:  # accept timed out: idle window
+                gc_policy.idle()
                 continue
-            
-            req_line = lines[0]
-            parts = req_line.split()
-            if len(parts) < 2:
-                conn.close()
-                continue
-            
-            method = parts[0]
-            path = parts[1]
-            
-            if method == 'GET':
-                if path == '/' or '/dashboard' in path:
-                    html = generate_html()
-                    conn.send('HTTP/1.1 200 OK\r\n')
-                    conn.send('Content-Type: text/html\r\n')
-                    conn.send('Connection: close\r\n\r\n')
-                    conn.sendall(html)
-                
-                elif '/control' in path:
-                    if 'a=pump' in path:
-                        relay.value(1 if relay.value() == 0 else 0)
-                        log_msg = "Pump ON" if relay.value() == 0 else "Pump OFF"
-                        add_log(log_msg)
-                    
-                    elif 'a=mode' in path:
-                        global system_mode
-                        system_mode = "manual" if system_mode == "auto" else "auto"
-                        add_log(f"Mode: {system_mode}")
-                        if system_mode == "auto":
-                            analyze_conditions()
-                    
-                    elif 'a=force' in path:
-                        relay.value(0)
-                        add_log("Force water ON (5s)")
-                        def auto_off():
-                            time.sleep(5)
-                            if relay.value() == 0:
-                                relay.value(1)
-                                add_log("Force water OFF")
-                        import _thread
-                        _thread.start_new_thread(auto_off, ())
-                    
-                    elif 'a=stop' in path:
-                        relay.value(1)
-                        add_log("Water STOP")
-                    
-                    elif 'a=clear' in path:
-                        global operation_logs
-                        operation_logs = []
-                        add_log("Logs cleared")
-                    
-                    conn.send('HTTP/1.1 200 OK\r\n')
-                    conn.send('Content-Type: text/plain\r\n')
-                    conn.send('Connection: close\r\n\r\n')
-                    conn.send('OK')
-                
-                elif '/lang' in path:
-                    global current_language
-                    
-                    if 'l=en' in path:
-                        current_language = "en"
-                        add_log("Language: English")
-                    elif 'l=hi' in path:
-                        current_language = "hi"
-                        add_log("Language: Hindi")
-                    elif 'l=te' in path:
-                        current_language = "te"
-                        add_log("Language: Telugu")
-                    
-                    conn.send('HTTP/1.1 200 OK\r\n')
-                    conn.send('Content-Type: text/plain\r\n')
-                    conn.send('Connection: close\r\n\r\n')
-                    conn.send('OK')
-                
-                elif '/data' in path:
-                    data = read_sensors()
-                    analysis = analyze_conditions()
-                    best_crop_id, score_percent, rating, rating_color, all_scores = predict_best_crop(data)
-                    
-                    json_data = json.dumps({
-                        'temp': data['temp'],
-                        'humidity': data['humidity'],
-                        'soil': data['soil_percent'],
-                        'tank': data['tank_percent'],
-                        'rain': data['rain'],
-                        'pump': data['relay'],
-                        'mode': system_mode,
-                        'season': get_season()[0],
-                        'predicted_crop': best_crop_id,
-                        'crop_score': score_percent
-                    })
-                    
-                    conn.send('HTTP/1.1 200 OK\r\n')
-                    conn.send('Content-Type: application/json\r\n')
-                    conn.send('Connection: close\r\n\r\n')
-                    conn.send(json_data)
-                
-                else:
-                    conn.send('HTTP/1.1 404 Not Found\r\n')
-                    conn.send('Content-Type: text/plain\r\n')
-                    conn.send('Connection: close\r\n\r\n')
-                    conn.send('404 Not Found')
-            
-            else:
-                conn.send('HTTP/1.1 405 Method Not Allowed\r\n')
-                conn.send('Connection: close\r\n\r\n')
-            
-            if conn:
-                conn.close()
-            
-            if system_mode == "auto":
-                analyze_conditions()
-            
-            gc.collect()
+            serve_connection(conn)
+            conn.close()
             
         except KeyboardInterrupt:
             print("\nShutting down...")
@@ -1034,9 +1391,203 @@ def start_server():
                     conn.close()
                 except:
                     pass
-            gc.collect()
+            gc_policy.after_request()
             time.sleep(0.1)
 
+# ==== ASYNC SERVER ====
+async def refuse_client(writer):
+    """503 for a connection over MAX_CLIENTS, before any parser or buffers are set up for it"""
+    global refused_clients
+    refused_clients += 1
+    head, body = frame_response('503 Service Unavailable', 'text/plain', 'Busy', 'Retry-After: 1\r\n')
+    try:
+        writer.write(head)
+        writer.write(body)
+        await asyncio.wait_for(writer.drain(), CLIENT_TIMEOUT)
+    except Exception:
+        pass
+    try:
+        writer.close()
+        await writer.wait_closed()
+    except:
+        pass
+
+async def handle_client(reader, writer):
+    """Serve one connection; keep-alive and pipelined requests are answered in order"""
+    global active_clients, open_clients
+    if open_clients - len(push_hub.subscribers) >= MAX_CLIENTS:
+        await refuse_client(writer)
+        return
+    open_clients += 1
+    parser = httpparser.RequestParser()
+    pending = []
+    served = 0
+    try:
+        while True:
+            if not pending:
+                idle = CLIENT_TIMEOUT if parser.partial() or not served else KEEPALIVE_IDLE
+                data = await asyncio.wait_for(reader.read(1024), idle)
+                if not data:
+                    break
+                t0 = profiler.begin()
+                try:
+                    pending = parser.feed(data)
+                except httpparser.HTTPError as e:
+                    head, body = error_response(e.status)
+                    writer.write(head)
+                    writer.write(body)
+                    await writer.drain()
+                    break
+                profiler.end('parse', t0)
+                continue
+            
+            request = pending.pop(0)
+            if request.path == '/events' and request.method == 'GET':
+                await serve_events(request, writer)
+                break
+            t_req = profiler.begin()
+            served += 1
+            streams = len(push_hub.subscribers)  # held open on purpose, not idle keep-alives
+            keep = KEEPALIVE_IDLE if keep_alive(request, served, open_clients - streams) else 0
+            active_clients += 1
+            try:
+                t0 = profiler.begin()
+                response = handle_request(request.method, request.path, request.headers, request.query)
+                profiler.end('handle', t0)
+                head, body = frame_response(*response, keep_alive=keep)
+                t0 = profiler.begin()
+                writer.write(head)
+                if isinstance(body, bytes):
+                    writer.write(body)
+                    await writer.drain()
+                else:
+                    await httpwriter.write_chunked(writer, profiler.timed('render', body))
+                profiler.end('send', t0)
+                profiler.end('request', t_req)
+            finally:
+                active_clients -= 1
+            gc_policy.after_request()
+            if not keep:
+                break
+    except asyncio.TimeoutError:
+        pass
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except:
+            pass
+        open_clients -= 1
+
+async def serve_events(request, writer):
+    """Hold an SSE stream open, sending /data deltas whenever the hub publishes"""
+    try:
+        since = int(request.headers.get('last-event-id') or request.query.get('since', 0))
+    except ValueError:
+        since = 0
+    sub = push_hub.subscribe(since)
+    if sub is None:  # the page falls back to polling /data
+        head, body = frame_response('503 Service Unavailable', 'text/plain', 'Too many live viewers', 'Retry-After: 30\r\n')
+        writer.write(head)
+        writer.write(body)
+        await writer.drain()
+        return
+    try:
+        writer.write(response_head('200 OK', 'text/event-stream', 'Cache-Control: no-store\r\n').encode())
+        writer.write(push.preamble())
+        if not data_fields:
+            refresh_data_fields()
+        if sub.seq != data_seq:
+            sub.event.set()  # catch up right away
+        while True:
+            try:
+                await asyncio.wait_for(sub.event.wait(), push.HEARTBEAT_S)
+            except asyncio.TimeoutError:
+                writer.write(push.HEARTBEAT)
+            else:
+                sub.event.clear()
+                seq = data_seq
+                writer.write(push.event(seq, event_payload(sub.seq)))
+                sub.seq = seq
+                push_hub.sent += 1
+            try:
+                await asyncio.wait_for(writer.drain(), push.SEND_TIMEOUT_S)
+            except asyncio.TimeoutError:
+                push_hub.dropped += 1
+                return
+    except OSError:  # viewer went away
+        pass
+    finally:
+        push_hub.unsubscribe(sub)
+
+def idle_gc():
+    if not active_clients:
+        gc_policy.idle()
+
+async def sampler_loop():
+    """Sample every SAMPLE_PERIOD_MS (the sinks push it on); GC in idle windows"""
+    await sampler.run(idle_gc)
+
+async def serve_async(ip):
+    """Concurrent server: one task per client plus the control loop task"""
+    server = await asyncio.start_server(handle_client, '0.0.0.0', HTTP_PORT, backlog=MAX_BACKLOG)
+    print_banner(ip)
+    sample_sensors()
+    asyncio.create_task(sampler_loop())
+    asyncio.create_task(controller.run())
+    asyncio.create_task(pump.run())
+    asyncio.create_task(wifi.run())
+    asyncio.create_task(clock_loop())
+    if blynk_sink:
+        asyncio.create_task(blynk_sink.run())
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:  # shutdown: stop accepting and release the listening socket
+        server.close()
+        await server.wait_closed()
+
+def print_banner(ip):
+    """Print startup info"""
+    print(f"\n✅ Server started! ({SERVER_MODE} mode)")
+    if ip:
+        print(f"📱 Open browser: http://{ip}")
+    else:
+        print("📱 WiFi still connecting; the address is printed once it is up")
+    season, season_type = get_season()
+    print(f"🌾 Current season: {season_type.upper()}")
+    print("🌐 Languages: English, Hindi, Telugu")
+    print("="*50)
+
+def start_server():
+    """Start web server"""
+    global history_store, time_sync
+    print("\n" + "="*50)
+    print("Starting Smart Crop Prediction System...")
+    print("="*50)
+    
+    print("Connecting to WiFi in the background...")
+    wifi.poll()
+    ip = wifi.ip()
+    
+    event_log.log(eventlog.STARTED)
+    time_sync = timesync.TimeSync(NTP_SERVER)
+    history_store = history.HistoryStore(HISTORY_DIR, clock=hal.time)
+    setup_sinks()
+    gc_policy.setup()
+    
+    if SERVER_MODE == "async":
+        try:
+            asyncio.run(serve_async(ip))
+        except KeyboardInterrupt:
+            print("\nShutting down...")
+    else:
+        serve_serial(ip)
+    history_store.flush()
+
 # ==== MAIN ====
-gc.collect()
-start_server()
+if __name__ == "__main__":
+    gc.collect()
+    start_server()
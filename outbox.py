@@ -0,0 +1,367 @@
+"""Store-and-forward queue for telemetry while the uplink is away
+
+Readings are struct-packed (timestamp + int16 values) into a RAM ring.
+When the ring fills, its oldest block is spilled to a ring file on
+flash, so flash only ever holds records older than those in RAM and the
+queue stays in time order. When the flash ring is full its oldest
+records are overwritten (oldest-first drop); without flash the oldest
+RAM record is dropped instead. The file header is rewritten on every
+spill and ack, so a reboot picks up where the queue left off.
+
+Records stamped before the clock was set (timesync.valid()) are refused
+and counted, since their times would be years off.
+
+drain() sends one batch, oldest first, at most every interval_ms, and
+removes records only once the sink has taken them; a refused batch is
+retried after retry_ms. pump() does the same through a non-blocking
+sink such as HttpSink, which posts batches to Blynk's timestamped batch
+endpoint (or bench/fake_sink.py) a step per call: it never waits on the
+socket, and a server that stops answering is given up on after the
+timeout.
+"""
+import errno
+import json
+import socket
+import struct
+
+try:
+    import os
+except ImportError:
+    import uos as os
+
+import hal
+import resolver
+import timesync
+
+RAM_CAPACITY = 64  # records
+FLASH_CAPACITY = 2880  # records, 0 disables the spill file (4 h at one per 5 s)
+SPILL_BATCH = 32  # records moved to flash per write
+DRAIN_BATCH = 30  # records per send
+DRAIN_INTERVAL_MS = 1000  # between sends while draining
+DRAIN_RETRY_MS = 10000  # after the sink refused a batch
+HTTP_TIMEOUT_S = 2  # per request
+
+HEADER_FMT = '<4sBBHHH'  # magic, version, record size, capacity, head, count
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+MAGIC = b'OBOX'
+VERSION = 1
+
+
+class Outbox:
+    def __init__(self, n_values, path='outbox.bin', ram_capacity=RAM_CAPACITY,
+                 flash_capacity=FLASH_CAPACITY, spill_batch=SPILL_BATCH,
+                 batch=DRAIN_BATCH, interval_ms=DRAIN_INTERVAL_MS, retry_ms=DRAIN_RETRY_MS,
+                 clock=None):
+        self.fmt = '<I' + 'h' * n_values
+        self.size = struct.calcsize(self.fmt)
+        self.path = path if flash_capacity else None
+        self.ram = bytearray(ram_capacity * self.size)
+        self.ram_capacity = ram_capacity
+        self.ram_head = 0  # oldest RAM record
+        self.ram_count = 0
+        self.flash_capacity = flash_capacity
+        self.flash_head = 0  # next flash slot to write
+        self.flash_count = 0
+        self.spill_batch = spill_batch
+        self.batch = batch
+        self.interval_ms = interval_ms
+        self.retry_ms = retry_ms
+        self.clock = clock or hal.ticks_ms
+        self.next_drain = self.clock()
+        self.in_flight = None  # oldest records handed to a pump() sink, not yet acked
+        self.queued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.unstamped = 0  # refused: taken before the clock was set
+        self.spilled = 0
+        self.flash_writes = 0
+        self.batches = 0
+        self.failures = 0  # sends the sink refused
+        if self.path:
+            self._load_header()
+
+    # ---- flash ring ----
+    def _load_header(self):
+        try:
+            with open(self.path, 'rb') as f:
+                magic, version, size, capacity, head, count = struct.unpack(HEADER_FMT, f.read(HEADER_SIZE))
+        except (OSError, ValueError):
+            return self._reset()
+        if magic != MAGIC or version != VERSION or size != self.size or capacity != self.flash_capacity:
+            return self._reset()
+        self.flash_head = head
+        self.flash_count = count
+
+    def _reset(self):
+        self.flash_head = 0
+        self.flash_count = 0
+        with open(self.path, 'wb') as f:
+            f.write(self._header())
+
+    def _header(self):
+        return struct.pack(HEADER_FMT, MAGIC, VERSION, self.size, self.flash_capacity,
+                           self.flash_head, self.flash_count)
+
+    def _write_header(self, f):
+        f.seek(0)
+        f.write(self._header())
+
+    def _spill(self):
+        """Move the oldest RAM block to flash, overwriting the oldest flash records if full"""
+        n = min(self.spill_batch, self.ram_count)
+        size = self.size
+        with open(self.path, 'r+b') as f:
+            done = 0
+            while done < n:
+                src = (self.ram_head + done) % self.ram_capacity
+                run = min(n - done, self.ram_capacity - src, self.flash_capacity - self.flash_head)
+                f.seek(HEADER_SIZE + self.flash_head * size)
+                f.write(memoryview(self.ram)[src * size:(src + run) * size])
+                self.flash_head = (self.flash_head + run) % self.flash_capacity
+                done += run
+            over = self.flash_count + n - self.flash_capacity
+            if over > 0:
+                self._lost(over)
+            self.flash_count = min(self.flash_capacity, self.flash_count + n)
+            self._write_header(f)
+        self.ram_head = (self.ram_head + n) % self.ram_capacity
+        self.ram_count -= n
+        self.spilled += n
+        self.flash_writes += 1
+
+    # ---- queue ----
+    def _lost(self, n):
+        """n oldest records were dropped to make room"""
+        self.dropped += n
+        if self.in_flight:
+            self.in_flight = max(0, self.in_flight - n)
+
+    def __len__(self):
+        return self.flash_count + self.ram_count
+
+    def put(self, ts, values):
+        """Queue one reading (values in the order given to the constructor); False if refused"""
+        if not timesync.valid(ts):
+            self.unstamped += 1
+            return False
+        if self.ram_count == self.ram_capacity:
+            if self.path:
+                self._spill()
+            else:
+                self.ram_head = (self.ram_head + 1) % self.ram_capacity
+                self.ram_count -= 1
+                self._lost(1)
+        i = (self.ram_head + self.ram_count) % self.ram_capacity
+        struct.pack_into(self.fmt, self.ram, i * self.size, int(ts), *[int(round(v)) for v in values])
+        self.ram_count += 1
+        self.queued += 1
+        return True
+
+    def peek(self, n):
+        """Up to n oldest records as (ts, values), flash first"""
+        out = []
+        size = self.size
+        n = min(n, len(self))
+        if self.flash_count and n:
+            buf = bytearray(size)
+            with open(self.path, 'rb') as f:
+                for k in range(min(n, self.flash_count)):
+                    slot = (self.flash_head - self.flash_count + k) % self.flash_capacity
+                    f.seek(HEADER_SIZE + slot * size)
+                    f.readinto(buf)
+                    record = struct.unpack(self.fmt, buf)
+                    out.append((record[0], record[1:]))
+        k = 0
+        while len(out) < n:
+            record = struct.unpack_from(self.fmt, self.ram, (self.ram_head + k) % self.ram_capacity * size)
+            out.append((record[0], record[1:]))
+            k += 1
+        return out
+
+    def ack(self, n):
+        """Remove the n oldest records (they reached the sink)"""
+        from_flash = min(n, self.flash_count)
+        if from_flash:
+            self.flash_count -= from_flash
+            with open(self.path, 'r+b') as f:
+                self._write_header(f)
+        rest = n - from_flash
+        self.ram_head = (self.ram_head + rest) % self.ram_capacity
+        self.ram_count -= rest
+        self.sent += n
+
+    def _due(self, now):
+        """The next batch if the rate allows, else None"""
+        if not len(self) or hal.ticks_diff(now, self.next_drain) < 0:
+            return None
+        self.next_drain = hal.ticks_add(now, self.interval_ms)
+        return self.peek(self.batch)
+
+    def _refused(self, now):
+        self.failures += 1
+        self.next_drain = hal.ticks_add(now, self.retry_ms)
+
+    def _taken(self, n):
+        self.ack(n)
+        self.batches += 1
+        return n
+
+    def drain(self, send):
+        """Hand one batch to send(records) if the rate allows; returns records sent
+
+        send() raises OSError to refuse; the records stay queued and are offered
+        again after retry_ms, so the sink must accept repeats (Blynk's batch
+        endpoint keys points by timestamp).
+        """
+        now = self.clock()
+        records = self._due(now)
+        if not records:
+            return 0
+        try:
+            send(records)
+        except OSError:
+            self._refused(now)
+            return 0
+        return self._taken(len(records))
+
+    def pump(self, sink):
+        """drain() through a non-blocking sink; call often, returns records sent
+
+        sink.start(records) begins an upload and sink.poll() advances it
+        without waiting: False while busy, True once the sink has taken the
+        batch; OSError refuses it. Records dropped from the front while a
+        batch is out shorten the ack, so newer ones are never acked unsent.
+        """
+        now = self.clock()
+        if self.in_flight is None:
+            records = self._due(now)
+            if records:
+                sink.start(records)
+                self.in_flight = len(records)
+            return 0
+        try:
+            if not sink.poll():
+                return 0
+        except OSError:
+            self.in_flight = None
+            self._refused(now)
+            return 0
+        n, self.in_flight = self.in_flight, None
+        return self._taken(n)
+
+    def stats(self):
+        return {
+            'depth': len(self),
+            'ram': self.ram_count,
+            'flash': self.flash_count,
+            'queued': self.queued,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'unstamped': self.unstamped,
+            'spilled': self.spilled,
+            'flash_writes': self.flash_writes,
+            'batches': self.batches,
+            'failures': self.failures,
+        }
+
+
+class HttpSink:
+    """Posts batches as [[unix ms, value], ...] per pin, one request per pin
+
+    start() queues the requests for a batch and poll() moves them along on
+    a non-blocking socket: connect, send, read the status line. Each
+    request gets `timeout` seconds of ticks before the batch is refused.
+    The address comes from a resolver.Resolver: `ip` (or a literal IP
+    host) skips DNS, else the one blocking lookup is kept once it
+    succeeds and backed off after failures.
+    """
+
+    PATH = '/external/api/batch/update?token=%s&pin=V%d'
+    WOULD_BLOCK = (errno.EAGAIN, errno.EINPROGRESS, errno.EALREADY, errno.ENOTCONN)
+
+    def __init__(self, host, port, token, pins, timeout=HTTP_TIMEOUT_S, clock=None, ip=None):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.pins = pins  # pin -> index into the record's values
+        self.timeout_ms = int(timeout * 1000)
+        self.clock = clock or hal.ticks_ms
+        self.resolver = resolver.Resolver(host, port, ip, clock=self.clock)
+        self.posts = []  # (path, body) still to send for the current batch
+        self.sock = None
+        self.out = b''  # request bytes not yet written
+        self.started = None
+        self.requests = 0
+        self.timeouts = 0
+
+    def _close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def _open(self, path, body):
+        addr = self.resolver.address()
+        if addr is None:
+            raise OSError('no address for ' + self.host)
+        s = socket.socket()
+        s.setblocking(False)
+        self.sock = s
+        self.started = self.clock()
+        self.out = (b'POST %s HTTP/1.1\r\nHost: %s\r\nContent-Type: application/json\r\n'
+                    b'Content-Length: %d\r\nConnection: close\r\n\r\n'
+                    % (path.encode(), self.host.encode(), len(body)) + body)
+        try:
+            s.connect(addr)
+        except OSError as e:
+            if e.args[0] not in self.WOULD_BLOCK:
+                raise
+
+    def start(self, records):
+        self._close()
+        self.posts = []
+        for pin, index in self.pins.items():
+            points = [[(ts + hal.EPOCH_OFFSET) * 1000, values[index]] for ts, values in records]
+            self.posts.append((self.PATH % (self.token, pin), json.dumps(points).encode()))
+
+    def poll(self):
+        """Advance the batch without blocking; True once every pin is posted"""
+        try:
+            while self.posts:
+                if self.sock is None:
+                    self._open(*self.posts[0])
+                if not self._step():
+                    if hal.ticks_diff(self.clock(), self.started) >= self.timeout_ms:
+                        self.timeouts += 1
+                        raise OSError(errno.ETIMEDOUT)
+                    return False
+                self._close()
+                self.posts.pop(0)
+            return True
+        except OSError:
+            self._close()
+            self.posts = []
+            raise
+
+    def _step(self):
+        """One non-blocking pass at the open request; True once answered 2xx"""
+        s = self.sock
+        try:
+            while self.out:
+                self.out = self.out[s.send(self.out):]
+            status = s.recv(64)
+        except OSError as e:
+            if e.args[0] in self.WOULD_BLOCK:
+                return False
+            raise
+        self.requests += 1
+        status = status.split(b' ', 2)
+        if len(status) < 2 or not status[1].startswith(b'2'):
+            raise OSError('sink answered %r' % b' '.join(status[:2]))
+        return True
+
+
+def remove_file(path='outbox.bin'):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
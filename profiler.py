@@ -0,0 +1,162 @@
+"""Hot-path profiler: per-stage timing histograms in Prometheus text format
+
+Stages are timed with hal.ticks_us (time.ticks_us on the board,
+perf_counter on the host) into log2 buckets, so recording never
+allocates and p50/p95 can be estimated at any time. When disabled,
+begin() returns None and every other call returns at once.
+
+    t0 = profiler.begin()
+    ...
+    profiler.end('render', t0)
+"""
+import gc
+from array import array
+
+import hal
+
+BUCKETS = 26  # bucket i holds values below 2**i us (top bucket: ~33 s and up)
+QUANTILES = (0.5, 0.95)
+PREFIX = 'smartfarm'
+
+enabled = False
+stages = {}  # name -> Histogram
+gc_runs = 0
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = array('L', [0] * BUCKETS)
+        self.count = 0
+        self.sum = 0
+        self.min = 0
+        self.max = 0
+
+    def add(self, us):
+        if us < 0:
+            us = 0
+        i = 0
+        v = us
+        while v and i < BUCKETS - 1:
+            v >>= 1
+            i += 1
+        self.counts[i] += 1
+        if not self.count or us < self.min:
+            self.min = us
+        if us > self.max:
+            self.max = us
+        self.count += 1
+        self.sum += us
+
+    def quantile(self, q):
+        """Estimate from the buckets, interpolated and clamped to min/max"""
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for i in range(BUCKETS):
+            n = self.counts[i]
+            if n and seen + n >= rank:
+                lo = 0 if i == 0 else 1 << (i - 1)
+                hi = 1 << i
+                est = lo + (hi - lo) * (rank - seen) / n
+                return int(min(max(est, self.min), self.max))
+            seen += n
+        return self.max
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+def reset():
+    global gc_runs
+    stages.clear()
+    gc_runs = 0
+
+
+def begin():
+    return hal.ticks_us() if enabled else None
+
+
+def end(stage, t0):
+    """Record the time since begin() for `stage`"""
+    if t0 is not None:
+        record(stage, hal.ticks_diff(hal.ticks_us(), t0))
+
+
+def record(stage, us):
+    if not enabled:
+        return
+    h = stages.get(stage)
+    if h is None:
+        h = stages[stage] = Histogram()
+    h.add(us)
+
+
+def timed(stage, chunks):
+    """Wrap a chunk iterator; the time spent producing chunks is recorded as `stage`"""
+    if not enabled:
+        return chunks
+    return _timed(stage, chunks)
+
+
+def _timed(stage, chunks):
+    it = iter(chunks)
+    total = 0
+    while True:
+        t0 = hal.ticks_us()
+        try:
+            chunk = next(it)
+        except StopIteration:
+            break
+        total += hal.ticks_diff(hal.ticks_us(), t0)
+        yield chunk
+    record(stage, total)
+
+
+def collect():
+    """gc.collect(), timed as stage 'gc' and counted"""
+    global gc_runs
+    gc_runs += 1
+    t0 = begin()
+    gc.collect()
+    end('gc', t0)
+
+
+def metrics(extra=None):
+    """Prometheus text exposition, one line per chunk
+
+    `extra` is an optional list of (name, type, help, value) gauges or
+    counters added by the app.
+    """
+    name = PREFIX + '_stage_us'
+    yield '# HELP %s Time per stage in microseconds (quantiles from log2 buckets)\n' % name
+    yield '# TYPE %s summary\n' % name
+    for stage in sorted(stages):
+        h = stages[stage]
+        for q in QUANTILES:
+            yield '%s{stage="%s",quantile="%s"} %d\n' % (name, stage, q, h.quantile(q))
+        yield '%s_sum{stage="%s"} %d\n' % (name, stage, h.sum)
+        yield '%s_count{stage="%s"} %d\n' % (name, stage, h.count)
+    for suffix, attr in (('min', 'min'), ('max', 'max')):
+        yield '# TYPE %s_%s gauge\n' % (name, suffix)
+        for stage in sorted(stages):
+            yield '%s_%s{stage="%s"} %d\n' % (name, suffix, stage, getattr(stages[stage], attr))
+
+    yield from _sample(PREFIX + '_gc_runs_total', 'counter', 'gc.collect() calls by the app', gc_runs)
+    if hasattr(gc, 'mem_free'):
+        yield from _sample(PREFIX + '_heap_free_bytes', 'gauge', 'Free heap', gc.mem_free())
+        yield from _sample(PREFIX + '_heap_alloc_bytes', 'gauge', 'Allocated heap', gc.mem_alloc())
+    if hasattr(gc, 'get_stats'):  # CPython: collections per generation
+        yield '# TYPE %s_gc_collections_total counter\n' % PREFIX
+        for gen, stats in enumerate(gc.get_stats()):
+            yield '%s_gc_collections_total{generation="%d"} %d\n' % (PREFIX, gen, stats['collections'])
+    for metric, kind, text, value in extra or ():
+        yield from _sample(PREFIX + '_' + metric, kind, text, value)
+
+
+def _sample(name, kind, text, value):
+    yield '# HELP %s %s\n' % (name, text)
+    yield '# TYPE %s %s\n' % (name, kind)
+    yield '%s %s\n' % (name, value)
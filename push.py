@@ -0,0 +1,78 @@
+"""Server-Sent Events hub: one sample, broadcast to every open dashboard
+
+Each /events connection registers a Subscriber. publish() wakes them all;
+each one then sends whatever changed since the last sequence number it
+delivered, so a slow viewer simply skips intermediate states and gets
+one merged delta instead of a growing queue. Nothing is buffered per
+subscriber beyond its sequence number, and the number of subscribers is
+capped so the device's socket and heap budget hold.
+"""
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+MAX_SUBSCRIBERS = 4
+RETRY_MS = 3000  # browser reconnect delay after a drop
+HEARTBEAT_S = 15  # comment line on a quiet stream so dead peers are noticed
+SEND_TIMEOUT_S = 5  # a subscriber that can't take one event in this long is dropped
+
+
+class Subscriber:
+    def __init__(self, seq):
+        self.seq = seq  # last sequence number delivered
+        self.event = asyncio.Event()
+
+
+class Hub:
+    def __init__(self, limit=MAX_SUBSCRIBERS):
+        self.limit = limit
+        self.subscribers = []
+        self.seq = 0  # sequence of the latest publish
+        self.published = 0
+        self.sent = 0  # events written, all subscribers
+        self.rejected = 0  # refused at the cap
+        self.dropped = 0  # cut off for not keeping up
+
+    def subscribe(self, since=0):
+        """New Subscriber, or None when the cap is reached"""
+        if len(self.subscribers) >= self.limit:
+            self.rejected += 1
+            return None
+        sub = Subscriber(since)
+        self.subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        if sub in self.subscribers:
+            self.subscribers.remove(sub)
+
+    def publish(self, seq):
+        """Wake every subscriber behind `seq`"""
+        self.seq = seq
+        self.published += 1
+        for sub in self.subscribers:
+            if sub.seq != seq:
+                sub.event.set()
+
+    def stats(self):
+        return {
+            'subscribers': len(self.subscribers),
+            'limit': self.limit,
+            'published': self.published,
+            'sent': self.sent,
+            'rejected': self.rejected,
+            'dropped': self.dropped,
+        }
+
+
+def event(seq, data):
+    """One SSE message; the id lets a reconnecting browser resume"""
+    return f'id: {seq}\ndata: {data}\n\n'.encode()
+
+
+def preamble():
+    return f'retry: {RETRY_MS}\n\n'.encode()
+
+
+HEARTBEAT = b':\n\n'
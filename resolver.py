@@ -0,0 +1,65 @@
+"""Server addresses without a DNS lookup on every retry
+
+socket.getaddrinfo() has no non-blocking form: with WiFi up but no
+internet it waits out the whole DNS timeout, stalling the event loop
+and with it the pump deadlines and HTTP clients. A Resolver looks a
+host up once and keeps the address. A literal IPv4 host, or an `ip`
+given in the config, needs no lookup at all. After a failed lookup it
+refuses to try again for a backoff that doubles per failure (up to
+BACKOFF_MAX_MS), so an unreachable DNS server costs one stall per
+backoff instead of one per connection attempt.
+"""
+import socket
+
+import hal
+
+BACKOFF_MS = 5000  # after the first failed lookup
+BACKOFF_MAX_MS = 10 * 60000
+
+
+def is_ip(host):
+    """Whether host is a dotted IPv4 address"""
+    parts = host.split('.')
+    return len(parts) == 4 and all(p.isdigit() and int(p) < 256 for p in parts)
+
+
+class Resolver:
+    def __init__(self, host, port, ip=None, backoff_ms=BACKOFF_MS, clock=None):
+        self.host = host
+        self.port = port
+        self.clock = clock or hal.ticks_ms
+        self.first_backoff_ms = backoff_ms
+        self.backoff_ms = backoff_ms
+        self.retry_at = None  # no lookup before this, after a failure
+        self.lookups = 0
+        self.failures = 0
+        if ip or is_ip(host):
+            self.addr = (ip or host, port)
+        else:
+            self.addr = None
+
+    def address(self):
+        """The server's address, or None while a failed lookup is backing off"""
+        if self.addr is not None:
+            return self.addr
+        if self.retry_at is not None and hal.ticks_diff(self.clock(), self.retry_at) < 0:
+            return None
+        self.lookups += 1
+        try:
+            self.addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+        except OSError:
+            self.failures += 1
+            self.retry_at = hal.ticks_add(self.clock(), self.backoff_ms)  # from the end of the stall
+            self.backoff_ms = min(self.backoff_ms * 2, BACKOFF_MAX_MS)
+            return None
+        self.backoff_ms = self.first_backoff_ms
+        self.retry_at = None
+        return self.addr
+
+    def stats(self):
+        return {
+            'resolved': self.addr is not None,
+            'lookups': self.lookups,
+            'failures': self.failures,
+            'backoff_ms': self.backoff_ms,
+        }
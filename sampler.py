@@ -0,0 +1,118 @@
+"""One sensor read per period, fanned out to pluggable sinks
+
+The Sampler owns the hardware read. sample() calls read() once, stamps
+the result with its ticks_ms and a sample number, keeps it as the shared
+snapshot and hands that same dict to every sink in the order they were
+added. Sinks (dashboard, Blynk, history, serial log...) never touch the
+sensors themselves, so adding one costs only its own time, which is
+recorded per sink (profiler stage 'sink_<name>' and stats()). A sink
+that raises is counted and skipped for that sample; the others still run.
+
+snapshot() serves readers between samples and re-reads only when the
+snapshot is missing or older than max_age_ms. poll() is for loops that
+can't await; run() is the asyncio task.
+"""
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+import hal
+import profiler
+from control import Stat
+
+PERIOD_MS = 2000
+MAX_AGE_MS = 10000
+
+
+class Sink:
+    def __init__(self, name, fn):
+        self.name = name
+        self.fn = fn  # fn(snapshot)
+        self.stage = 'sink_' + name
+        self.cost_us = Stat()
+        self.errors = 0
+
+
+class Sampler:
+    def __init__(self, read, period_ms=PERIOD_MS, max_age_ms=MAX_AGE_MS, clock=None):
+        self.read = read  # () -> dict, the only code that touches the sensors
+        self.period_ms = period_ms
+        self.max_age_ms = max_age_ms
+        self.clock = clock or hal.ticks_ms
+        self.sinks = []
+        self.data = None  # latest snapshot
+        self.count = 0  # samples taken
+        self.next_due = self.clock()
+        self.read_us = Stat()
+
+    def add_sink(self, name, fn):
+        """Register fn(snapshot) to run after every sample; returns the Sink"""
+        sink = Sink(name, fn)
+        self.sinks.append(sink)
+        return sink
+
+    def remove_sink(self, name):
+        self.sinks = [s for s in self.sinks if s.name != name]
+
+    def sample(self):
+        """Read the hardware once and fan the snapshot out to every sink"""
+        t0 = hal.ticks_us()
+        data = self.read()
+        us = hal.ticks_diff(hal.ticks_us(), t0)
+        self.read_us.add(us)
+        profiler.record('sensors', us)
+        data['t'] = self.clock()
+        self.count += 1
+        data['sample'] = self.count
+        self.data = data
+        for sink in self.sinks:
+            t0 = hal.ticks_us()
+            try:
+                sink.fn(data)
+            except Exception as e:
+                sink.errors += 1
+                print(f"Sink {sink.name} error: {e}")
+            us = hal.ticks_diff(hal.ticks_us(), t0)
+            sink.cost_us.add(us)
+            profiler.record(sink.stage, us)
+        return data
+
+    def snapshot(self, max_age_ms=None):
+        """Latest snapshot; only samples if missing or stale"""
+        if max_age_ms is None:
+            max_age_ms = self.max_age_ms
+        data = self.data
+        if data is None or hal.ticks_diff(self.clock(), data['t']) > max_age_ms:
+            data = self.sample()
+        return data
+
+    def poll(self):
+        """Sample if due; for loops that can't await"""
+        now = self.clock()
+        if hal.ticks_diff(now, self.next_due) < 0:
+            return None
+        self.next_due = hal.ticks_add(self.next_due, self.period_ms)
+        if hal.ticks_diff(now, self.next_due) >= 0:  # fell behind, skip missed slots
+            self.next_due = hal.ticks_add(now, self.period_ms)
+        return self.sample()
+
+    async def run(self, idle=None):
+        """Sample every period_ms; idle() runs after each sample (e.g. GC)"""
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Sampler error: {e}")
+            if idle:
+                idle()
+            wait_ms = hal.ticks_diff(self.next_due, self.clock())
+            await asyncio.sleep(hal.real_s(max(0, wait_ms)))
+
+    def stats(self):
+        return {
+            'period_ms': self.period_ms,
+            'samples': self.count,
+            'read_us': self.read_us.as_dict(),
+            'sinks': dict((s.name, {'cost_us': s.cost_us.as_dict(), 'errors': s.errors}) for s in self.sinks),
+        }
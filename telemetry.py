@@ -0,0 +1,80 @@
+"""Compact telemetry records: fixed field order, integer-coded states
+
+/data?fmt=bin is one little-endian struct instead of a JSON object with
+string keys, and the Blynk batch uplink is one virtual-pin write of
+small integers instead of one write per value. States travel as codes
+(indexes into the tuples below); clients map them to text themselves.
+"""
+try:
+    import struct
+except ImportError:
+    import ustruct as struct
+
+import crops
+
+VERSION = 1
+
+STATUSES = ('good', 'warn', 'crit')
+SEASONS = ('rabi_sowing', 'rabi_growing', 'rabi_harvest',
+           'kharif_sowing', 'kharif_growing', 'kharif_harvest', 'zaid')
+SOIL_STATES = ('dry', 'moist', 'wet')
+TANK_STATES = ('low', 'ok')
+
+# flags bits
+RAINING = 1
+PUMP_ON = 2
+MANUAL = 4
+
+# name, struct code; temp is in tenths of a degree
+FIELDS = (
+    ('version', 'B'),
+    ('sample', 'I'),  # sample counter, changes when the readings do
+    ('temp', 'h'),
+    ('humidity', 'B'),
+    ('soil', 'B'),
+    ('tank', 'B'),
+    ('soil_value', 'H'),
+    ('tank_value', 'H'),
+    ('rain_value', 'H'),
+    ('flags', 'B'),
+    ('status', 'B'),
+    ('season', 'B'),
+    ('crop', 'B'),  # index into crops.CROP_IDS
+    ('score', 'B'),
+)
+FORMAT = '<' + ''.join(code for _, code in FIELDS)
+SIZE = struct.calcsize(FORMAT)
+
+# Blynk batch: one write of these integers to BLYNK_PIN
+BLYNK_FIELDS = ('soil_value', 'soil_state', 'tank_value', 'tank_state', 'raining', 'temp', 'humidity')
+BLYNK_PIN = 10
+
+
+def code(table, value):
+    """Index of `value` in a code table (0 if unknown)"""
+    try:
+        return table.index(value)
+    except ValueError:
+        return 0
+
+
+def encode(sample, data, status, season, crop_id, score, manual):
+    """Pack a sensor snapshot and its analysis into SIZE bytes"""
+    flags = (RAINING if data['rain'] == 0 else 0) | (PUMP_ON if data['relay'] == 0 else 0) | (MANUAL if manual else 0)
+    return struct.pack(
+        FORMAT, VERSION, sample & 0xffffffff,
+        int(round(data['temp'] * 10)), int(data['humidity']),
+        data['soil_percent'], data['tank_percent'],
+        data['soil_value'], data['tank_value'], data['rain_value'],
+        flags, code(STATUSES, status), code(SEASONS, season),
+        code(crops.CROP_IDS, crop_id), min(255, score))
+
+
+def decode(buf):
+    """Record bytes -> dict keyed by FIELDS names (for host-side clients)"""
+    values = struct.unpack(FORMAT, buf[:SIZE])
+    if values[0] != VERSION:
+        raise ValueError('telemetry version %d' % values[0])
+    record = dict(zip([name for name, _ in FIELDS], values))
+    record['temp'] /= 10
+    return record
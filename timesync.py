@@ -0,0 +1,108 @@
+"""Wall clock from NTP: a non-blocking SNTP client
+
+The ESP32's RTC starts at 2000-01-01 on every power-up and nothing sets
+it, so timestamps taken before a sync are meaningless; valid() tells
+them apart (outbox.Outbox refuses such records). poll() never waits: it
+sends one SNTP query over UDP when a sync is due and picks the reply up
+on a later call, giving up after TIMEOUT_MS. A sync is due at once if the
+clock isn't valid (else after RESYNC_MS), then RETRY_MS after a failure
+and RESYNC_MS after a success, which keeps the RTC's drift in check.
+The host lookup (DNS) is the one call that blocks; resolver.Resolver
+keeps the address once found and backs off further after each failed
+lookup, and a literal IP as host skips it.
+"""
+import socket
+import struct
+
+import hal
+import resolver
+
+NTP_HOST = 'pool.ntp.org'
+NTP_PORT = 123
+NTP_DELTA = 2208988800  # NTP counts from 1900, Unix from 1970
+VALID_AFTER = 1672531200  # 2023-01-01: an RTC reading earlier than this was never set
+TIMEOUT_MS = 2000  # for the reply to one query
+RETRY_MS = 30000
+RESYNC_MS = 6 * 3600000
+POLL_MS = 200  # how often the runtime calls poll(); a reply is picked up this late at most
+
+
+def unix_time():
+    return hal.time() + hal.EPOCH_OFFSET
+
+
+def valid(ts=None):
+    """Whether time() (or a time() stamp ts) comes from a set clock"""
+    if ts is None:
+        ts = hal.time()
+    return ts + hal.EPOCH_OFFSET >= VALID_AFTER
+
+
+class TimeSync:
+    def __init__(self, host=NTP_HOST, port=NTP_PORT, clock=None):
+        self.clock = clock or hal.ticks_ms
+        self.resolver = resolver.Resolver(host, port, backoff_ms=RETRY_MS, clock=self.clock)
+        self.sock = None  # open while a query is out
+        self.sent_at = None
+        now = self.clock()
+        self.due_at = now if not valid() else hal.ticks_add(now, RESYNC_MS)
+        self.syncs = 0
+        self.failures = 0
+        self.step_s = None  # correction applied by the last sync
+
+    def _close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def _fail(self, now):
+        self._close()
+        self.failures += 1
+        self.due_at = hal.ticks_add(now, RETRY_MS)
+
+    def _query(self, now):
+        addr = self.resolver.address()
+        if addr is None:
+            raise OSError('no address for ' + self.resolver.host)
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.setblocking(False)
+        self.sock = s
+        s.sendto(b'\x1b' + bytes(47), addr)  # SNTP v3 client request
+        self.sent_at = now
+
+    def poll(self):
+        """Query when due, take the reply when it has arrived; True once synced"""
+        now = self.clock()
+        if self.sock is None:
+            if hal.ticks_diff(now, self.due_at) >= 0:
+                try:
+                    self._query(now)
+                except OSError:
+                    self._fail(now)
+            return self.syncs > 0
+        try:
+            data = self.sock.recv(48)
+        except OSError:  # nothing yet
+            if hal.ticks_diff(now, self.sent_at) >= TIMEOUT_MS:
+                self._fail(now)
+            return self.syncs > 0
+        self._close()
+        secs = struct.unpack('!I', data[40:44])[0] if len(data) >= 48 else 0
+        if not secs:
+            self._fail(now)
+            return self.syncs > 0
+        before = unix_time()
+        hal.set_time(secs - NTP_DELTA)
+        self.step_s = int(unix_time() - before)
+        self.syncs += 1
+        self.due_at = hal.ticks_add(now, RESYNC_MS)
+        return True
+
+    def stats(self):
+        return {
+            'valid': valid(),
+            'syncs': self.syncs,
+            'failures': self.failures,
+            'step_s': self.step_s,
+            'dns': self.resolver.stats(),
+        }
@@ -0,0 +1,108 @@
+"""Blynk uplink: send only what changed, once per cycle, in one socket write
+
+Values are staged with set() during a loop iteration and flush() sends
+the ones that moved past their pin's deadband since they were last
+sent. A later set() of the same pin in the cycle replaces the earlier
+one, so a pin is written at most once per flush. The hardware messages
+are framed the way BlynkLib frames virtual_write and handed to `write`
+as one buffer, so a cycle costs one TCP segment instead of one per pin.
+A pin that hasn't been sent for heartbeat_ms is re-sent unchanged, which
+keeps the app's "last seen" current while the values sit still. If the
+write fails, nothing counts as sent and the pins stay staged.
+"""
+try:
+    import struct
+except ImportError:
+    import ustruct as struct
+
+import hal
+
+MSG_HW = 20
+HEARTBEAT_MS = 60000
+MIN_INTERVAL_MS = 1000  # a write closer than this to the previous one is held back
+
+
+class Uplink:
+    def __init__(self, write, deadbands=None, heartbeat_ms=HEARTBEAT_MS,
+                 min_interval_ms=MIN_INTERVAL_MS, clock=None):
+        self.write = write  # callable(bytes), e.g. the Blynk connection's raw write
+        self.deadbands = deadbands or {}  # pin -> smallest numeric change worth sending
+        self.heartbeat_ms = heartbeat_ms
+        self.min_interval_ms = min_interval_ms
+        self.clock = clock or hal.ticks_ms
+        self.staged = {}
+        self.last = {}  # pin -> value last sent
+        self.sent_at = {}  # pin -> ticks when last sent
+        self.flushed_at = None
+        self.msg_id = 0
+        self.sent = 0  # pin writes that went out
+        self.suppressed = 0  # staged writes dropped as unchanged
+        self.heartbeats = 0  # unchanged pins re-sent for liveness
+        self.batches = 0  # socket writes
+
+    def set(self, pin, value):
+        self.staged[pin] = value
+
+    def forget(self, pin):
+        """The server's value for pin changed behind our back (an app write); resend it"""
+        self.last.pop(pin, None)
+        self.sent_at.pop(pin, None)
+
+    def changed(self, pin, value):
+        if pin not in self.last:
+            return True
+        last = self.last[pin]
+        band = self.deadbands.get(pin, 0)
+        if band and isinstance(value, (int, float)) and isinstance(last, (int, float)):
+            return abs(value - last) >= band
+        return value != last
+
+    def frame(self, pin, value):
+        self.msg_id = self.msg_id % 0xffff + 1
+        if isinstance(value, (tuple, list)):
+            body = '\0'.join(['vw', str(pin)] + [str(v) for v in value])
+        else:
+            body = 'vw\0%d\0%s' % (pin, value)
+        body = body.encode()
+        return struct.pack('!BHH', MSG_HW, self.msg_id, len(body)) + body
+
+    def flush(self):
+        """Send the staged pins that changed (or are due a heartbeat); returns how many"""
+        if not self.staged:
+            return 0
+        now = self.clock()
+        if self.flushed_at is not None and hal.ticks_diff(now, self.flushed_at) < self.min_interval_ms:
+            return 0  # rate limit: keep them staged for the next flush
+        frames = []
+        pins = []
+        heartbeats = suppressed = 0
+        for pin, value in self.staged.items():
+            if self.changed(pin, value):
+                pass
+            elif hal.ticks_diff(now, self.sent_at[pin]) >= self.heartbeat_ms:
+                heartbeats += 1
+            else:
+                suppressed += 1
+                continue
+            frames.append(self.frame(pin, value))
+            pins.append(pin)
+        if frames:
+            self.write(b''.join(frames))  # raises on a dead socket: nothing is marked sent, all stays staged
+            self.flushed_at = now
+            for pin in pins:
+                self.last[pin] = self.staged[pin]
+                self.sent_at[pin] = now
+            self.sent += len(frames)
+            self.batches += 1
+        self.heartbeats += heartbeats
+        self.suppressed += suppressed
+        self.staged.clear()
+        return len(frames)
+
+    def stats(self):
+        return {
+            'sent': self.sent,
+            'suppressed': self.suppressed,
+            'heartbeats': self.heartbeats,
+            'batches': self.batches,
+        }
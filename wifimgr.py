@@ -0,0 +1,151 @@
+"""Wi-Fi connection manager: a non-blocking state machine with backoff
+
+poll() never waits. It starts a station connect, checks on it on later
+calls, and after a failed attempt waits an exponentially growing backoff
+(BACKOFF_MIN_MS doubling up to BACKOFF_MAX_MS) before the next one, so
+control loops keep running while the network is away. A drop of an
+established link is retried at once with the backoff reset. An optional
+access point is raised while the station is down, so the dashboard stays
+reachable, and lowered once the station is back.
+
+Link-up time, connects, reconnects and downtime are kept for /stats.
+"""
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+import hal
+
+CONNECT_TIMEOUT_MS = 20000  # one association + DHCP attempt
+BACKOFF_MIN_MS = 1000
+BACKOFF_MAX_MS = 60000
+POLL_MS = 250  # run() period
+
+DOWN = 'down'
+CONNECTING = 'connecting'
+UP = 'up'
+BACKOFF = 'backoff'
+
+
+class WiFiManager:
+    def __init__(self, sta, ssid, password, ap=None, ap_essid=None, ap_password=None,
+                 on_change=None, clock=None):
+        self.sta = sta
+        self.ssid = ssid
+        self.password = password
+        self.ap = ap  # fallback access point, raised while the station is down
+        self.ap_essid = ap_essid
+        self.ap_password = ap_password
+        self.on_change = on_change  # callback(manager) on UP and on losing UP
+        self.clock = clock or hal.ticks_ms
+        self.state = DOWN
+        self.ap_up = False
+        self.backoff_ms = BACKOFF_MIN_MS
+        self.since = self.clock()  # entered the current state
+        self.down_since = self.since  # None while up
+        self.retry_at = self.since
+        self.attempts = 0
+        self.failures = 0  # attempts that timed out
+        self.connects = 0
+        self.drops = 0
+        self.downtime_ms = 0  # closed outages only; see stats()
+        self.last_outage_ms = 0
+
+    def is_up(self):
+        return self.state == UP
+
+    def ip(self):
+        """Station address when up, else the AP's, else None"""
+        if self.state == UP:
+            return self.sta.ifconfig()[0]
+        if self.ap_up:
+            return self.ap.ifconfig()[0]
+        return None
+
+    def _enter(self, state, now):
+        self.state = state
+        self.since = now
+
+    def _connect(self, now):
+        self.attempts += 1
+        try:
+            self.sta.active(True)
+            self.sta.connect(self.ssid, self.password)
+        except OSError:
+            pass  # counted as a failure once the attempt times out
+        self._enter(CONNECTING, now)
+
+    def _set_ap(self, on):
+        if not self.ap or on == self.ap_up:
+            return
+        self.ap_up = on
+        self.ap.active(on)
+        if on:
+            self.ap.config(essid=self.ap_essid, password=self.ap_password)
+
+    def poll(self):
+        """Advance the state machine; cheap enough to call every loop pass"""
+        now = self.clock()
+        state = self.state
+        if state == UP:
+            if not self.sta.isconnected():
+                self.drops += 1
+                self.down_since = now
+                self.backoff_ms = BACKOFF_MIN_MS
+                self._enter(DOWN, now)
+                if self.on_change:
+                    self.on_change(self)
+                self._connect(now)  # a dropped link is usually back within one attempt
+        elif state == CONNECTING:
+            if self.sta.isconnected():
+                self.connects += 1
+                self.last_outage_ms = hal.ticks_diff(now, self.down_since)
+                self.downtime_ms += self.last_outage_ms
+                self.down_since = None
+                self.backoff_ms = BACKOFF_MIN_MS
+                self._enter(UP, now)
+                self._set_ap(False)
+                if self.on_change:
+                    self.on_change(self)
+            elif hal.ticks_diff(now, self.since) >= CONNECT_TIMEOUT_MS:
+                self.failures += 1
+                try:
+                    self.sta.disconnect()
+                except OSError:
+                    pass
+                self._set_ap(True)
+                self.retry_at = hal.ticks_add(now, self.backoff_ms)
+                self.backoff_ms = min(self.backoff_ms * 2, BACKOFF_MAX_MS)
+                self._enter(BACKOFF, now)
+        elif state == BACKOFF:
+            if hal.ticks_diff(now, self.retry_at) >= 0:
+                self._connect(now)
+        else:
+            self._connect(now)
+        return self.state
+
+    async def run(self, period_ms=POLL_MS):
+        while True:
+            self.poll()
+            await asyncio.sleep(hal.real_s(period_ms))
+
+    def stats(self):
+        now = self.clock()
+        downtime = self.downtime_ms
+        if self.down_since is not None:
+            downtime += hal.ticks_diff(now, self.down_since)
+        return {
+            'state': self.state,
+            'ip': self.ip(),
+            'ap': self.ap_up,
+            'up_s': hal.ticks_diff(now, self.since) // 1000 if self.state == UP else 0,
+            'connects': self.connects,
+            'reconnects': max(0, self.connects - 1),
+            'drops': self.drops,
+            'attempts': self.attempts,
+            'failures': self.failures,
+            'downtime_s': downtime // 1000,
+            'last_outage_s': self.last_outage_ms // 1000,
+            'backoff_ms': self.backoff_ms,
+        }